@@ -1,10 +1,45 @@
-"""插件启动 Hook 示例。"""
+"""插件启动 Hook：在后台预热图表执行环境。"""
 
+from __future__ import annotations
 
-def main(payload):
-    """应用启动时输出一条轻量调试信息。"""
+import os
+import sys
+import time
+from typing import Any, Dict
+
+# Hook 以脚本方式运行，确保插件根目录在 sys.path 中以便导入共享模块。
+_PLUGIN_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PLUGIN_ROOT not in sys.path:
+    sys.path.insert(0, _PLUGIN_ROOT)
+
+
+def main(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """应用启动时启动后台预热并立即返回，预热进度写入 runtime/warmup.json。"""
     print("[now_chat_plugin_python_chart_libs] app_start hook triggered")
+    started = time.perf_counter()
+    try:
+        from python_chart_ui.settings import load_settings
+        from python_chart_ui.warmup import start_warmup
+        from python_chart_ui.warmup import warmup_status
+
+        settings = load_settings()
+        if settings.get("warmupOnStart"):
+            started_now = start_warmup(settings)
+            warmup = warmup_status()
+        else:
+            started_now = False
+            warmup = {"status": "disabled", "steps": []}
+    except Exception as error:
+        started_now = False
+        warmup = {"status": "failed", "error": f"{type(error).__name__}: {error}", "steps": []}
+    hook_ms = round((time.perf_counter() - started) * 1000, 1)
+    print(
+        "[now_chat_plugin_python_chart_libs] app_start warmup"
+        f" status={warmup.get('status')} started={started_now} hookMs={hook_ms}"
+    )
     return {
         "ok": True,
         "summary": "now_chat_plugin_python_chart_libs 已启动",
+        "warmup": warmup,
+        "hookMs": hook_ms,
     }
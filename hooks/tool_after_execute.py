@@ -3,7 +3,14 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict
+import os
+import sys
+from typing import Any, Dict, Optional
+
+# Hook 以脚本方式运行，确保插件根目录在 sys.path 中以便导入共享模块。
+_PLUGIN_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PLUGIN_ROOT not in sys.path:
+    sys.path.insert(0, _PLUGIN_ROOT)
 
 
 def _to_text(value: Any) -> str:
@@ -15,6 +22,23 @@ def _to_text(value: Any) -> str:
     return text
 
 
+def _describe_run(run_id: Any) -> Optional[str]:
+    """从产物索引查询本次运行的产物摘要（不遍历输出目录）。"""
+    if not isinstance(run_id, str) or not run_id:
+        return None
+    try:
+        from python_chart_ui.artifacts import get_run
+
+        run = get_run(run_id)
+    except Exception:
+        return None
+    if run is None:
+        return None
+    items = run.get("artifacts") or []
+    total = sum(int(item.get("size") or 0) for item in items)
+    return f"run={run_id} artifacts={len(items)} bytes={total}"
+
+
 def main(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Hook 入口：打印工具执行结果完整内容。"""
     data = payload.get("payload", {}) if isinstance(payload, dict) else {}
@@ -25,15 +49,18 @@ def main(payload: Dict[str, Any]) -> Dict[str, Any]:
     summary = data.get("summary")
     tool_message_content = data.get("toolMessageContent")
     tool_ok = None
+    run_id = None
     if isinstance(tool_message_content, str):
         try:
             parsed = json.loads(tool_message_content)
             if isinstance(parsed, dict):
                 tool_ok = parsed.get("ok")
+                run_id = parsed.get("runId")
         except Exception:
             tool_ok = None
     elif isinstance(tool_message_content, dict):
         tool_ok = tool_message_content.get("ok")
+        run_id = tool_message_content.get("runId")
 
     print(
         "[now_chat_plugin_python_chart_libs] tool_after_execute"
@@ -52,4 +79,7 @@ def main(payload: Dict[str, Any]) -> Dict[str, Any]:
         "[now_chat_plugin_python_chart_libs] tool_after_execute return="
         f"{_to_text(tool_message_content)}"
     )
+    run_summary = _describe_run(run_id)
+    if run_summary:
+        print(f"[now_chat_plugin_python_chart_libs] tool_after_execute artifacts {run_summary}")
     return {"ok": True}
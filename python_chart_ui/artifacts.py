@@ -0,0 +1,434 @@
+"""图表产物索引（SQLite）与内容去重。
+
+每次执行结束后把运行信息与产物写入 `runtime/artifacts.sqlite3`：
+- runs: 运行 id、输出目录、代码哈希、开始/结束时间、是否成功、执行方式；
+- artifacts: 每个产物的路径、大小与内容哈希；
+- blobs: 内容寻址存储 `runtime/artifact_store/<hash[:2]>/<hash><ext>`。
+
+相同内容的图片只在 blob 存储中保留一份，各运行目录中的文件替换为指向它的硬链接；
+文件系统不支持硬链接时只记录哈希，不做去重。Hook 与配置页通过本模块的查询函数
+列出或查找产物，无需遍历 chart_outputs。
+
+硬链接共享同一个 inode，原地改写任一路径都会同时改掉其它运行与 blob。因此 blob
+（连同链接到它的运行文件）设为只读 0o444，工具的保存入口与作用域内的 `open` 在写入
+已有文件前先调用 `detach_shared_file` 复制出独立文件。
+
+登记在后台线程中进行（`record_run_async`），不占用工具返回前的时间；进程退出时
+最多等待 `INDEX_FLUSH_TIMEOUT_SEC` 秒让排队的登记完成。
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import hashlib
+import os
+import queue
+import shutil
+import sqlite3
+import stat
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from python_chart_ui.paths import runtime_dir
+
+ARTIFACT_DB_FILE = "artifacts.sqlite3"
+ARTIFACT_STORE_DIR = "artifact_store"
+SCHEMA_VERSION = 1
+
+_HASH_CHUNK = 1024 * 1024
+# blob 与链接到它的运行文件的权限。
+BLOB_MODE = 0o444
+# 进程退出时等待后台登记完成的最长时间（秒）。
+INDEX_FLUSH_TIMEOUT_SEC = 5.0
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        output_dir TEXT NOT NULL,
+        code_hash TEXT,
+        started_at INTEGER,
+        finished_at INTEGER,
+        ok INTEGER,
+        executor TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS artifacts (
+        run_id TEXT NOT NULL,
+        relpath TEXT NOT NULL,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        content_hash TEXT NOT NULL,
+        created_at INTEGER NOT NULL,
+        PRIMARY KEY (run_id, relpath)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS blobs (
+        content_hash TEXT PRIMARY KEY,
+        blob_path TEXT NOT NULL,
+        size INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_artifacts_hash ON artifacts (content_hash)",
+    "CREATE INDEX IF NOT EXISTS idx_artifacts_path ON artifacts (path)",
+    "CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at)",
+)
+
+_init_lock = threading.Lock()
+_initialized: set = set()
+
+_index_queue: "queue.Queue[Tuple[tuple, Dict[str, Any]]]" = queue.Queue()
+_index_lock = threading.Lock()
+_index_thread: Optional[threading.Thread] = None
+
+
+def _db_path() -> str:
+    return runtime_dir(ARTIFACT_DB_FILE)
+
+
+@contextlib.contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """打开索引库（首次使用时建表），退出时提交并关闭。"""
+    path = _db_path()
+    conn = sqlite3.connect(path, timeout=5.0)
+    conn.row_factory = sqlite3.Row
+    try:
+        with _init_lock:
+            if path not in _initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+                conn.commit()
+                _initialized.add(path)
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def file_sha256(path: str) -> str:
+    """流式计算文件内容的 sha256。"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        while True:
+            chunk = handle.read(_HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detach_shared_file(path: str, keep_content: bool = True) -> None:
+    """写入前断开 `path` 与其它路径共享的硬链接。
+
+    `keep_content=True` 时先复制出内容相同的独立文件再替换（追加/读写模式），
+    否则直接删除该路径（随后整体重写）。文件不存在或未被共享时不做任何事。
+    """
+    try:
+        info = os.stat(path)
+    except OSError:
+        return
+    if info.st_nlink <= 1 or not stat.S_ISREG(info.st_mode):
+        return
+    if not keep_content:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+        return
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.detach"
+    try:
+        # copyfile 不复制权限位，新文件按 umask 可写。
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+
+
+def _blob_path(content_hash: str, ext: str) -> str:
+    return runtime_dir(ARTIFACT_STORE_DIR, content_hash[:2], content_hash + ext.lower())
+
+
+def _dedupe(conn: sqlite3.Connection, path: str, content_hash: str, size: int) -> None:
+    """把 `path` 与 blob 存储关联：已有相同内容则替换为硬链接，否则登记为新 blob。"""
+    row = conn.execute(
+        "SELECT blob_path FROM blobs WHERE content_hash = ?", (content_hash,)
+    ).fetchone()
+    blob_path = row["blob_path"] if row is not None else None
+    if blob_path and os.path.isfile(blob_path):
+        try:
+            if os.path.samefile(blob_path, path):
+                return
+            # blob 内容与登记不一致（曾被原地改写）时不再链接，避免扩散。
+            if file_sha256(blob_path) != content_hash:
+                return
+            tmp_path = f"{path}.{os.getpid()}.link"
+            os.link(blob_path, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(f"{path}.{os.getpid()}.link")
+        return
+
+    blob_path = _blob_path(content_hash, os.path.splitext(path)[1])
+    try:
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if not os.path.exists(blob_path):
+            os.link(path, blob_path)
+        # 只读保护共享 inode（chmod 作用于 inode，运行目录中的文件同样变为只读）。
+        os.chmod(blob_path, BLOB_MODE)
+    except OSError:
+        # 不支持硬链接（如部分外部存储）：只记录哈希，不去重。
+        return
+    conn.execute(
+        "INSERT OR REPLACE INTO blobs (content_hash, blob_path, size) VALUES (?, ?, ?)",
+        (content_hash, blob_path, size),
+    )
+
+
+def record_run(
+    run_id: str,
+    output_dir: str,
+    chart_files: List[str],
+    code_hash: Optional[str] = None,
+    started_at: Optional[int] = None,
+    ok: Optional[bool] = None,
+    executor: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """登记一次运行及其产物（输出目录内的文件），返回产物记录列表。"""
+    output_dir = os.path.abspath(output_dir)
+    now = int(time.time() * 1000)
+    records: List[Dict[str, Any]] = []
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO runs"
+            " (run_id, output_dir, code_hash, started_at, finished_at, ok, executor)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id,
+                output_dir,
+                code_hash,
+                started_at,
+                now,
+                None if ok is None else int(bool(ok)),
+                executor,
+            ),
+        )
+        for path in chart_files:
+            full_path = os.path.abspath(path)
+            if os.path.commonpath([full_path, output_dir]) != output_dir:
+                continue
+            try:
+                size = os.path.getsize(full_path)
+                content_hash = file_sha256(full_path)
+            except OSError:
+                continue
+            _dedupe(conn, full_path, content_hash, size)
+            record = {
+                "runId": run_id,
+                "relpath": os.path.relpath(full_path, output_dir),
+                "path": full_path,
+                "size": size,
+                "contentHash": content_hash,
+                "createdAt": now,
+            }
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts"
+                " (run_id, relpath, path, size, content_hash, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    record["relpath"],
+                    full_path,
+                    size,
+                    content_hash,
+                    now,
+                ),
+            )
+            records.append(record)
+    return records
+
+
+def _index_worker() -> None:
+    while True:
+        args, kwargs = _index_queue.get()
+        try:
+            record_run(*args, **kwargs)
+        except Exception:
+            # 索引只是辅助信息，失败不影响已返回的执行结果。
+            pass
+        finally:
+            _index_queue.task_done()
+
+
+def record_run_async(
+    run_id: str,
+    output_dir: str,
+    chart_files: List[str],
+    **kwargs: Any,
+) -> None:
+    """把 `record_run` 放到后台线程执行（参数同 `record_run`），立即返回。"""
+    global _index_thread
+    with _index_lock:
+        if _index_thread is None or not _index_thread.is_alive():
+            if _index_thread is None:
+                atexit.register(flush_index)
+            _index_thread = threading.Thread(
+                target=_index_worker, name="python-chart-artifact-index", daemon=True
+            )
+            _index_thread.start()
+    _index_queue.put(((run_id, output_dir, list(chart_files)), kwargs))
+
+
+def flush_index(timeout: float = INDEX_FLUSH_TIMEOUT_SEC) -> bool:
+    """等待排队的后台登记完成，最多 `timeout` 秒，返回是否已全部完成。"""
+    deadline = time.monotonic() + timeout
+    with _index_queue.all_tasks_done:
+        while _index_queue.unfinished_tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            _index_queue.all_tasks_done.wait(remaining)
+    return True
+
+
+def _run_row(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "runId": row["run_id"],
+        "outputDir": row["output_dir"],
+        "codeHash": row["code_hash"],
+        "startedAt": row["started_at"],
+        "finishedAt": row["finished_at"],
+        "ok": None if row["ok"] is None else bool(row["ok"]),
+        "executor": row["executor"],
+    }
+
+
+def _artifact_row(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "runId": row["run_id"],
+        "relpath": row["relpath"],
+        "path": row["path"],
+        "size": row["size"],
+        "contentHash": row["content_hash"],
+        "createdAt": row["created_at"],
+    }
+
+
+def list_runs(limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    """按开始时间倒序列出运行记录。"""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT * FROM runs ORDER BY started_at DESC, finished_at DESC LIMIT ? OFFSET ?",
+            (int(limit), int(offset)),
+        ).fetchall()
+    return [_run_row(row) for row in rows]
+
+
+def get_run(run_id: str) -> Optional[Dict[str, Any]]:
+    """返回一次运行及其产物，不存在时返回 None。"""
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        artifacts = conn.execute(
+            "SELECT * FROM artifacts WHERE run_id = ? ORDER BY relpath", (run_id,)
+        ).fetchall()
+    run = _run_row(row)
+    run["artifacts"] = [_artifact_row(item) for item in artifacts]
+    return run
+
+
+def find_artifacts(
+    content_hash: Optional[str] = None,
+    path: Optional[str] = None,
+    code_hash: Optional[str] = None,
+    limit: int = 50,
+) -> List[Dict[str, Any]]:
+    """按内容哈希、文件路径或代码哈希查找产物（条件之间为“与”）。"""
+    clauses: List[str] = []
+    params: List[Any] = []
+    if content_hash:
+        clauses.append("a.content_hash = ?")
+        params.append(content_hash)
+    if path:
+        clauses.append("a.path = ?")
+        params.append(os.path.abspath(path))
+    if code_hash:
+        clauses.append("r.code_hash = ?")
+        params.append(code_hash)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    params.append(int(limit))
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT a.* FROM artifacts a JOIN runs r ON r.run_id = a.run_id"
+            f" {where} ORDER BY a.created_at DESC LIMIT ?",
+            params,
+        ).fetchall()
+    return [_artifact_row(row) for row in rows]
+
+
+def index_stats() -> Dict[str, int]:
+    """返回索引统计：运行数、产物数、产物总字节与去重后实际占用字节。"""
+    with _connect() as conn:
+        runs = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        artifacts, total_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts"
+        ).fetchone()
+        unique_bytes = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM"
+            " (SELECT size FROM artifacts GROUP BY content_hash)"
+        ).fetchone()[0]
+    return {
+        "runs": int(runs),
+        "artifacts": int(artifacts),
+        "totalBytes": int(total_bytes),
+        "uniqueBytes": int(unique_bytes),
+    }
+
+
+def output_roots() -> List[str]:
+    """返回索引中出现过的 chart_outputs 根目录。"""
+    with _connect() as conn:
+        rows = conn.execute("SELECT DISTINCT output_dir FROM runs").fetchall()
+    roots: List[str] = []
+    for row in rows:
+        root = os.path.dirname(row["output_dir"])
+        if root not in roots:
+            roots.append(root)
+    return roots
+
+
+def forget_runs(run_ids: List[str]) -> None:
+    """删除运行及其产物记录（目录已被清理时调用）。"""
+    if not run_ids:
+        return
+    with _connect() as conn:
+        conn.executemany("DELETE FROM artifacts WHERE run_id = ?", [(item,) for item in run_ids])
+        conn.executemany("DELETE FROM runs WHERE run_id = ?", [(item,) for item in run_ids])
+
+
+def prune_blobs() -> int:
+    """删除不再被任何产物引用的 blob，返回释放的字节数。"""
+    freed = 0
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT b.content_hash, b.blob_path, b.size FROM blobs b"
+            " WHERE NOT EXISTS (SELECT 1 FROM artifacts a WHERE a.content_hash = b.content_hash)"
+        ).fetchall()
+        for row in rows:
+            try:
+                os.remove(row["blob_path"])
+                freed += int(row["size"] or 0)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            conn.execute("DELETE FROM blobs WHERE content_hash = ?", (row["content_hash"],))
+            with contextlib.suppress(OSError):
+                os.rmdir(os.path.dirname(row["blob_path"]))
+    return freed
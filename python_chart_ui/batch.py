@@ -0,0 +1,235 @@
+"""批量执行：一次调用执行多段图表代码。
+
+仪表盘类需求往往连续调用工具五次以上，每次都重复导入与字体配置。批量模式下：
+- 父进程只做一次共享准备（MPLCONFIGDIR、字体配置、导入各段代码用到的图表库）；
+- 进程内没有其它执行并行时（`allow_fork=True`），支持 fork 的平台上每段代码 fork 一个
+  独立子进程（同时最多 `max_workers` 个），子进程继承已预热的解释器并行执行；某段代码
+  `os._exit`、段错误或被 kill 时只有该段记为 worker_crashed，其余任务不受影响；
+- 与其它执行共享进程（其它线程可能正持有字体/编译缓存等锁，fork 出的子进程会继承
+  这些已上锁的锁）或不支持 fork 时退回线程池（不切换 cwd，依赖运行上下文隔离）；
+- 每段代码有独立的超时：fork 子进程到期即被杀掉，线程池中到期的任务记为超时后
+  不再等待（线程无法被强制结束，会在后台继续运行至结束）；
+- 每段代码使用批次输出目录下独立的子目录；
+- 各段结果合并为一次工具输出：工具脚本把 stdout/stderr 捕获上限按段数均分，
+  合并结果仍超出 outputLimit 时依次把内联图片写盘、截短各段输出；
+- `executionMode: "subprocess"` 时整个批次在沙箱子进程内执行，受同样的内存/CPU 上限约束。
+
+执行函数由调用方（工具脚本的 `_run_local`）通过 `run_jobs` 传入，并作为参数传给
+fork 子进程与线程池任务，同一进程内并行的多个批次互不影响。
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import re
+import signal
+import time
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RunFn = Callable[..., Dict[str, Any]]
+
+_JOB_ID_PATTERN = re.compile(r"[^A-Za-z0-9_.-]+")
+# 线程池模式下检查任务是否超时的间隔（秒）。
+_THREAD_POLL_SEC = 0.2
+
+
+def job_dir_name(job_id: Any, index: int) -> str:
+    """把任务 id 规范为安全的子目录名（带序号前缀保证唯一且保持顺序）。"""
+    cleaned = _JOB_ID_PATTERN.sub("_", str(job_id or "")).strip("._")[:40]
+    return f"job_{index:02d}" + (f"_{cleaned}" if cleaned else "")
+
+
+def _json_safe(value: Dict[str, Any]) -> Dict[str, Any]:
+    """转换为可跨进程传递的纯 JSON 结构（`_result` 可能是任意对象）。"""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def _execute(
+    runner: RunFn, job_payload: Dict[str, Any], output_dir: str, allow_chdir: bool
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    result = runner(job_payload, allow_chdir=allow_chdir, output_dir=output_dir)
+    result["elapsedMs"] = round((time.perf_counter() - started) * 1000, 1)
+    return _json_safe(result)
+
+
+def _fork_context() -> Optional[Any]:
+    if not hasattr(os, "fork"):
+        return None
+    try:
+        return multiprocessing.get_context("fork")
+    except ValueError:
+        return None
+
+
+def _crashed_result(output_dir: str, error: str) -> Dict[str, Any]:
+    return {
+        "ok": False,
+        "summary": "python_chart_exec 执行失败(worker_crashed)",
+        "error": error,
+        "errorType": "worker_crashed",
+        "stdout": "",
+        "stderr": "",
+        "chartFiles": [],
+        "outputDir": output_dir,
+    }
+
+
+def _timeout_result(output_dir: str, timeout: float) -> Dict[str, Any]:
+    return {
+        "ok": False,
+        "summary": "python_chart_exec 执行失败(timeout)",
+        "error": f"job exceeded {timeout:g}s",
+        "errorType": "timeout",
+        "stdout": "",
+        "stderr": "",
+        "chartFiles": [],
+        "outputDir": output_dir,
+    }
+
+
+def _pending_alarm() -> float:
+    """父进程尚未到期的 ITIMER_REAL（如 subprocess 模式的软超时），fork 后需在子进程重设。"""
+    if not hasattr(signal, "getitimer"):
+        return 0.0
+    return signal.getitimer(signal.ITIMER_REAL)[0]
+
+
+def _job_main(
+    writer: Any, runner: RunFn, job_payload: Dict[str, Any], output_dir: str, alarm: float
+) -> None:
+    """fork 子进程入口：执行一段代码并把结果写回管道。"""
+    if alarm > 0:
+        # 定时器不随 fork 继承，信号处理函数会继承。
+        signal.setitimer(signal.ITIMER_REAL, alarm)
+    try:
+        result = _execute(runner, job_payload, output_dir, True)
+    except Exception as error:
+        result = _crashed_result(output_dir, f"{type(error).__name__}: {error}")
+    writer.send(result)
+    writer.close()
+
+
+def _run_forked(
+    context: Any,
+    runner: RunFn,
+    jobs: List[Tuple[Dict[str, Any], str]],
+    workers: int,
+    timeout: float,
+) -> List[Dict[str, Any]]:
+    """每段代码一个 fork 子进程，同时最多 `workers` 个；子进程异常退出或超时只影响自身。"""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+    queue = list(enumerate(jobs))
+    running: Dict[Any, Tuple[int, Any, str, float]] = {}
+    while queue or running:
+        while queue and len(running) < workers:
+            index, (job_payload, output_dir) = queue.pop(0)
+            reader, writer = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_job_main,
+                args=(writer, runner, job_payload, output_dir, _pending_alarm()),
+            )
+            process.start()
+            # 父进程关闭写端，子进程退出后读端才能读到 EOF。
+            writer.close()
+            deadline = time.monotonic() + timeout if timeout > 0 else float("inf")
+            running[reader] = (index, process, output_dir, deadline)
+        nearest = min(item[3] for item in running.values())
+        remaining = None if nearest == float("inf") else max(0.0, nearest - time.monotonic())
+        ready = wait(list(running), timeout=remaining)
+        now = time.monotonic()
+        for reader in list(running):
+            index, process, output_dir, deadline = running[reader]
+            if reader in ready:
+                try:
+                    result = reader.recv()
+                except (EOFError, OSError):
+                    result = None
+                process.join()
+                if not isinstance(result, dict):
+                    result = _crashed_result(
+                        output_dir,
+                        f"job process exited without result (exitcode={process.exitcode})",
+                    )
+            elif now >= deadline:
+                process.kill()
+                process.join()
+                result = _timeout_result(output_dir, timeout)
+            else:
+                continue
+            del running[reader]
+            reader.close()
+            results[index] = result
+    return [item or {} for item in results]
+
+
+def _run_threaded(
+    runner: RunFn,
+    jobs: List[Tuple[Dict[str, Any], str]],
+    workers: int,
+    timeout: float,
+    allow_chdir: bool,
+) -> List[Dict[str, Any]]:
+    """线程池执行；超时的任务不再等待，直接记为超时。"""
+    results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+    started: Dict[int, float] = {}
+
+    def _task(index: int, job_payload: Dict[str, Any], output_dir: str) -> Dict[str, Any]:
+        started[index] = time.monotonic()
+        return _execute(runner, job_payload, output_dir, allow_chdir)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = {
+            executor.submit(_task, index, job_payload, output_dir): index
+            for index, (job_payload, output_dir) in enumerate(jobs)
+        }
+        while pending:
+            done, _ = concurrent.futures.wait(
+                pending,
+                timeout=_THREAD_POLL_SEC if timeout > 0 else None,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                index = pending.pop(future)
+                output_dir = jobs[index][1]
+                try:
+                    results[index] = future.result()
+                except Exception as error:
+                    results[index] = _crashed_result(
+                        output_dir, f"{type(error).__name__}: {error}"
+                    )
+            now = time.monotonic()
+            for future, index in list(pending.items()):
+                if index in started and now - started[index] > timeout > 0:
+                    del pending[future]
+                    results[index] = _timeout_result(jobs[index][1], timeout)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [item or {} for item in results]
+
+
+def run_jobs(
+    runner: RunFn,
+    jobs: List[Tuple[Dict[str, Any], str]],
+    max_workers: int,
+    timeout: float = 0.0,
+    allow_fork: bool = True,
+) -> Tuple[List[Dict[str, Any]], str]:
+    """并行执行 [(job_payload, output_dir)]，按输入顺序返回结果与执行方式。
+
+    `timeout` 为单段代码的最长执行秒数（0 表示不限制）；`allow_fork=False` 时
+    （进程内有其它执行并行）只使用线程池。
+    """
+    workers = max(1, min(int(max_workers), len(jobs)))
+    context = _fork_context() if allow_fork else None
+    if context is not None:
+        return _run_forked(context, runner, jobs, workers, timeout), "fork"
+    # 与其它执行共享进程或多线程并行时都不能切换 cwd。
+    allow_chdir = allow_fork and workers <= 1
+    return _run_threaded(runner, jobs, workers, timeout, allow_chdir), "thread"
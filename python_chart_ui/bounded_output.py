@@ -0,0 +1,163 @@
+"""有界的 stdout/stderr 捕获缓冲。
+
+用户代码的输出原先写入无上限的 `io.StringIO`：打印大 DataFrame 或成千上万条重复的
+"Glyph missing" 警告时会先拼出数 MB 字符串，再被宿主按 `outputLimit` 截断。
+`BoundedTextBuffer` 在写入时即控制内存：
+- 按 UTF-8 字节预算保留开头（head）与结尾（tail），中间部分丢弃并统计字节数；
+- 连续重复的相同行折叠为一行加重复次数；
+- 超长的单行（无换行）按预算切块处理，不会无限累积。
+
+`mirror` 不为 None 时每次写入同时原样转写到该流并立即 flush（subprocess 沙箱用它把
+输出逐次落到文件，子进程被杀后父进程仍能读回）。
+"""
+
+from __future__ import annotations
+
+import collections
+import io
+import threading
+from typing import Any, Deque, Dict, List, Optional
+
+DEFAULT_LIMIT_BYTES = 12000
+
+
+def _nbytes(text: str) -> int:
+    return len(text.encode("utf-8", "surrogatepass"))
+
+
+def _clip_bytes(text: str, budget: int) -> str:
+    """截取不超过 `budget` 字节的前缀（不拆开多字节字符）。"""
+    raw = text.encode("utf-8", "surrogatepass")[: max(0, budget)]
+    return raw.decode("utf-8", "ignore")
+
+
+class BoundedTextBuffer(io.TextIOBase):
+    """保留首尾、折叠重复行的有界文本缓冲。"""
+
+    def __init__(
+        self,
+        limit_bytes: int = DEFAULT_LIMIT_BYTES,
+        head_ratio: float = 0.5,
+        mirror: Optional[Any] = None,
+    ) -> None:
+        super().__init__()
+        self._mirror = mirror
+        self.limit_bytes = max(256, int(limit_bytes))
+        self._head_budget = int(self.limit_bytes * min(max(head_ratio, 0.0), 1.0))
+        self._tail_budget = self.limit_bytes - self._head_budget
+        self._head: List[str] = []
+        self._head_bytes = 0
+        self._tail: Deque[str] = collections.deque()
+        self._tail_bytes = 0
+        self._pending = ""
+        self._last_line: Optional[str] = None
+        self._repeat = 0
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.dropped_bytes = 0
+        self.folded_lines = 0
+
+    # -- 写入 -----------------------------------------------------------------
+
+    def write(self, text: str) -> int:
+        if not isinstance(text, str):
+            text = str(text)
+        if not text:
+            return 0
+        with self._lock:
+            self.total_bytes += _nbytes(text)
+            data = self._pending + text
+            lines = data.split("\n")
+            self._pending = lines.pop()
+            for line in lines:
+                self._accept_line(line + "\n")
+            # 超长的未完成行按预算切块，避免单行无限增长。
+            if len(self._pending) > self.limit_bytes:
+                self._accept_line(self._pending)
+                self._pending = ""
+        if self._mirror is not None:
+            try:
+                self._mirror.write(text)
+                self._mirror.flush()
+            except Exception:
+                pass
+        return len(text)
+
+    def _accept_line(self, line: str) -> None:
+        if line == self._last_line:
+            self._repeat += 1
+            self.folded_lines += 1
+            return
+        self._flush_repeat()
+        self._last_line = line
+        self._append(line)
+
+    def _flush_repeat(self) -> None:
+        if self._repeat:
+            self._append(f"…（上一行重复 {self._repeat} 次）\n")
+            self._repeat = 0
+
+    def _append(self, chunk: str) -> None:
+        size = _nbytes(chunk)
+        if not self._tail and self._head_bytes < self._head_budget:
+            room = self._head_budget - self._head_bytes
+            if size <= room:
+                self._head.append(chunk)
+                self._head_bytes += size
+                return
+            if not self._head:
+                # 首块就超出首段预算：截取其开头，其余进入尾段。
+                head_part = _clip_bytes(chunk, room)
+                self._head.append(head_part)
+                self._head_bytes += _nbytes(head_part)
+                chunk = chunk[len(head_part):]
+                size = _nbytes(chunk)
+            # 否则首段到此为止，不拆开整行。
+        self._tail.append(chunk)
+        self._tail_bytes += size
+        while self._tail_bytes > self._tail_budget and self._tail:
+            overflow = self._tail_bytes - self._tail_budget
+            first = self._tail[0]
+            first_size = _nbytes(first)
+            if first_size <= overflow:
+                self._tail.popleft()
+                self._tail_bytes -= first_size
+                self.dropped_bytes += first_size
+            else:
+                # 丢弃最早一块的开头部分，使尾段恰好填满预算。
+                kept = first.encode("utf-8", "surrogatepass")[overflow:].decode("utf-8", "ignore")
+                kept_size = _nbytes(kept)
+                self._tail[0] = kept
+                self.dropped_bytes += first_size - kept_size
+                self._tail_bytes -= first_size - kept_size
+
+    # -- 读取 -----------------------------------------------------------------
+
+    def getvalue(self) -> str:
+        """返回当前保留的文本（首段 + 省略提示 + 尾段），不改变缓冲状态。"""
+        with self._lock:
+            parts = list(self._head)
+            if self.dropped_bytes:
+                parts.append(f"\n…（省略 {self.dropped_bytes} 字节）…\n")
+            parts.extend(self._tail)
+            if self._repeat:
+                parts.append(f"…（上一行重复 {self._repeat} 次）\n")
+            if self._pending:
+                parts.append(_clip_bytes(self._pending, self._tail_budget))
+        return "".join(parts)
+
+    def stats(self) -> Dict[str, int]:
+        """返回写入总字节、丢弃字节与折叠行数。"""
+        with self._lock:
+            return {
+                "bytes": self.total_bytes,
+                "droppedBytes": self.dropped_bytes,
+                "foldedLines": self.folded_lines,
+                "limitBytes": self.limit_bytes,
+            }
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return False
@@ -0,0 +1,301 @@
+"""数据集输入通道：payload 中的 `datasets: {name: path}`。
+
+以前唯一的输入是 `payload["code"]`，模型只能把数据写成 Python 字面量塞进代码：代码变得
+很大，compile 变慢，还占用大量工具调用的 token。现在可以传入指向运行沙箱（`chart_outputs`
+所在目录）内文件的路径：
+- `.npy` 以 `np.load(mmap_mode="r")` 内存映射打开，不把整个数组读入内存；
+- `.parquet` / `.feather` 优先经 pyarrow 以内存映射方式读成 DataFrame；
+- `.csv` 有 pyarrow 时使用其多线程列式解析，否则使用 pandas C 解析器。
+
+数据集按需加载：代码中直接引用的名字在执行前加载，其余可通过作用域中的
+`datasets["name"]` / `datasets.name` 在首次访问时加载。解析得到的列名与 dtype 按
+（真实路径, 大小, mtime）缓存在进程内与 `runtime/dataset_schemas.json`，同一文件再次
+读取 CSV 时直接指定 dtype，跳过类型推断。
+
+路径必须位于 `chart_outputs` 所在目录内（相对路径以该目录为基准），越界、不存在或
+格式不支持时抛出 `DatasetError`，工具返回 `errorType: invalid_dataset`。
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import keyword
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from python_chart_ui.paths import read_json
+from python_chart_ui.paths import runtime_dir
+from python_chart_ui.paths import write_json_atomic
+
+SCHEMA_CACHE_FILE = "dataset_schemas.json"
+SCHEMA_CACHE_SIZE = 200
+
+DATASET_FORMATS = {
+    ".npy": "npy",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".csv": "csv",
+}
+
+_schema_lock = threading.Lock()
+_schemas: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_schemas_loaded = False
+
+
+class DatasetError(ValueError):
+    """数据集参数无效（名字非法、路径越界、文件不存在或格式不支持）。"""
+
+
+def _has_pyarrow() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def resolve_datasets(
+    raw: Any,
+    sandbox_root: str,
+    reserved: Iterable[str] = (),
+) -> Dict[str, str]:
+    """校验 `datasets` 参数，返回 {名字: 真实路径}；相对路径按 `sandbox_root` 解析。"""
+    if raw is None:
+        return {}
+    if not isinstance(raw, dict):
+        raise DatasetError("datasets must be an object of {name: path}")
+    reserved = set(reserved)
+    root = os.path.realpath(sandbox_root)
+    resolved: Dict[str, str] = {}
+    for name, path in raw.items():
+        name = str(name)
+        if not name.isidentifier() or keyword.iskeyword(name) or name in reserved:
+            raise DatasetError(f"invalid dataset name: {name!r}")
+        if not isinstance(path, str) or not path.strip():
+            raise DatasetError(f"dataset {name!r} path must be a non-empty string")
+        full_path = os.path.realpath(os.path.join(root, path))
+        # 解析符号链接后再判断，防止通过链接读取沙箱外的文件。
+        if os.path.commonpath([full_path, root]) != root:
+            raise DatasetError(f"dataset {name!r} is outside runtime sandbox: {full_path}")
+        if not os.path.isfile(full_path):
+            raise DatasetError(f"dataset {name!r} not found: {full_path}")
+        if os.path.splitext(full_path)[1].lower() not in DATASET_FORMATS:
+            raise DatasetError(
+                f"dataset {name!r} has unsupported format (expected .npy/.parquet/.feather/.csv)"
+            )
+        resolved[name] = full_path
+    return resolved
+
+
+def file_identity(path: str) -> List[Any]:
+    """文件身份：真实路径 + 大小 + mtime，用于 schema 缓存与结果缓存键。"""
+    stat = os.stat(path)
+    return [path, stat.st_size, stat.st_mtime_ns]
+
+
+def dataset_identities(raw: Any, sandbox_root: str) -> Dict[str, Any]:
+    """各数据集的文件身份；参数无效时返回原始值（对应结果也不会被缓存）。"""
+    try:
+        resolved = resolve_datasets(raw, sandbox_root)
+        return {name: file_identity(path) for name, path in resolved.items()}
+    except (DatasetError, OSError):
+        return {"raw": raw}
+
+
+# -- schema 缓存 -----------------------------------------------------------------
+
+
+def _schema_key(path: str) -> str:
+    return "|".join(str(item) for item in file_identity(path))
+
+
+def _load_persisted() -> None:
+    global _schemas_loaded
+    if _schemas_loaded:
+        return
+    _schemas_loaded = True
+    data = read_json(runtime_dir(SCHEMA_CACHE_FILE))
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if isinstance(value, dict):
+                _schemas[key] = value
+
+
+def cached_schema(path: str) -> Optional[Dict[str, Any]]:
+    """返回文件当前版本已缓存的 schema，没有时返回 None。"""
+    key = _schema_key(path)
+    with _schema_lock:
+        _load_persisted()
+        schema = _schemas.get(key)
+        if schema is not None:
+            _schemas.move_to_end(key)
+        return schema
+
+
+def _store_schema(path: str, schema: Dict[str, Any]) -> None:
+    key = _schema_key(path)
+    with _schema_lock:
+        _load_persisted()
+        _schemas[key] = schema
+        _schemas.move_to_end(key)
+        while len(_schemas) > SCHEMA_CACHE_SIZE:
+            _schemas.popitem(last=False)
+        snapshot = dict(_schemas)
+    write_json_atomic(runtime_dir(SCHEMA_CACHE_FILE), snapshot)
+
+
+def clear_schema_cache() -> None:
+    """清空进程内 schema 缓存（持久化文件保留，下次按需重新读取）。"""
+    global _schemas_loaded
+    with _schema_lock:
+        _schemas.clear()
+        _schemas_loaded = False
+
+
+def _frame_schema(file_format: str, frame: Any) -> Dict[str, Any]:
+    return {
+        "format": file_format,
+        "columns": [str(column) for column in frame.columns],
+        "dtypes": {str(column): str(dtype) for column, dtype in frame.dtypes.items()},
+        "rows": int(len(frame)),
+    }
+
+
+# -- 读取 ------------------------------------------------------------------------
+
+
+def _read_npy(path: str) -> Any:
+    import numpy as np
+
+    return np.load(path, mmap_mode="r", allow_pickle=False)
+
+
+def _read_parquet(path: str) -> Any:
+    import pandas as pd
+
+    if _has_pyarrow():
+        return pd.read_parquet(path, engine="pyarrow", memory_map=True)
+    return pd.read_parquet(path)
+
+
+def _read_feather(path: str) -> Any:
+    if _has_pyarrow():
+        from pyarrow import feather
+
+        return feather.read_table(path, memory_map=True).to_pandas()
+    import pandas as pd
+
+    return pd.read_feather(path)
+
+
+def _read_csv(path: str, schema: Optional[Dict[str, Any]]) -> Any:
+    import pandas as pd
+
+    kwargs: Dict[str, Any] = {}
+    if _has_pyarrow():
+        kwargs["engine"] = "pyarrow"
+    if schema and schema.get("dtypes"):
+        dtypes = dict(schema["dtypes"])
+        dates = [name for name, dtype in dtypes.items() if dtype.startswith("datetime64")]
+        for name in dates:
+            dtypes.pop(name)
+        try:
+            return pd.read_csv(path, dtype=dtypes, parse_dates=dates or None, **kwargs)
+        except (TypeError, ValueError):
+            # 缓存的 dtype 与内容不符（极少见），退回类型推断。
+            pass
+    return pd.read_csv(path, **kwargs)
+
+
+def load_dataset(path: str) -> Any:
+    """按扩展名读取数据集，并记录/复用其 schema。"""
+    file_format = DATASET_FORMATS[os.path.splitext(path)[1].lower()]
+    if file_format == "npy":
+        array = _read_npy(path)
+        if cached_schema(path) is None:
+            _store_schema(
+                path,
+                {"format": "npy", "shape": list(array.shape), "dtype": str(array.dtype)},
+            )
+        return array
+    if file_format == "csv":
+        frame = _read_csv(path, cached_schema(path))
+    elif file_format == "parquet":
+        frame = _read_parquet(path)
+    else:
+        frame = _read_feather(path)
+    if cached_schema(path) is None:
+        _store_schema(path, _frame_schema(file_format, frame))
+    return frame
+
+
+class DatasetCatalog:
+    """执行作用域中的 `datasets`：按名字首次访问时加载并缓存数据集。"""
+
+    def __init__(self, paths: Dict[str, str]) -> None:
+        self._paths = dict(paths)
+        self._values: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, name: str) -> Any:
+        if name not in self._paths:
+            raise KeyError(name)
+        with self._lock:
+            if name in self._values:
+                return self._values[name]
+            path = self._paths[name]
+            schema_cached = cached_schema(path) is not None
+            started = time.perf_counter()
+            value = load_dataset(path)
+            self._values[name] = value
+            self._stats[name] = {
+                "loadMs": round((time.perf_counter() - started) * 1000, 1),
+                "schemaCached": schema_cached,
+            }
+            return value
+
+    def schema(self, name: str) -> Optional[Dict[str, Any]]:
+        """返回数据集的 schema（列名/dtype/行数或 shape/dtype），必要时先加载。"""
+        if name not in self._paths:
+            raise KeyError(name)
+        schema = cached_schema(self._paths[name])
+        if schema is None:
+            self.load(name)
+            schema = cached_schema(self._paths[name])
+        return schema
+
+    def __getitem__(self, name: str) -> Any:
+        return self.load(name)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self.load(name)
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._paths
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def keys(self) -> List[str]:
+        return list(self._paths)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各数据集的路径、是否已加载、加载耗时与 schema 是否命中缓存。"""
+        with self._lock:
+            return {
+                name: {"path": path, "loaded": name in self._values, **self._stats.get(name, {})}
+                for name, path in self._paths.items()
+            }
+
+    def __repr__(self) -> str:
+        return f"<datasets {sorted(self._paths)}>"
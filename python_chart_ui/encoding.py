@@ -0,0 +1,247 @@
+"""图表图片的输出编码：PNG 压缩级别、调色板量化与 WebP/JPEG 目标格式。
+
+自动保存与默认 savefig 都以默认 zlib 参数写出全彩 PNG；纯色块为主的图表因此比需要的
+大数倍，编码也占了不少渲染时间。编码选项按 payload > runtime/settings.json > 默认值读取：
+- `pngCompressLevel`：PNG zlib 级别（0-9），savefig 写 PNG 时直接生效，不额外重编码；
+- `paletteMaxColors`：颜色数不超过该值的图片量化为调色板 PNG（0 表示关闭）；
+- `imageFormat`：`png` / `webp` / `jpeg`，非 png 时把 PNG 产物转码为目标格式；
+- `imageQuality`：WebP/JPEG 质量（WebP 为 100 时无损）。
+
+需要重编码（量化或转格式）的文件在执行结束后统一处理，逐个记录编码耗时与节省字节。
+只处理输出目录内的 PNG（`_chart_files` 声明的目录外文件原样保留）；转为 WebP/JPEG 时
+只删除工具自动保存的 PNG，用户显式保存的 PNG 保留原文件，新旧路径记在 `renamed` 中。
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, List, Optional, Tuple
+
+from python_chart_ui.settings import resolve_option
+
+IMAGE_FORMATS = ("png", "webp", "jpeg")
+_EXTENSIONS = {"png": ".png", "webp": ".webp", "jpeg": ".jpg"}
+
+
+@dataclass
+class EncodingOptions:
+    """一次执行的图片编码选项。"""
+
+    image_format: str = "png"
+    png_compress_level: Optional[int] = None
+    palette_max_colors: int = 0
+    quality: int = 90
+
+    @property
+    def needs_reencode(self) -> bool:
+        """是否需要在执行结束后重编码 PNG 产物。"""
+        return self.image_format != "png" or self.palette_max_colors > 0
+
+    def savefig_defaults(self) -> Dict[str, Any]:
+        """写 PNG 时附加给 savefig 的参数（调用方显式传入的同名参数优先）。"""
+        if self.png_compress_level is None:
+            return {}
+        return {"pil_kwargs": {"compress_level": self.png_compress_level}}
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "format": self.image_format,
+            "pngCompressLevel": self.png_compress_level,
+            "paletteMaxColors": self.palette_max_colors,
+            "quality": self.quality,
+        }
+
+
+def _int_option(value: Any, default: Optional[int], low: int, high: int) -> Optional[int]:
+    if value is None or value == "":
+        return default
+    try:
+        return max(low, min(high, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def encoding_options(payload: Dict[str, Any], settings: Dict[str, Any]) -> EncodingOptions:
+    """按 payload > 设置 > 默认值 读取编码选项，非法值回退为默认。"""
+    image_format = str(resolve_option(payload, "imageFormat", settings) or "png").lower()
+    if image_format == "jpg":
+        image_format = "jpeg"
+    if image_format not in IMAGE_FORMATS:
+        image_format = "png"
+    return EncodingOptions(
+        image_format=image_format,
+        png_compress_level=_int_option(
+            resolve_option(payload, "pngCompressLevel", settings), None, 0, 9
+        ),
+        palette_max_colors=_int_option(
+            resolve_option(payload, "paletteMaxColors", settings), 0, 0, 256
+        )
+        or 0,
+        quality=_int_option(resolve_option(payload, "imageQuality", settings), 90, 1, 100) or 90,
+    )
+
+
+def _quantize(image: Any, max_colors: int) -> Optional[Any]:
+    """颜色数不超过 `max_colors` 时返回无损的调色板图像，否则返回 None。
+
+    调色板直接取自图中实际出现的颜色（不经近似量化），每个像素映射到其颜色的下标；
+    RGBA 图的透明度写入调色板透明表（PNG tRNS）。
+    """
+    source = image if image.mode in ("RGB", "RGBA") else image.convert("RGBA")
+    if source.getcolors(maxcolors=max_colors) is None:
+        return None
+    import numpy as np
+    from PIL import Image
+
+    pixels = np.asarray(source, dtype=np.uint32)
+    packed = pixels[..., 0]
+    for channel in range(1, pixels.shape[-1]):
+        packed = (packed << 8) | pixels[..., channel]
+    colors, indices = np.unique(packed, return_inverse=True)
+    paletted = Image.fromarray(indices.reshape(packed.shape).astype(np.uint8), "P")
+    shifts = [8 * (len(source.mode) - 1 - channel) for channel in range(len(source.mode))]
+    channels = [((colors >> shift) & 0xFF).astype(np.uint8) for shift in shifts]
+    paletted.putpalette(np.stack(channels[:3], axis=1).tobytes(), rawmode="RGB")
+    if source.mode == "RGBA":
+        paletted.info["transparency"] = channels[3].tobytes()
+    return paletted
+
+
+def _flatten_alpha(image: Any) -> Any:
+    """JPEG 不支持透明通道：合成到白色背景。"""
+    if image.mode in ("RGBA", "LA", "P"):
+        from PIL import Image
+
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _save_kwargs(options: EncodingOptions) -> Dict[str, Any]:
+    if options.image_format == "png":
+        kwargs: Dict[str, Any] = {"optimize": False}
+        if options.png_compress_level is not None:
+            kwargs["compress_level"] = options.png_compress_level
+        return kwargs
+    if options.image_format == "webp":
+        return {"quality": options.quality, "lossless": options.quality >= 100, "method": 4}
+    return {"quality": options.quality, "optimize": True}
+
+
+def prepare_image(image: Any, options: EncodingOptions) -> Tuple[Any, bool]:
+    """按选项做调色板量化/去透明，返回 (待写出的图像, 是否量化为调色板)。"""
+    if options.image_format == "jpeg":
+        return _flatten_alpha(image), False
+    if options.palette_max_colors:
+        quantized = _quantize(image, options.palette_max_colors)
+        if quantized is not None:
+            return quantized, True
+    return image, False
+
+
+def save_image(image: Any, root: str, options: EncodingOptions) -> Tuple[str, int]:
+    """把 PIL 图像按目标格式写到 `root + 扩展名`（先写临时文件再替换），返回 (路径, 字节数)。"""
+    target = root + _EXTENSIONS[options.image_format]
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        image.save(tmp_path, format=options.image_format.upper(), **_save_kwargs(options))
+        os.replace(tmp_path, target)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return target, os.path.getsize(target)
+
+
+def encode_file(
+    path: str, options: EncodingOptions, keep_original: bool = False
+) -> Tuple[str, Dict[str, Any]]:
+    """按选项重编码一个 PNG 文件，返回 (最终路径, 统计)。
+
+    目标仍为 PNG 时只在结果更小时替换原文件；转为 WebP/JPEG 时删除原 PNG
+    （`keep_original=True` 时保留）。
+    """
+    from PIL import Image
+
+    started = time.perf_counter()
+    original_bytes = os.path.getsize(path)
+    with Image.open(path) as opened:
+        image = opened.copy()
+    image, palette = prepare_image(image, options)
+
+    root = os.path.splitext(path)[0]
+    if options.image_format == "png":
+        # 先写到旁路文件，比原文件小才替换。
+        candidate, new_bytes = save_image(image, f"{root}.reencode", options)
+        if new_bytes < original_bytes:
+            os.replace(candidate, path)
+        else:
+            os.remove(candidate)
+            new_bytes = original_bytes
+        target = path
+    else:
+        target, new_bytes = save_image(image, root, options)
+        if not keep_original:
+            os.remove(path)
+    return target, {
+        "file": os.path.basename(target),
+        "format": options.image_format,
+        "originalBytes": original_bytes,
+        "palette": palette,
+        "bytes": new_bytes,
+        "savedBytes": original_bytes - new_bytes,
+        "encodeMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _inside(path: str, folder: str) -> bool:
+    folder = os.path.abspath(folder)
+    return os.path.commonpath([os.path.abspath(path), folder]) == folder
+
+
+def encode_outputs(
+    chart_files: List[str],
+    options: EncodingOptions,
+    output_dir: str,
+    keep_originals: Collection[str] = (),
+) -> Tuple[List[str], Dict[str, Any]]:
+    """对输出目录内的 PNG 产物逐个重编码，返回 (新的产物列表, 汇总统计)。
+
+    `keep_originals` 中的文件（用户显式保存的图片）转格式后保留原 PNG。
+    """
+    keep = {os.path.abspath(path) for path in keep_originals}
+    result_files: List[str] = []
+    files: List[Dict[str, Any]] = []
+    renamed: Dict[str, str] = {}
+    for path in chart_files:
+        if (
+            not path.lower().endswith(".png")
+            or not _inside(path, output_dir)
+            or not os.path.isfile(path)
+        ):
+            result_files.append(path)
+            continue
+        try:
+            target, stats = encode_file(
+                path, options, keep_original=os.path.abspath(path) in keep
+            )
+        except Exception as error:
+            files.append({"file": os.path.basename(path), "error": f"{type(error).__name__}: {error}"})
+            result_files.append(path)
+            continue
+        files.append(stats)
+        result_files.append(target)
+        if target != path:
+            renamed[path] = target
+    summary = options.describe()
+    summary.update(
+        files=files,
+        renamed=renamed,
+        savedBytes=sum(item.get("savedBytes", 0) for item in files),
+        encodeMs=round(sum(item.get("encodeMs", 0.0) for item in files), 1),
+    )
+    return result_files, summary
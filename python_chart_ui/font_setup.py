@@ -0,0 +1,288 @@
+"""matplotlib 中文字体配置（工具与配置页共用）。
+
+支持两种模式：
+- eager：注册全部候选字体，与早期行为一致。
+- lazy：只注册第一个验证通过的中文字体；其余候选在渲染时出现缺字
+  （matplotlib 报告 glyph missing）时才注册并追加到回退字体列表。
+
+解析结果（字体名、路径、rcParams 组合）按模式缓存在进程内，字体目录未变化时
+后续调用只需一次 `rcParams.update`，与字体数量无关。
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any, Dict, List, Optional, Tuple
+
+from python_chart_ui.fonts import FONT_EXTENSIONS
+from python_chart_ui.fonts import SYSTEM_FONT_WHITELIST
+from python_chart_ui.fonts import collect_chinese_font_candidates
+from python_chart_ui.fonts import plugin_font_dirs
+from python_chart_ui.mpl_cache import ensure_plugin_fonts_registered
+from python_chart_ui.mpl_cache import prepare_mplconfig_dir
+
+FONT_MODE_EAGER = "eager"
+FONT_MODE_LAZY = "lazy"
+FONT_MODES = (FONT_MODE_EAGER, FONT_MODE_LAZY)
+DEFAULT_FONT_MODE = FONT_MODE_LAZY
+
+# 若未找到可注册字体，则保留一组常见字体名，交给系统字体回退。
+FALLBACK_FAMILY_NAMES = (
+    "Noto Sans CJK SC",
+    "Noto Sans CJK",
+    "Source Han Sans CN",
+    "Droid Sans Fallback",
+    "sans-serif",
+)
+
+_lock = threading.RLock()
+
+
+@dataclass
+class FontSetupSnapshot:
+    """一次字体解析的结果快照。"""
+
+    mode: str
+    font_name: str
+    font_path: str
+    rc_params: Dict[str, Any]
+    resolved_names: List[str]
+    pending_fallback_paths: List[str] = field(default_factory=list)
+    scanned: int = 0
+    cjk_ready: int = 0
+    dirs_signature: Tuple[Any, ...] = ()
+
+    def message(self) -> str:
+        """生成与早期格式一致的配置摘要。"""
+        counts = (
+            f"scanned={self.scanned}, cjkReady={self.cjk_ready}, "
+            f"loaded={len(self.resolved_names)}"
+        )
+        if self.mode == FONT_MODE_LAZY:
+            counts += f", deferred={len(self.pending_fallback_paths)}"
+        if self.font_name:
+            return (
+                f"matplotlib font ready: name={self.font_name}, path={self.font_path}, "
+                f"{counts}"
+            )
+        return f"matplotlib font fallback ready ({counts})"
+
+
+_snapshots: Dict[str, FontSetupSnapshot] = {}
+
+
+def _file_signature(path: str) -> Tuple[Any, ...]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, stat.st_size, stat.st_mtime_ns)
+
+
+def _font_dirs_signature() -> Tuple[Any, ...]:
+    """字体目录签名：递归列出各字体文件的 (路径, 大小, mtime) 与白名单字体状态。
+
+    只看目录 mtime 时，子目录中增删字体或原地替换同名字体都不会改变签名。
+    """
+    parts: List[Any] = []
+    for folder in plugin_font_dirs():
+        if not os.path.isdir(folder):
+            parts.append((folder, None, None))
+            continue
+        for walk_root, dirs, files in os.walk(folder):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(FONT_EXTENSIONS):
+                    parts.append(_file_signature(os.path.join(walk_root, name)))
+    for path in SYSTEM_FONT_WHITELIST:
+        parts.append(_file_signature(path))
+    return tuple(parts)
+
+
+def _build_rc_params(
+    resolved_names: List[str],
+    selected_font_name: str,
+    with_fallbacks: bool = False,
+) -> Dict[str, Any]:
+    """生成字体相关的 rcParams 组合。
+
+    `with_fallbacks=True` 时把其余已注册字体追加到 font.family，
+    供 matplotlib 按字形逐个回退。
+    """
+    final_names = resolved_names + [
+        name for name in FALLBACK_FAMILY_NAMES if name not in resolved_names
+    ]
+    # 关键：优先把 family 指向具体字体名，避免落到 DejaVu Sans 这类无中文字形字体。
+    if selected_font_name:
+        family = [selected_font_name]
+        if with_fallbacks:
+            family += [name for name in resolved_names if name != selected_font_name]
+    else:
+        family = ["sans-serif"]
+    return {
+        "font.family": family,
+        "font.sans-serif": final_names,
+        "axes.unicode_minus": False,
+    }
+
+
+def _resolve(matplotlib: Any, font_manager: Any, mode: str) -> FontSetupSnapshot:
+    """扫描候选字体并按模式注册，返回快照。"""
+    dirs_signature = _font_dirs_signature()
+    candidates = collect_chinese_font_candidates()
+    cjk_ready_count = sum(1 for candidate in candidates if candidate.supports_cjk)
+
+    if mode == FONT_MODE_LAZY and font_manager is not None:
+        primary = next((item for item in candidates if item.supports_cjk), None)
+        if primary is not None:
+            try:
+                names = ensure_plugin_fonts_registered(
+                    matplotlib, font_manager, [primary.path]
+                )
+            except Exception:
+                names = {}
+            font_name = names.get(primary.path, "")
+            if font_name:
+                return FontSetupSnapshot(
+                    mode=mode,
+                    font_name=font_name,
+                    font_path=primary.path,
+                    rc_params=_build_rc_params([font_name], font_name),
+                    resolved_names=[font_name],
+                    pending_fallback_paths=[
+                        item.path for item in candidates if item.path != primary.path
+                    ],
+                    scanned=len(candidates),
+                    cjk_ready=cjk_ready_count,
+                    dirs_signature=dirs_signature,
+                )
+        # 没有验证通过的中文字体时，lazy 无从挑选，退回全量注册。
+
+    # 字体注册结果持久化在插件管理的 MPLCONFIGDIR 中，这里只对新增/变化的字体 addfont，
+    # 并直接从 fontManager 条目读取字体名，避免每次重新打开字体文件。
+    font_names: Dict[str, str] = {}
+    if font_manager is not None:
+        try:
+            font_names = ensure_plugin_fonts_registered(
+                matplotlib,
+                font_manager,
+                [candidate.path for candidate in candidates],
+            )
+        except Exception:
+            font_names = {}
+
+    resolved_names: List[str] = []
+    selected_font_name = ""
+    selected_font_path = ""
+    for candidate in candidates:
+        font_name = font_names.get(candidate.path, "")
+        if not font_name:
+            continue
+        if font_name not in resolved_names:
+            resolved_names.append(font_name)
+        if candidate.supports_cjk and not selected_font_name:
+            selected_font_name = font_name
+            selected_font_path = candidate.path
+
+    # 没找到“验证通过”的中文字体时，降级使用第一个成功注册字体。
+    if not selected_font_name and resolved_names:
+        selected_font_name = resolved_names[0]
+
+    return FontSetupSnapshot(
+        mode=mode,
+        font_name=selected_font_name,
+        font_path=selected_font_path,
+        rc_params=_build_rc_params(resolved_names, selected_font_name),
+        resolved_names=resolved_names,
+        scanned=len(candidates),
+        cjk_ready=cjk_ready_count,
+        dirs_signature=dirs_signature,
+    )
+
+
+def _activate_fallback_fonts(matplotlib: Any, font_manager: Any) -> None:
+    """缺字时注册 lazy 快照中推迟的候选字体，并追加到字体回退列表。"""
+    with _lock:
+        snapshot = _snapshots.get(FONT_MODE_LAZY)
+        if snapshot is None or not snapshot.pending_fallback_paths:
+            return
+        pending = snapshot.pending_fallback_paths
+        snapshot.pending_fallback_paths = []
+        try:
+            names = ensure_plugin_fonts_registered(matplotlib, font_manager, pending)
+        except Exception:
+            return
+        for path in pending:
+            font_name = names.get(path, "")
+            if font_name and font_name not in snapshot.resolved_names:
+                snapshot.resolved_names.append(font_name)
+        snapshot.rc_params = _build_rc_params(
+            snapshot.resolved_names, snapshot.font_name, with_fallbacks=True
+        )
+        try:
+            matplotlib.rcParams.update(snapshot.rc_params)
+        except Exception:
+            pass
+
+
+def _install_glyph_fallback_hook(matplotlib: Any, font_manager: Any) -> None:
+    """包装 matplotlib 的缺字告警入口，作为按需注册回退字体的触发点。
+
+    ft2font 每次缺字都会按模块属性查找 `_text_helpers.warn_on_missing_glyph`，
+    因此替换模块属性即可生效；当前这次绘制仍会缺字，后续绘制使用回退字体。
+    """
+    helpers = sys.modules.get("matplotlib._text_helpers")
+    if helpers is None:
+        try:
+            helpers = __import__("matplotlib._text_helpers", fromlist=["_text_helpers"])
+        except Exception:
+            return
+    original = getattr(helpers, "warn_on_missing_glyph", None)
+    if original is None or getattr(original, "_chart_font_fallback", False):
+        return
+
+    def _wrapped(*args, **kwargs):
+        _activate_fallback_fonts(matplotlib, font_manager)
+        return original(*args, **kwargs)
+
+    _wrapped._chart_font_fallback = True
+    helpers.warn_on_missing_glyph = _wrapped
+
+
+def setup_matplotlib_chinese(mode: Optional[str] = None) -> str:
+    """配置 matplotlib 中文字体，返回配置摘要。"""
+    mode = mode if mode in FONT_MODES else DEFAULT_FONT_MODE
+    prepare_mplconfig_dir()
+    try:
+        import matplotlib
+    except Exception:
+        return "matplotlib: missing"
+
+    try:
+        matplotlib.use("Agg")
+    except Exception:
+        pass
+
+    try:
+        from matplotlib import font_manager
+    except Exception:
+        font_manager = None
+
+    with _lock:
+        snapshot = _snapshots.get(mode)
+        reused = snapshot is not None and snapshot.dirs_signature == _font_dirs_signature()
+        if not reused:
+            snapshot = _resolve(matplotlib, font_manager, mode)
+            _snapshots[mode] = snapshot
+        try:
+            matplotlib.rcParams.update(snapshot.rc_params)
+        except Exception as error:
+            return f"matplotlib font setup failed: {error}"
+        if snapshot.pending_fallback_paths and font_manager is not None:
+            _install_glyph_fallback_hook(matplotlib, font_manager)
+        message = snapshot.message()
+    return f"{message}, snapshot=reused" if reused else message
@@ -0,0 +1,272 @@
+"""中文字体候选发现（工具与配置页共用）。
+
+字体是否包含中文字形的检测需要打开字体文件，对大体积 CJK 字体开销较高。
+这里把检测结果按 (路径, 大小, mtime) 缓存到 `runtime/font_candidates.json`，
+字体文件未变化时新进程可以完全跳过字形检测。
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from python_chart_ui.paths import plugin_root
+from python_chart_ui.paths import read_json
+from python_chart_ui.paths import runtime_dir
+from python_chart_ui.paths import write_json_atomic
+from python_chart_ui.sfnt import font_has_codepoints
+
+FONT_CACHE_VERSION = 1
+FONT_CACHE_FILE = "font_candidates.json"
+
+REQUIRED_CHARS = ("中", "文", "图", "表", "月")
+
+# 重要：
+# Android 上对 /system/fonts 全量扫描并 addfont，容易在部分机型触发 ft2font 原生崩溃。
+# 这里不再遍历系统字体目录，只使用：
+# 1) 插件内字体目录（推荐）
+# 2) 少量系统白名单字体路径（存在才加入）
+SYSTEM_FONT_WHITELIST = (
+    "/system/fonts/NotoSansCJK-Regular.ttc",
+    "/system/fonts/NotoSansSC-Regular.otf",
+    "/system/fonts/SourceHanSansCN-Regular.otf",
+    "/system/fonts/DroidSansFallback.ttf",
+)
+
+PREFERRED_NAMES = (
+    "harmony",
+    "hmos",
+    "NotoSansCJK",
+    "NotoSansSC",
+    "SourceHanSans",
+    "DroidSansFallback",
+    "MiSans",
+    "PingFang",
+    "simhei",
+    "msyh",
+)
+
+FONT_EXTENSIONS = (".ttf", ".ttc", ".otf")
+
+_cache_lock = threading.Lock()
+
+
+@dataclass
+class FontCandidate:
+    """候选字体信息。"""
+
+    path: str
+    source_order: int
+    preferred_hit: bool
+    supports_cjk: bool
+
+
+def plugin_font_dirs(root: Optional[str] = None) -> List[str]:
+    """返回插件内字体目录列表（按优先级排序）。"""
+    base = root or plugin_root()
+    return [
+        os.path.join(base, "assets", "fonts"),
+        os.path.join(base, "libs", "fonts"),
+    ]
+
+
+def font_supports_chinese(font_path: str) -> bool:
+    """检测字体是否包含常见中文字符。
+
+    优先使用 mmap cmap 探测；无法判定时回退到 fontTools 完整解析。
+    """
+    required_codes = {ord(ch) for ch in REQUIRED_CHARS}
+    verdict = font_has_codepoints(font_path, required_codes)
+    if verdict is not None:
+        return verdict
+
+    try:
+        from fontTools.ttLib import TTCollection
+        from fontTools.ttLib import TTFont
+    except Exception:
+        return False
+
+    def _font_has_required_codes(font_obj: Any) -> bool:
+        cmap_table = getattr(font_obj, "cmap", None)
+        if cmap_table is None:
+            return False
+        covered = set()
+        for table in getattr(cmap_table, "tables", []):
+            cmap = getattr(table, "cmap", None) or {}
+            covered.update(cmap.keys())
+            if required_codes.issubset(covered):
+                return True
+        return False
+
+    try:
+        lower_name = os.path.basename(font_path).lower()
+        if lower_name.endswith(".ttc"):
+            collection = TTCollection(font_path, lazy=True)
+            try:
+                for font_obj in collection.fonts:
+                    if _font_has_required_codes(font_obj):
+                        return True
+            finally:
+                try:
+                    collection.close()
+                except Exception:
+                    pass
+            return False
+
+        font_obj = TTFont(font_path, lazy=True)
+        try:
+            return _font_has_required_codes(font_obj)
+        finally:
+            try:
+                font_obj.close()
+            except Exception:
+                pass
+    except Exception:
+        return False
+
+
+def _file_signature(path: str) -> Optional[List[int]]:
+    """返回文件签名 [size, mtime_ns]，文件不可访问时返回 None。"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [int(stat.st_size), int(stat.st_mtime_ns)]
+
+
+class FontProbeCache:
+    """字体中文检测结果的磁盘缓存。
+
+    缓存条目以字体绝对路径为键，记录文件大小与 mtime；
+    二者任一变化即视为失效并重新检测。
+    """
+
+    def __init__(self, cache_path: Optional[str] = None) -> None:
+        self.cache_path = cache_path or runtime_dir(FONT_CACHE_FILE)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        data = read_json(self.cache_path)
+        if isinstance(data, dict) and data.get("version") == FONT_CACHE_VERSION:
+            entries = data.get("entries")
+            if isinstance(entries, dict):
+                self._entries = entries
+
+    def supports_chinese(self, font_path: str) -> bool:
+        """读取缓存结果，未命中或已失效时重新检测并写回缓存。"""
+        signature = _file_signature(font_path)
+        if signature is None:
+            return False
+        entry = self._entries.get(font_path)
+        if isinstance(entry, dict) and entry.get("signature") == signature:
+            return bool(entry.get("supportsCjk"))
+        supports_cjk = font_supports_chinese(font_path)
+        self._entries[font_path] = {
+            "signature": signature,
+            "supportsCjk": supports_cjk,
+        }
+        self._dirty = True
+        return supports_cjk
+
+    def prune(self, live_paths: List[str]) -> None:
+        """移除已不存在于候选集合中的条目。"""
+        live = set(live_paths)
+        for path in list(self._entries):
+            if path not in live:
+                del self._entries[path]
+                self._dirty = True
+
+    def save(self) -> None:
+        """有变更时落盘。"""
+        if not self._dirty:
+            return
+        if write_json_atomic(
+            self.cache_path,
+            {"version": FONT_CACHE_VERSION, "entries": self._entries},
+        ):
+            self._dirty = False
+
+
+def _is_preferred(path: str) -> bool:
+    """按文件名关键词判断是否为倾向使用的中文字体。"""
+    base_name = os.path.basename(path).lower()
+    return any(keyword.lower() in base_name for keyword in PREFERRED_NAMES)
+
+
+def collect_chinese_font_candidates(
+    root: Optional[str] = None,
+    use_cache: bool = True,
+) -> List[FontCandidate]:
+    """收集可用于 matplotlib 的中文字体候选。
+
+    `use_cache=False` 时强制对每个字体重新做字形检测。
+    """
+    paths: List[tuple] = []
+    seen = set()
+    for source_order, folder in enumerate(plugin_font_dirs(root)):
+        if not os.path.isdir(folder):
+            continue
+        for walk_root, _, files in os.walk(folder):
+            for name in files:
+                if not name.lower().endswith(FONT_EXTENSIONS):
+                    continue
+                full_path = os.path.abspath(os.path.join(walk_root, name))
+                if full_path in seen:
+                    continue
+                seen.add(full_path)
+                paths.append((full_path, source_order))
+
+    # 仅追加系统白名单字体，避免全量扫描系统目录导致 native 崩溃。
+    for full_path in SYSTEM_FONT_WHITELIST:
+        normalized = os.path.abspath(full_path)
+        if normalized in seen or not os.path.isfile(normalized):
+            continue
+        seen.add(normalized)
+        paths.append((normalized, 99))
+
+    result: List[FontCandidate] = []
+    with _cache_lock:
+        cache = FontProbeCache() if use_cache else None
+        for full_path, source_order in paths:
+            if cache is not None:
+                supports_cjk = cache.supports_chinese(full_path)
+            else:
+                supports_cjk = font_supports_chinese(full_path)
+            result.append(
+                FontCandidate(
+                    path=full_path,
+                    source_order=source_order,
+                    preferred_hit=_is_preferred(full_path),
+                    supports_cjk=supports_cjk,
+                )
+            )
+        if cache is not None:
+            cache.prune([item[0] for item in paths])
+            cache.save()
+
+    # 排序策略：
+    # 1) 先保证“实际支持中文字形”；
+    # 2) 再按命名关键词倾向中文字体；
+    # 3) 再按目录优先级（插件内字体 > 系统字体）。
+    result.sort(
+        key=lambda item: (
+            0 if item.supports_cjk else 1,
+            0 if item.preferred_hit else 1,
+            item.source_order,
+            os.path.basename(item.path).lower(),
+        )
+    )
+    return result
+
+
+def selected_font_identity(root: Optional[str] = None) -> Optional[List[Any]]:
+    """返回将被选中的中文字体的标识 [path, size, mtime_ns]（不导入 matplotlib）。
+
+    用于结果缓存键等需要感知“字体是否变化”的场景；没有候选字体时返回 None。
+    """
+    candidates = collect_chinese_font_candidates(root)
+    if not candidates:
+        return None
+    primary = candidates[0]
+    return [primary.path] + (_file_signature(primary.path) or [])
@@ -0,0 +1,124 @@
+"""内联返回图片（`returnMode: "inline"`）。
+
+默认每张图都写入输出目录，再由宿主读回；在 fsync 较慢的闪存上这一来回很明显。
+内联模式下，savefig（含自动保存）改为渲染到内存缓冲，图片以 base64 放入结果的
+`inlineImages`，不落盘；本次执行内联的总字节数超过 `inlineMaxBytes` 时，
+超出的图片把已渲染好的缓冲直接写到原目标路径（不重新渲染），照常出现在 `chartFiles` 中。
+
+宿主按 plugin.json 的 `outputLimit`（字符数）截断工具输出，截断后的 JSON 无法解析。
+`inlineMaxBytes` 为 0 时按 outputLimit 扣除其余字段的余量推导（base64 膨胀 4/3）；
+结果组装完成后若整体仍超出 outputLimit，再从最后一张起把内联图片改为写盘（`spill_last`）。
+
+内联图片不参与重编码与缩略图生成（这两步基于磁盘文件）。
+"""
+
+from __future__ import annotations
+
+import base64
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from python_chart_ui.paths import plugin_root
+from python_chart_ui.paths import read_json
+
+TOOL_NAME = "python_chart_exec"
+# plugin.json 缺失或未声明 outputLimit 时使用的值（与当前 plugin.json 一致）。
+DEFAULT_OUTPUT_LIMIT = 24000
+# 推导默认内联上限时留给 stdout/stderr 与其它结果字段的字符数。
+INLINE_HEADROOM_CHARS = 8000
+
+# 可内联的 savefig 格式及其 MIME 类型。
+INLINE_MIME_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "svg": "image/svg+xml",
+}
+
+
+def tool_output_limit() -> int:
+    """宿主对本工具输出的字符数上限（plugin.json 的 `outputLimit`）。"""
+    manifest = read_json(os.path.join(plugin_root(), "plugin.json"))
+    tools = manifest.get("tools") if isinstance(manifest, dict) else None
+    for tool in tools or []:
+        if isinstance(tool, dict) and tool.get("name") == TOOL_NAME:
+            try:
+                return int(tool.get("outputLimit") or DEFAULT_OUTPUT_LIMIT)
+            except (TypeError, ValueError):
+                break
+    return DEFAULT_OUTPUT_LIMIT
+
+
+def inline_max_bytes(value: Any, output_limit: Optional[int] = None) -> int:
+    """内联图片的原始总字节上限；未配置（0/None）时由 outputLimit 推导。"""
+    try:
+        configured = int(value or 0)
+    except (TypeError, ValueError):
+        configured = 0
+    if configured > 0:
+        return configured
+    limit = tool_output_limit() if output_limit is None else output_limit
+    # base64 每 3 字节编码为 4 个字符。
+    return max(0, limit - INLINE_HEADROOM_CHARS) * 3 // 4
+
+
+class InlineImageStore:
+    """一次执行中内联图片的收集与总字节上限控制。"""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self.total_bytes = 0
+        self.spilled: List[str] = []
+        self._images: List[Dict[str, Any]] = []
+        self._paths: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, path: str, file_format: str, data: bytes) -> bool:
+        """在上限内时收下图片并返回 True；超出上限返回 False，由调用方写盘。"""
+        with self._lock:
+            if self.total_bytes + len(data) > self.max_bytes:
+                self.spilled.append(os.path.abspath(path))
+                return False
+            self.total_bytes += len(data)
+            self._images.append(
+                {
+                    "name": os.path.basename(path),
+                    "mimeType": INLINE_MIME_TYPES.get(file_format, "application/octet-stream"),
+                    "bytes": len(data),
+                    "data": base64.b64encode(data).decode("ascii"),
+                }
+            )
+            self._paths.append(os.path.abspath(path))
+            return True
+
+    def spill_last(self) -> Optional[str]:
+        """把最后一张内联图片写到其原目标路径并移出内联列表，返回该路径。"""
+        with self._lock:
+            if not self._images:
+                return None
+            image = self._images.pop()
+            path = self._paths.pop()
+            self.total_bytes -= image["bytes"]
+            self.spilled.append(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as handle:
+            handle.write(base64.b64decode(image["data"]))
+        return path
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def images(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._images)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "images": len(self._images),
+                "bytes": self.total_bytes,
+                "maxBytes": self.max_bytes,
+                "spilled": len(self.spilled),
+            }
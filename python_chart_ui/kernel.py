@@ -0,0 +1,598 @@
+"""常驻预热图表执行进程（warm kernel / zygote）。
+
+工具每次调用都要重新导入 numpy/pandas/matplotlib/seaborn/plotly，这部分耗时
+通常占据大部分延迟。kernel 模式下由一个长驻子进程预先导入这些库并完成字体
+配置，工具入口通过本地 socket 把 payload 转发给它执行；每次执行仍使用全新的
+exec_scope、输出目录与保存入口补丁（由工具脚本的 `_run_local` 负责）。
+
+两种形态（flavor）：
+- warm：在同一个预热解释器内串行执行，延迟最低，但 rcParams、猴子补丁、
+  泄漏的全局状态可能影响后续执行。执行期间不接受新连接，其它调用握手超时后
+  回退本地执行；单次执行超过请求超时时整个 kernel 被结束，下次调用重新拉起。
+- fork：预热进程只作为 zygote，每个请求 fork 一个子进程执行，子进程拿到
+  写时复制的干净镜像，执行完即退出，实现逐次隔离。
+
+启动方式：`python -m python_chart_ui.kernel --tool <tools/python_chart_exec.py>`，
+通常由 `ensure_kernel_started` 在后台拉起，空闲超时后自动退出。
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+import secrets
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Connection
+from multiprocessing.connection import Listener
+from multiprocessing.connection import answer_challenge
+from multiprocessing.connection import deliver_challenge
+from typing import Any, Callable, Dict, Optional
+
+from python_chart_ui.paths import plugin_root
+from python_chart_ui.paths import read_json
+from python_chart_ui.paths import runtime_dir
+from python_chart_ui.paths import write_json_atomic
+
+KERNEL_DIR_NAME = "kernel"
+FLAVOR_WARM = "warm"
+FLAVOR_FORK = "fork"
+FLAVORS = (FLAVOR_WARM, FLAVOR_FORK)
+STATE_FILE = "kernel.json"
+LOG_FILE = "kernel.log"
+SPAWN_LOCK_FILE = "spawn.lock"
+SOCKET_FILE = "kernel.sock"
+
+# 预热导入的模块；导入失败的模块会被跳过。
+PRELOAD_MODULES = ("numpy", "pandas", "matplotlib.pyplot", "seaborn", "plotly")
+
+# 拉起进程后 spawn 锁的有效期（秒），超过视为残留锁。
+SPAWN_LOCK_TTL_SEC = 120
+PING_TIMEOUT_SEC = 2.0
+# 连接与鉴权握手的最长时间（秒）。warm kernel 执行任务期间不会 accept，
+# 握手超时即视为忙碌，调用方回退本地执行而不是一直阻塞。
+CONNECT_TIMEOUT_SEC = 2.0
+
+
+class KernelError(RuntimeError):
+    """请求已发送给 kernel，但没有得到正常结果。"""
+
+
+class KernelTimeoutError(KernelError):
+    """请求已发送但在超时时间内没有收到 kernel 结果。"""
+
+
+class KernelBusyError(KernelError):
+    """kernel 在线但没有在握手时限内接受连接（正在执行其它任务或已卡住），请求未发送。"""
+
+
+def fork_supported() -> bool:
+    """当前平台是否支持 fork 形态。"""
+    return hasattr(os, "fork")
+
+
+def kernel_dir(flavor: str, *parts: str) -> str:
+    """返回指定形态 kernel 的状态目录下的路径。"""
+    folder = runtime_dir(KERNEL_DIR_NAME, flavor)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, *parts)
+
+
+def _read_state(flavor: str) -> Optional[Dict[str, Any]]:
+    """读取 kernel 监听地址与鉴权信息。"""
+    state = read_json(kernel_dir(flavor, STATE_FILE))
+    if not isinstance(state, dict) or not state.get("address"):
+        return None
+    return state
+
+
+def _set_io_timeout(sock: socket.socket, timeout: float) -> None:
+    """为阻塞模式的 socket 设置内核级收发超时（Connection 直接读写文件描述符）。"""
+    seconds = int(timeout)
+    value = struct.pack("ll", seconds, int((timeout - seconds) * 1_000_000))
+    for option in (socket.SO_RCVTIMEO, socket.SO_SNDTIMEO):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, option, value)
+        except OSError:
+            pass
+
+
+def _connect(state: Dict[str, Any], timeout: Optional[float] = None) -> Connection:
+    """按状态文件连接 kernel 并完成鉴权握手。
+
+    与 `multiprocessing.connection.Client` 相同的握手流程，但连接与握手都有时限：
+    连接失败抛出 OSError，握手超时抛出 `KernelBusyError`。
+    """
+    family = str(state.get("family", "AF_UNIX"))
+    address = state["address"]
+    if family == "AF_INET":
+        address = (str(address[0]), int(address[1]))
+    authkey = bytes.fromhex(str(state.get("authkey", "")))
+    if timeout is None:
+        timeout = CONNECT_TIMEOUT_SEC
+    sock = socket.socket(getattr(socket, family))
+    try:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        # 恢复阻塞模式，改用 SO_RCVTIMEO/SO_SNDTIMEO 约束握手期间的读写。
+        sock.settimeout(None)
+        _set_io_timeout(sock, timeout)
+    except Exception:
+        sock.close()
+        raise
+    conn = Connection(sock.detach())
+    try:
+        answer_challenge(conn, authkey)
+        deliver_challenge(conn, authkey)
+    except (BlockingIOError, socket.timeout) as error:
+        conn.close()
+        raise KernelBusyError(f"kernel did not accept within {timeout}s") from error
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def request(
+    message: Dict[str, Any],
+    timeout: float,
+    flavor: str = FLAVOR_WARM,
+) -> Optional[Dict[str, Any]]:
+    """向 kernel 发送一条消息并等待回复。
+
+    无法连接时返回 None（调用方可回退本地执行）；握手超时抛出 `KernelBusyError`；
+    已发送但超时未回复时抛出 `KernelTimeoutError`，连接被中途关闭
+    （例如 fork 子进程崩溃）时抛出 `KernelError`。
+    """
+    state = _read_state(flavor)
+    if state is None:
+        return None
+    try:
+        conn = _connect(state)
+    except KernelBusyError:
+        raise
+    except Exception:
+        return None
+    try:
+        try:
+            conn.send(message)
+        except Exception:
+            return None
+        if not conn.poll(timeout):
+            raise KernelTimeoutError(f"kernel did not reply within {timeout}s")
+        try:
+            reply = conn.recv()
+        except EOFError:
+            raise KernelError("kernel closed the connection without a result")
+        return reply if isinstance(reply, dict) else None
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def is_alive(flavor: str = FLAVOR_WARM) -> bool:
+    """检测 kernel 是否在线。"""
+    try:
+        reply = request({"op": "ping"}, timeout=PING_TIMEOUT_SEC, flavor=flavor)
+    except (KernelBusyError, KernelTimeoutError):
+        # 正在执行任务的 warm kernel 不会及时响应 ping，但仍然在线。
+        return True
+    except KernelError:
+        return False
+    return bool(reply and reply.get("ok"))
+
+
+def _acquire_spawn_lock(flavor: str) -> bool:
+    """获取拉起锁，避免多个调用同时拉起多个 kernel。"""
+    lock_path = kernel_dir(flavor, SPAWN_LOCK_FILE)
+    try:
+        if time.time() - os.path.getmtime(lock_path) > SPAWN_LOCK_TTL_SEC:
+            os.remove(lock_path)
+    except OSError:
+        pass
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except OSError:
+        return False
+    os.close(fd)
+    return True
+
+
+def _release_spawn_lock(flavor: str) -> None:
+    try:
+        os.remove(kernel_dir(flavor, SPAWN_LOCK_FILE))
+    except OSError:
+        pass
+
+
+def ensure_kernel_started(
+    tool_path: str,
+    idle_timeout_sec: float,
+    flavor: str = FLAVOR_WARM,
+) -> bool:
+    """确保 kernel 已在线；未在线时后台拉起并返回 False（本次应本地执行）。"""
+    if flavor == FLAVOR_FORK and not fork_supported():
+        return False
+    if is_alive(flavor):
+        return True
+    if not _acquire_spawn_lock(flavor):
+        return False
+    env = dict(os.environ)
+    python_path = env.get("PYTHONPATH", "")
+    env["PYTHONPATH"] = (
+        plugin_root() + (os.pathsep + python_path if python_path else "")
+    )
+    try:
+        log_handle = open(kernel_dir(flavor, LOG_FILE), "ab")
+    except OSError:
+        _release_spawn_lock(flavor)
+        return False
+    try:
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "python_chart_ui.kernel",
+                "--tool",
+                os.path.abspath(tool_path),
+                "--idle-timeout",
+                str(float(idle_timeout_sec)),
+                "--flavor",
+                flavor,
+            ],
+            stdin=subprocess.DEVNULL,
+            stdout=log_handle,
+            stderr=subprocess.STDOUT,
+            cwd=plugin_root(),
+            env=env,
+            close_fds=True,
+            start_new_session=True,
+        )
+    except Exception:
+        _release_spawn_lock(flavor)
+        return False
+    finally:
+        log_handle.close()
+    return False
+
+
+def run_in_kernel(
+    payload: Dict[str, Any],
+    cwd: str,
+    timeout: float,
+    flavor: str = FLAVOR_WARM,
+    output_dir: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """把工具 payload 转发给 kernel 执行，返回与本地执行一致的结果结构。
+
+    `output_dir` 为调用方预先创建的输出目录，kernel 直接使用它（而不是自行创建），
+    这样 kernel 超时或崩溃时调用方仍知道该释放哪个运行登记。
+
+    无法连接或 kernel 忙碌（握手超时，请求未发送）时返回 None；请求已送达但未得到
+    结果时抛出 `KernelError`。warm kernel 超时未回复时会被结束（无法只中断其中的
+    用户代码），下次调用重新拉起；fork 形态由 zygote 按截止时间杀掉子进程。
+    """
+    try:
+        reply = request(
+            {
+                "op": "run",
+                "payload": payload,
+                "cwd": cwd,
+                "timeout": timeout,
+                "outputDir": output_dir,
+            },
+            timeout=timeout,
+            flavor=flavor,
+        )
+    except KernelBusyError:
+        return None
+    except KernelTimeoutError:
+        if flavor == FLAVOR_WARM:
+            kill_kernel(flavor)
+        raise
+    if reply is None:
+        return None
+    result = reply.get("result")
+    if not isinstance(result, dict):
+        raise KernelError(str(reply.get("error") or "kernel returned no result"))
+    return result
+
+
+def kill_kernel(flavor: str = FLAVOR_WARM) -> bool:
+    """强制结束 kernel 进程组（卡在用户代码中、无法响应 shutdown 时使用）并清理状态文件。"""
+    state = _read_state(flavor)
+    if state is None:
+        return False
+    try:
+        pid = int(state.get("pid") or 0)
+    except (TypeError, ValueError):
+        pid = 0
+    killed = False
+    if pid > 0 and pid != os.getpid():
+        killpg = getattr(os, "killpg", None)
+        try:
+            # kernel 以 start_new_session 启动，进程组 id 即其 pid。
+            if killpg is not None:
+                killpg(pid, signal.SIGKILL)
+            else:
+                os.kill(pid, signal.SIGKILL)
+            killed = True
+        except OSError:
+            killed = False
+    try:
+        os.remove(kernel_dir(flavor, STATE_FILE))
+    except OSError:
+        pass
+    if state.get("family") == "AF_UNIX":
+        try:
+            os.remove(str(state.get("address")))
+        except OSError:
+            pass
+    return killed
+
+
+def shutdown_kernel(flavor: str = FLAVOR_WARM) -> bool:
+    """请求 kernel 退出。"""
+    try:
+        reply = request({"op": "shutdown"}, timeout=PING_TIMEOUT_SEC, flavor=flavor)
+    except KernelError:
+        return False
+    return bool(reply and reply.get("ok"))
+
+
+def load_tool_module(tool_path: str):
+    """按文件路径加载工具脚本模块。"""
+    spec = importlib.util.spec_from_file_location("_python_chart_exec_tool", tool_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"cannot load tool script: {tool_path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def preload_chart_stack() -> Dict[str, float]:
+    """导入图表库并完成字体配置，返回各步骤耗时（毫秒）。"""
+    from python_chart_ui.font_setup import setup_matplotlib_chinese
+    from python_chart_ui.mpl_cache import prepare_mplconfig_dir
+
+    timings: Dict[str, float] = {}
+    prepare_mplconfig_dir()
+    for name in PRELOAD_MODULES:
+        started = time.perf_counter()
+        try:
+            __import__(name)
+        except Exception:
+            continue
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    started = time.perf_counter()
+    setup_matplotlib_chinese()
+    timings["fontSetup"] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+def _listen_address(flavor: str):
+    """优先使用 Unix socket；路径过长或平台不支持时退回本地回环 TCP。"""
+    socket_path = kernel_dir(flavor, SOCKET_FILE)
+    if hasattr(socket, "AF_UNIX") and len(socket_path) < 100:
+        try:
+            os.remove(socket_path)
+        except OSError:
+            pass
+        return "AF_UNIX", socket_path
+    return "AF_INET", ("127.0.0.1", 0)
+
+
+def _safe_send(conn, reply: Dict[str, Any]) -> None:
+    """发送回复；结果不可序列化时把 `result` 降级为 repr 再发送。"""
+    try:
+        conn.send(reply)
+        return
+    except Exception:
+        pass
+    result = reply.get("result")
+    if isinstance(result, dict):
+        result = dict(result)
+        result["result"] = repr(result.get("result"))
+        reply = dict(reply, result=result)
+    conn.send(reply)
+
+
+def _handle_run(conn, message: Dict[str, Any], run_handler: Callable) -> None:
+    """在当前进程内执行一次 run 请求并回复结果。"""
+    cwd = message.get("cwd")
+    if cwd and os.path.isdir(cwd):
+        os.chdir(cwd)
+    kwargs = {"output_dir": message["outputDir"]} if message.get("outputDir") else {}
+    result = run_handler(dict(message.get("payload") or {}), **kwargs)
+    _safe_send(conn, {"ok": True, "result": result})
+
+
+def _fork_run(conn, message: Dict[str, Any], run_handler: Callable) -> int:
+    """zygote：fork 子进程执行 run 请求，父进程立即返回子进程 pid。
+
+    子进程继承已预热的解释器镜像（写时复制），执行完直接 `os._exit`，
+    不会把任何状态带回父进程。
+    """
+    pid = os.fork()
+    if pid:
+        return pid
+    exit_code = 1
+    try:
+        try:
+            _handle_run(conn, message, run_handler)
+            exit_code = 0
+        except Exception as error:
+            try:
+                _safe_send(conn, {"ok": False, "error": str(error)})
+            except Exception:
+                pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+    finally:
+        os._exit(exit_code)
+
+
+def serve(
+    tool_path: str,
+    idle_timeout_sec: float,
+    flavor: str = FLAVOR_WARM,
+    handler: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+) -> None:
+    """kernel 主循环：预热后处理请求，空闲超时后退出。
+
+    warm 形态在本进程内串行执行；fork 形态为每个 run 请求 fork 子进程，
+    父进程只负责接收请求、回收子进程与清理超时子进程。
+    """
+    if flavor == FLAVOR_FORK and not fork_supported():
+        flavor = FLAVOR_WARM
+    timings = preload_chart_stack()
+    tool = load_tool_module(tool_path)
+    run_handler = handler or getattr(tool, "_run_local")
+
+    family, address = _listen_address(flavor)
+    authkey = secrets.token_bytes(32)
+    listener = Listener(address, family=family, authkey=authkey)
+    actual_address = listener.address
+    state_path = kernel_dir(flavor, STATE_FILE)
+    write_json_atomic(
+        state_path,
+        {
+            "pid": os.getpid(),
+            "flavor": flavor,
+            "family": family,
+            "address": list(actual_address) if family == "AF_INET" else actual_address,
+            "authkey": authkey.hex(),
+            "toolPath": tool_path,
+            "startedAt": time.time(),
+            "preloadMs": timings,
+        },
+    )
+    try:
+        os.chmod(state_path, 0o600)
+    except OSError:
+        pass
+    _release_spawn_lock(flavor)
+    print(
+        f"[python_chart_kernel] ready flavor={flavor} pid={os.getpid()} preloadMs={timings}",
+        flush=True,
+    )
+
+    last_activity = [time.monotonic()]
+    busy = threading.Event()
+    # fork 形态下的在途子进程：pid -> 截止时间（monotonic）。
+    children: Dict[int, float] = {}
+    children_lock = threading.Lock()
+
+    def _reap_children() -> None:
+        now = time.monotonic()
+        with children_lock:
+            for pid, deadline in list(children.items()):
+                try:
+                    done_pid, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done_pid = pid
+                if done_pid:
+                    children.pop(pid, None)
+                    last_activity[0] = now
+                elif now > deadline:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except OSError:
+                        pass
+
+    def _idle_watchdog() -> None:
+        while True:
+            time.sleep(1.0 if children else min(30.0, max(1.0, idle_timeout_sec / 4)))
+            _reap_children()
+            if busy.is_set() or children:
+                continue
+            if time.monotonic() - last_activity[0] > idle_timeout_sec:
+                print("[python_chart_kernel] idle timeout, exiting", flush=True)
+                _cleanup_state(state_path, family, actual_address)
+                os._exit(0)
+
+    threading.Thread(target=_idle_watchdog, daemon=True).start()
+
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception:
+                continue
+            busy.set()
+            try:
+                # 鉴权后迟迟不发请求的连接会独占串行的接收循环，超时即丢弃。
+                if not conn.poll(CONNECT_TIMEOUT_SEC):
+                    continue
+                message = conn.recv()
+                op = message.get("op") if isinstance(message, dict) else None
+                if op == "ping":
+                    _safe_send(conn, {"ok": True, "pid": os.getpid(), "flavor": flavor})
+                elif op == "shutdown":
+                    _safe_send(conn, {"ok": True})
+                    break
+                elif op == "run" and flavor == FLAVOR_FORK:
+                    timeout = float(message.get("timeout") or 0) or 3600.0
+                    with children_lock:
+                        pid = _fork_run(conn, message, run_handler)
+                        children[pid] = time.monotonic() + timeout
+                elif op == "run":
+                    _handle_run(conn, message, run_handler)
+                else:
+                    _safe_send(conn, {"ok": False, "error": f"unknown op: {op}"})
+            except Exception as error:
+                try:
+                    _safe_send(conn, {"ok": False, "error": str(error)})
+                except Exception:
+                    pass
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                last_activity[0] = time.monotonic()
+                busy.clear()
+    finally:
+        listener.close()
+        _cleanup_state(state_path, family, actual_address)
+
+
+def _cleanup_state(state_path: str, family: str, address: Any) -> None:
+    """删除状态文件与 socket 文件。"""
+    state = read_json(state_path)
+    if isinstance(state, dict) and state.get("pid") == os.getpid():
+        try:
+            os.remove(state_path)
+        except OSError:
+            pass
+    if family == "AF_UNIX":
+        try:
+            os.remove(address)
+        except OSError:
+            pass
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(description="python_chart_exec warm kernel")
+    parser.add_argument("--tool", required=True, help="tools/python_chart_exec.py 路径")
+    parser.add_argument("--idle-timeout", type=float, default=1800.0)
+    parser.add_argument("--flavor", choices=FLAVORS, default=FLAVOR_WARM)
+    args = parser.parse_args()
+    try:
+        serve(args.tool, args.idle_timeout, flavor=args.flavor)
+    finally:
+        _release_spawn_lock(args.flavor)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,57 @@
+"""延迟导入的模块代理。
+
+执行作用域中预注入的 np/pd/sns/plotly 使用 `LazyModule`：只有用户代码第一次
+访问其属性时才真正导入，脚本只用到 plt 时不会为 seaborn/plotly 付出导入耗时与内存。
+"""
+
+from __future__ import annotations
+
+import importlib
+import threading
+import types
+from typing import Any, Callable, List, Optional
+
+
+class LazyModule(types.ModuleType):
+    """首次访问属性时导入真实模块的代理。"""
+
+    def __init__(
+        self,
+        name: str,
+        loader: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        """`loader` 可替代默认的 `importlib.import_module(name)`，用于导入前需要额外准备的模块。"""
+        super().__init__(name)
+        object.__setattr__(self, "_lazy_target", None)
+        object.__setattr__(self, "_lazy_loader", loader)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _lazy_load(self) -> Any:
+        module = object.__getattribute__(self, "_lazy_target")
+        if module is not None:
+            return module
+        with object.__getattribute__(self, "_lazy_lock"):
+            module = object.__getattribute__(self, "_lazy_target")
+            if module is None:
+                loader = object.__getattribute__(self, "_lazy_loader")
+                module = loader() if loader is not None else importlib.import_module(self.__name__)
+                object.__setattr__(self, "_lazy_target", module)
+        return module
+
+    @property
+    def lazy_loaded(self) -> bool:
+        """真实模块是否已导入。"""
+        return object.__getattribute__(self, "_lazy_target") is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._lazy_load(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._lazy_load(), name, value)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._lazy_load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.lazy_loaded else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
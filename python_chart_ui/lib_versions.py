@@ -0,0 +1,133 @@
+"""不导入包本身的图表库版本检测。
+
+旧实现为了读取 `__version__` 会完整导入 numpy/pandas/matplotlib/seaborn/plotly，
+连缺少 code 的错误返回也要付出全部导入耗时。这里改为读取已安装发行包的元数据
+（`importlib.metadata`），并做两级缓存：
+- 进程内缓存；
+- `runtime/library_versions.json` 持久化缓存，按解释器与 sys.path 目录的修改时间
+  生成指纹，安装/卸载包后自动失效。
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import sys
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from python_chart_ui.paths import plugin_root
+from python_chart_ui.paths import read_json
+from python_chart_ui.paths import runtime_dir
+from python_chart_ui.paths import write_json_atomic
+
+VERSION_CACHE_VERSION = 1
+VERSION_CACHE_FILE = "library_versions.json"
+
+CHART_LIBRARIES: Tuple[str, ...] = ("numpy", "pandas", "matplotlib", "seaborn", "plotly")
+
+MISSING = "missing"
+UNKNOWN = "unknown"
+
+_lock = threading.Lock()
+_process_cache: Dict[str, Dict[str, str]] = {}
+
+
+def environment_fingerprint() -> str:
+    """生成当前解释器环境的指纹（解释器路径/版本 + sys.path 各目录的 mtime）。
+
+    安装或卸载包会改动 site-packages 目录本身的 mtime，只需 stat 少量目录。
+    插件自身目录（runtime/ 等频繁变化）不计入。
+    """
+    own_root = plugin_root()
+    parts = [sys.executable or "", sys.version]
+    for entry in dict.fromkeys(sys.path):
+        if not entry or os.path.abspath(entry).startswith(own_root):
+            continue
+        try:
+            stat = os.stat(entry)
+        except OSError:
+            continue
+        parts.append(f"{entry}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def _read_version(name: str) -> str:
+    """从发行包元数据读取版本；没有元数据时退回到 find_spec 判断是否存在。"""
+    try:
+        from importlib import metadata
+    except ImportError:  # pragma: no cover - Python < 3.8
+        metadata = None
+    if metadata is not None:
+        try:
+            return str(metadata.version(name))
+        except Exception:
+            pass
+    # 没有 dist-info 的包（如直接放在路径中的源码目录）：已导入则读 __version__，
+    # 否则只判断能否找到，不触发导入。
+    module = sys.modules.get(name)
+    if module is not None:
+        return str(getattr(module, "__version__", UNKNOWN))
+    try:
+        spec = importlib.util.find_spec(name)
+    except Exception:
+        spec = None
+    return UNKNOWN if spec is not None else MISSING
+
+
+def _load_persisted(fingerprint: str) -> Dict[str, str]:
+    data = read_json(runtime_dir(VERSION_CACHE_FILE))
+    if not isinstance(data, dict):
+        return {}
+    if data.get("version") != VERSION_CACHE_VERSION or data.get("fingerprint") != fingerprint:
+        return {}
+    libraries = data.get("libraries")
+    if not isinstance(libraries, dict):
+        return {}
+    return {str(key): str(value) for key, value in libraries.items()}
+
+
+def library_versions(
+    names: Iterable[str] = CHART_LIBRARIES,
+    persist: bool = True,
+) -> Dict[str, str]:
+    """返回 {库名: 版本}，未安装为 `missing`，无法确定版本为 `unknown`。"""
+    wanted = list(names)
+    fingerprint = environment_fingerprint()
+    with _lock:
+        cached = _process_cache.get(fingerprint)
+        if cached is None:
+            cached = _load_persisted(fingerprint) if persist else {}
+            _process_cache.clear()
+            _process_cache[fingerprint] = cached
+        missing_names = [name for name in wanted if name not in cached]
+        if missing_names:
+            for name in missing_names:
+                cached[name] = _read_version(name)
+            if persist:
+                write_json_atomic(
+                    runtime_dir(VERSION_CACHE_FILE),
+                    {
+                        "version": VERSION_CACHE_VERSION,
+                        "fingerprint": fingerprint,
+                        "libraries": cached,
+                    },
+                )
+        return {name: cached[name] for name in wanted}
+
+
+def clear_cache(persisted: bool = False) -> None:
+    """清空进程内缓存；`persisted=True` 时同时删除持久化文件。"""
+    with _lock:
+        _process_cache.clear()
+        if persisted:
+            try:
+                os.remove(runtime_dir(VERSION_CACHE_FILE))
+            except OSError:
+                pass
+
+
+def version_of(name: str) -> Optional[str]:
+    """返回单个库的版本，未安装时返回 None。"""
+    version = library_versions((name,))[name]
+    return None if version == MISSING else version
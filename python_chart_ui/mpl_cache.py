@@ -0,0 +1,147 @@
+"""插件管理的 matplotlib 配置目录（MPLCONFIGDIR）。
+
+matplotlib 首次导入时会重建 `fontlist-*.json`，并且 `addfont` 注册的字体不会持久化。
+这里把 MPLCONFIGDIR 固定到 `runtime/mplconfig`，并把插件字体直接写入该目录下的
+字体列表缓存；同时用字体文件签名做指纹，字体变化时只增量更新插件字体条目。
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from python_chart_ui.paths import read_json
+from python_chart_ui.paths import runtime_dir
+from python_chart_ui.paths import write_json_atomic
+
+MPL_CONFIG_DIR_NAME = "mplconfig"
+SEED_STATE_FILE = "plugin_fonts.json"
+SEED_STATE_VERSION = 1
+
+_seed_lock = threading.Lock()
+
+
+def mplconfig_dir() -> str:
+    """返回插件管理的 MPLCONFIGDIR 路径。"""
+    return runtime_dir(MPL_CONFIG_DIR_NAME)
+
+
+def prepare_mplconfig_dir() -> str:
+    """在首次导入 matplotlib 前调用，把 MPLCONFIGDIR 指向插件管理目录。
+
+    matplotlib 已导入时环境变量不再生效，此时返回其当前使用的配置目录。
+    """
+    if "matplotlib" in sys.modules:
+        return os.environ.get("MPLCONFIGDIR", "")
+    config_dir = mplconfig_dir()
+    try:
+        os.makedirs(config_dir, exist_ok=True)
+    except OSError:
+        return os.environ.get("MPLCONFIGDIR", "")
+    os.environ["MPLCONFIGDIR"] = config_dir
+    return config_dir
+
+
+def font_fingerprint(font_paths: Iterable[str]) -> Dict[str, List[int]]:
+    """生成字体指纹：{绝对路径: [size, mtime_ns]}。"""
+    result: Dict[str, List[int]] = {}
+    for path in font_paths:
+        normalized = os.path.abspath(path)
+        try:
+            stat = os.stat(normalized)
+        except OSError:
+            continue
+        result[normalized] = [int(stat.st_size), int(stat.st_mtime_ns)]
+    return result
+
+
+def _fontlist_cache_path(matplotlib: Any, font_manager: Any) -> Optional[str]:
+    """返回 matplotlib 字体列表缓存文件路径；不在插件目录内时返回 None。"""
+    try:
+        cache_dir = os.path.abspath(matplotlib.get_cachedir())
+        version = font_manager.FontManager.__version__
+    except Exception:
+        return None
+    if cache_dir != os.path.abspath(mplconfig_dir()):
+        return None
+    return os.path.join(cache_dir, f"fontlist-v{version}.json")
+
+
+def ensure_plugin_fonts_registered(
+    matplotlib: Any,
+    font_manager: Any,
+    font_paths: List[str],
+) -> Dict[str, str]:
+    """确保字体已注册到 fontManager，并持久化到插件管理的字体列表缓存。
+
+    只对缓存中缺失或签名变化的字体调用 `addfont`，已删除字体的条目会被移除。
+    返回 {字体路径: 字体族名}，无需再逐个打开字体读取名称。
+    """
+    manager = font_manager.fontManager
+    wanted = font_fingerprint(font_paths)
+    with _seed_lock:
+        state_path = os.path.join(mplconfig_dir(), SEED_STATE_FILE)
+        state = read_json(state_path)
+        seeded: Dict[str, Any] = {}
+        if isinstance(state, dict) and state.get("version") == SEED_STATE_VERSION:
+            seeded = dict(state.get("fonts") or {})
+
+        registered = {os.path.abspath(entry.fname): entry for entry in manager.ttflist}
+        # 只按文件自身签名判断失效，允许调用方只注册候选字体的子集。
+        current = font_fingerprint(seeded)
+        current.update(wanted)
+        stale = {
+            path
+            for path, signature in seeded.items()
+            if current.get(path) != signature
+        }
+        changed = False
+        if stale:
+            manager.ttflist = [
+                entry
+                for entry in manager.ttflist
+                if os.path.abspath(entry.fname) not in stale
+            ]
+            for path in stale:
+                registered.pop(path, None)
+            changed = True
+
+        for path in wanted:
+            if path in registered:
+                continue
+            try:
+                manager.addfont(path)
+            except Exception:
+                continue
+            changed = True
+
+        if changed:
+            try:
+                manager._findfont_cached.cache_clear()
+            except Exception:
+                pass
+            cache_path = _fontlist_cache_path(matplotlib, font_manager)
+            if cache_path:
+                try:
+                    font_manager.json_dump(manager, cache_path)
+                except Exception:
+                    pass
+
+        next_seeded = {
+            path: signature for path, signature in seeded.items() if path not in stale
+        }
+        next_seeded.update(wanted)
+        if changed or next_seeded != seeded:
+            write_json_atomic(
+                state_path,
+                {"version": SEED_STATE_VERSION, "fonts": next_seeded},
+            )
+
+        names: Dict[str, str] = {}
+        for entry in manager.ttflist:
+            path = os.path.abspath(entry.fname)
+            if path in wanted and path not in names:
+                names[path] = entry.name
+        return names
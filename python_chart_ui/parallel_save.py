@@ -0,0 +1,88 @@
+"""多个 figure 的并行导出。
+
+自动保存会逐个执行 `figure.savefig(..., dpi=150, bbox_inches="tight")`，20 张小图时
+大部分耗时都花在这个串行循环里（栅格化 + PNG 编码都在持有 GIL 的调用中）。
+支持 fork 的平台上，这里按 fork 方式创建进程池：子进程继承父进程内存中的 figure
+对象（无需 pickle），按下标各自渲染并写入目标路径；文件名与顺序由调用方决定，
+与串行保存完全一致。figure 数量少于阈值、单核或不支持 fork 时退回串行保存。
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import multiprocessing
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# fork 前设置，子进程通过继承的内存按下标访问。
+_pending: Sequence[Tuple[Any, str]] = ()
+_pending_kwargs: Dict[str, Any] = {}
+
+
+def _save_one(index: int) -> bool:
+    figure, path = _pending[index]
+    figure.savefig(path, **_pending_kwargs)
+    return True
+
+
+def _save_serial(items: Sequence[Tuple[Any, str]], kwargs: Dict[str, Any]) -> List[bool]:
+    saved: List[bool] = []
+    for figure, path in items:
+        try:
+            figure.savefig(path, **kwargs)
+            saved.append(True)
+        except Exception:
+            saved.append(False)
+    return saved
+
+
+def _fork_context() -> Optional[Any]:
+    if not hasattr(os, "fork"):
+        return None
+    try:
+        return multiprocessing.get_context("fork")
+    except ValueError:
+        return None
+
+
+def save_figures(
+    items: Sequence[Tuple[Any, str]],
+    savefig_kwargs: Dict[str, Any],
+    max_workers: int = 0,
+    min_parallel: int = 4,
+) -> Tuple[List[bool], str]:
+    """保存 [(figure, path)]，返回 (逐项是否成功, 执行方式 `serial`/`fork`)。"""
+    global _pending, _pending_kwargs
+    workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+    workers = min(workers, len(items))
+    context = _fork_context()
+    if context is None or workers <= 1 or len(items) < max(2, min_parallel):
+        return _save_serial(items, savefig_kwargs), "serial"
+
+    _pending, _pending_kwargs = list(items), dict(savefig_kwargs)
+    saved: List[Optional[bool]] = [None] * len(items)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=context
+        ) as executor:
+            futures = {executor.submit(_save_one, index): index for index in range(len(items))}
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                try:
+                    saved[index] = bool(future.result())
+                except concurrent.futures.process.BrokenProcessPool:
+                    saved[index] = None
+                except Exception:
+                    saved[index] = False
+    except Exception:
+        pass
+    finally:
+        _pending, _pending_kwargs = (), {}
+
+    # 进程池异常中断时，未完成的 figure 在本进程内补做串行保存。
+    retry = [index for index, value in enumerate(saved) if value is None]
+    if retry:
+        retried = _save_serial([items[index] for index in retry], savefig_kwargs)
+        for index, value in zip(retry, retried):
+            saved[index] = value
+    return [bool(value) for value in saved], "fork"
@@ -0,0 +1,49 @@
+"""插件目录定位工具。"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Optional
+
+
+def plugin_root() -> str:
+    """返回插件根目录（即 plugin.json 所在目录）。"""
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.dirname(package_dir)
+
+
+def runtime_dir(*parts: str) -> str:
+    """返回插件 runtime 目录下的路径，并确保 runtime 根目录存在。"""
+    root = os.path.join(plugin_root(), "runtime")
+    os.makedirs(root, exist_ok=True)
+    return os.path.join(root, *parts)
+
+
+def read_json(path: str) -> Optional[Any]:
+    """读取 JSON 文件，不存在或损坏时返回 None。"""
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except Exception:
+        return None
+
+
+def write_json_atomic(path: str, data: Any) -> bool:
+    """原子写入 JSON 文件（先写临时文件再 rename），失败返回 False。"""
+    parent = os.path.dirname(path)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except Exception:
+            pass
+        return False
@@ -0,0 +1,160 @@
+"""执行前的 AST 预检。
+
+- 先解析代码：语法错误直接返回，不再导入图表库、不创建输出目录；
+- 根据 import 与对预注入名字（np/pd/plt/sns/plotly 等）的引用推断需要的图表库，
+  未用到 matplotlib 时跳过字体配置；
+- 记录代码中引用的全局名字（用于按需加载 payload 传入的数据集）；
+- 按代码哈希缓存编译后的 code object，重复提交的代码无需再次 compile。
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+import threading
+import traceback
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import CodeType
+from typing import FrozenSet, Optional, Set, Tuple
+
+CODE_CACHE_SIZE = 64
+
+ALL_LIBRARIES: FrozenSet[str] = frozenset(
+    ("numpy", "pandas", "matplotlib", "seaborn", "plotly")
+)
+
+# 预注入名字 -> 对应图表库。
+_INJECTED_NAMES = {
+    "np": ("numpy",),
+    "pd": ("pandas",),
+    "plt": ("matplotlib",),
+    "savefig_safe": ("matplotlib",),
+    "sns": ("seaborn", "matplotlib"),
+    "plotly": ("plotly",),
+}
+
+# import 根模块 -> 对应图表库。
+_IMPORT_ROOTS = {
+    "numpy": ("numpy",),
+    "pandas": ("pandas",),
+    "matplotlib": ("matplotlib",),
+    "seaborn": ("seaborn", "matplotlib"),
+    "plotly": ("plotly",),
+    "mpl_toolkits": ("matplotlib",),
+}
+
+# 出现这些名字时无法静态判断导入，保守地认为需要全部图表库。
+_DYNAMIC_NAMES = frozenset(("__import__", "importlib", "exec", "eval"))
+
+# pandas 的绘图方法会走 matplotlib 后端。
+PANDAS_PLOT_ATTRS = frozenset(("plot", "hist", "boxplot", "scatter_matrix"))
+
+
+@dataclass(frozen=True)
+class PreflightResult:
+    """预检结论。"""
+
+    code_hash: str
+    code_object: Optional[CodeType]
+    syntax_error: Optional[str]
+    needs: FrozenSet[str]
+    cache_hit: bool
+    names: FrozenSet[str] = frozenset()
+
+    @property
+    def ok(self) -> bool:
+        return self.syntax_error is None
+
+    @property
+    def uses_matplotlib(self) -> bool:
+        return "matplotlib" in self.needs
+
+
+_cache: "OrderedDict[str, Tuple[CodeType, FrozenSet[str], FrozenSet[str]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def code_hash(code: str) -> str:
+    """返回代码文本的 sha256。"""
+    return hashlib.sha256(code.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def infer_libraries(tree: ast.AST) -> FrozenSet[str]:
+    """根据 AST 推断代码需要的图表库。"""
+    needs: Set[str] = set()
+    plot_attr_used = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                needs.update(_IMPORT_ROOTS.get(alias.name.split(".")[0], ()))
+        elif isinstance(node, ast.ImportFrom):
+            if node.module and not node.level:
+                needs.update(_IMPORT_ROOTS.get(node.module.split(".")[0], ()))
+        elif isinstance(node, ast.Name):
+            if node.id in _DYNAMIC_NAMES:
+                return ALL_LIBRARIES
+            needs.update(_INJECTED_NAMES.get(node.id, ()))
+        elif isinstance(node, ast.Attribute):
+            if node.attr in PANDAS_PLOT_ATTRS:
+                plot_attr_used = True
+    if plot_attr_used and "pandas" in needs:
+        needs.add("matplotlib")
+    return frozenset(needs)
+
+
+def referenced_names(code_object: CodeType) -> FrozenSet[str]:
+    """代码（含嵌套函数/类/推导式）中按名字查找的全局与模块级名字。"""
+    names: Set[str] = set()
+    stack = [code_object]
+    while stack:
+        current = stack.pop()
+        names.update(current.co_names)
+        stack.extend(item for item in current.co_consts if isinstance(item, CodeType))
+    return frozenset(names)
+
+
+def preflight(code: str, filename: str = "<python_chart_exec>") -> PreflightResult:
+    """解析并编译代码，返回预检结论（编译结果按代码哈希缓存）。"""
+    digest = code_hash(code)
+    with _cache_lock:
+        cached = _cache.get(digest)
+        if cached is not None:
+            _cache.move_to_end(digest)
+            return PreflightResult(
+                code_hash=digest,
+                code_object=cached[0],
+                syntax_error=None,
+                needs=cached[1],
+                cache_hit=True,
+                names=cached[2],
+            )
+
+    try:
+        tree = ast.parse(code, filename=filename, mode="exec")
+        code_object = compile(tree, filename, "exec")
+    except (SyntaxError, ValueError) as error:
+        message = "".join(traceback.format_exception_only(type(error), error))
+        return PreflightResult(
+            code_hash=digest,
+            code_object=None,
+            syntax_error=message,
+            needs=frozenset(),
+            cache_hit=False,
+        )
+
+    needs = infer_libraries(tree)
+    names = referenced_names(code_object)
+    with _cache_lock:
+        _cache[digest] = (code_object, needs, names)
+        _cache.move_to_end(digest)
+        while len(_cache) > CODE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return PreflightResult(
+        code_hash=digest,
+        code_object=code_object,
+        syntax_error=None,
+        needs=needs,
+        cache_hit=False,
+        names=names,
+    )
@@ -0,0 +1,268 @@
+"""按内容寻址的执行结果缓存（可选启用）。
+
+模型常在同一对话中重复提交相同的图表代码（重试、"再显示一次"）。启用后，
+以 代码 + 图表库版本 + 选中的中文字体 + 影响输出的 payload 选项 的哈希为键，
+保存成功执行的 stdout/stderr/`_result` 与输出目录中的图表文件；命中时把缓存文件
+硬链接到新的输出目录并直接返回，不再执行代码。
+
+缓存位于 `runtime/result_cache/<key>/`：`meta.json` 为结果摘要，`files/` 为文件副本。
+按总字节数与条目数上限做 LRU 淘汰（以条目目录的 mtime 作为最近访问时间）。
+缓存键不包含随机数种子与外部数据，依赖它们的脚本不应开启缓存。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from python_chart_ui.paths import read_json
+from python_chart_ui.paths import runtime_dir
+from python_chart_ui.paths import write_json_atomic
+from python_chart_ui.retention import mark_run_finished
+
+RESULT_CACHE_VERSION = 1
+RESULT_CACHE_DIR = "result_cache"
+META_FILE = "meta.json"
+FILES_DIR = "files"
+
+# 这些结果字段随缓存保存并在命中时原样返回。
+_CACHED_FIELDS = ("stdout", "stderr", "result", "summary", "fontSetup", "inlineImages")
+
+_lock = threading.Lock()
+
+
+def link_or_copy(source: str, target: str) -> None:
+    """优先硬链接，跨设备或不支持时退回复制。"""
+    parent = os.path.dirname(target)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+def build_cache_key(
+    code: str,
+    libraries: Dict[str, str],
+    font_identity: Any,
+    options: Dict[str, Any],
+) -> str:
+    """计算缓存键。"""
+    material = json.dumps(
+        {
+            "v": RESULT_CACHE_VERSION,
+            "code": code,
+            "libraries": libraries,
+            "font": font_identity,
+            "options": options,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _relative_variants(
+    entries: List[Dict[str, Any]], output_dir: str
+) -> Optional[List[Dict[str, Any]]]:
+    """把 `chartVariants` 中的路径改为相对 `output_dir`；有路径越界时返回 None。"""
+    relative_entries: List[Dict[str, Any]] = []
+    for entry in entries:
+        paths = [entry.get("file")] + [item.get("path") for item in entry.get("variants") or []]
+        for path in paths:
+            if not path or os.path.commonpath([os.path.abspath(path), output_dir]) != output_dir:
+                return None
+        relative = dict(entry)
+        relative["file"] = os.path.relpath(os.path.abspath(entry["file"]), output_dir)
+        relative["variants"] = [
+            dict(item, path=os.path.relpath(os.path.abspath(item["path"]), output_dir))
+            for item in entry.get("variants") or []
+        ]
+        relative_entries.append(relative)
+    return relative_entries
+
+
+def _rebase_variants(entries: List[Dict[str, Any]], output_dir: str) -> List[Dict[str, Any]]:
+    """`_relative_variants` 的逆过程：相对路径换回新输出目录下的绝对路径。"""
+    rebased: List[Dict[str, Any]] = []
+    for entry in entries:
+        absolute = dict(entry)
+        absolute["file"] = os.path.abspath(os.path.join(output_dir, entry["file"]))
+        absolute["variants"] = [
+            dict(item, path=os.path.abspath(os.path.join(output_dir, item["path"])))
+            for item in entry.get("variants") or []
+        ]
+        rebased.append(absolute)
+    return rebased
+
+
+class ResultCache:
+    """结果缓存目录的读写与淘汰。"""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entries: int,
+        root: Optional[str] = None,
+    ) -> None:
+        self.root = root or runtime_dir(RESULT_CACHE_DIR)
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_entries = max(1, int(max_entries))
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def lookup(
+        self,
+        key: str,
+        make_output_dir: Callable[[], str],
+    ) -> Optional[Dict[str, Any]]:
+        """命中时创建新输出目录、链接缓存文件并返回结果片段，否则返回 None。
+
+        先确认元数据与全部缓存文件都在，再创建输出目录；链接中途失败（例如条目正被淘汰）
+        时删除已创建的目录并取消其进行中登记，按未命中处理。
+        """
+        entry_dir = self._entry_dir(key)
+        meta = read_json(os.path.join(entry_dir, META_FILE))
+        if not isinstance(meta, dict) or meta.get("version") != RESULT_CACHE_VERSION:
+            return None
+        files_dir = os.path.join(entry_dir, FILES_DIR)
+        try:
+            relatives = list(meta.get("files") or [])
+            variant_files = [
+                item["path"]
+                for entry in meta.get("chartVariants") or []
+                for item in entry.get("variants") or []
+            ]
+        except (TypeError, KeyError, AttributeError):
+            return None
+        if not all(
+            os.path.isfile(os.path.join(files_dir, relative))
+            for relative in relatives + variant_files
+        ):
+            return None
+        output_dir = make_output_dir()
+        chart_files: List[str] = []
+        try:
+            for relative in relatives:
+                target = os.path.abspath(os.path.join(output_dir, relative))
+                link_or_copy(os.path.join(files_dir, relative), target)
+                chart_files.append(target)
+            for relative in variant_files:
+                link_or_copy(
+                    os.path.join(files_dir, relative),
+                    os.path.join(output_dir, relative),
+                )
+        except OSError:
+            shutil.rmtree(output_dir, ignore_errors=True)
+            mark_run_finished(os.path.basename(output_dir))
+            return None
+        try:
+            os.utime(entry_dir)
+        except OSError:
+            pass
+        result = {field: meta.get(field) for field in _CACHED_FIELDS}
+        result["chartFiles"] = chart_files
+        result["chartVariants"] = _rebase_variants(meta.get("chartVariants") or [], output_dir)
+        result["outputDir"] = output_dir
+        result["cachedAt"] = meta.get("createdAt")
+        return result
+
+    def store(self, key: str, result: Dict[str, Any], output_dir: str) -> bool:
+        """保存一次成功执行的结果；图表文件不在 `output_dir` 内或结果无法序列化时放弃。"""
+        output_dir = os.path.abspath(output_dir)
+        relatives: List[str] = []
+        for path in result.get("chartFiles") or []:
+            full_path = os.path.abspath(path)
+            if os.path.commonpath([full_path, output_dir]) != output_dir:
+                return False
+            relatives.append(os.path.relpath(full_path, output_dir))
+        # 缩略图随原图一起缓存，元数据中只保存相对路径。
+        variants = _relative_variants(result.get("chartVariants") or [], output_dir)
+        if variants is None:
+            return False
+        meta = {field: result.get(field) for field in _CACHED_FIELDS}
+        meta.update(
+            {
+                "version": RESULT_CACHE_VERSION,
+                "createdAt": int(time.time() * 1000),
+                "files": relatives,
+                "chartVariants": variants,
+            }
+        )
+        try:
+            json.dumps(meta, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return False
+
+        entry_dir = self._entry_dir(key)
+        staging = os.path.join(self.root, f".staging_{uuid.uuid4().hex[:12]}")
+        variant_files = [item["path"] for entry in variants for item in entry["variants"]]
+        try:
+            for relative in relatives + variant_files:
+                link_or_copy(
+                    os.path.join(output_dir, relative),
+                    os.path.join(staging, FILES_DIR, relative),
+                )
+            if not write_json_atomic(os.path.join(staging, META_FILE), meta):
+                raise OSError("cannot write cache meta")
+            with _lock:
+                if os.path.isdir(entry_dir):
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(staging, entry_dir)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+        self.evict()
+        return True
+
+    def _entries(self) -> Iterable[Tuple[float, int, str]]:
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if name.startswith("."):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            entries.append((mtime, _dir_size(path), path))
+        return entries
+
+    def evict(self) -> int:
+        """按 LRU 淘汰超出字节或条目上限的缓存，返回删除的条目数。"""
+        with _lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            while entries and (
+                len(entries) > self.max_entries or (self.max_bytes and total > self.max_bytes)
+            ):
+                _, size, path = entries.pop(0)
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                removed += 1
+            return removed
@@ -0,0 +1,279 @@
+"""chart_outputs 运行目录的保留策略与后台清理。
+
+`chart_outputs/run_*` 从不删除时会在长期运行的设备上无限增长。这里按设置执行：
+- `retentionMaxAgeHours`: 超过该时长未改动的运行目录删除；
+- `retentionMaxTotalBytes` / `retentionMaxRuns`: 超出总字节数或运行数时按最近最少使用
+  （目录 mtime）淘汰；
+- 每轮最多删除 `retentionBatchSize` 个目录，渐进清理。
+
+清理只在后台线程（`maybe_schedule_gc`）或 app_start 预热中进行，不在工具执行路径上。
+进行中的运行在 `runtime/active_runs/<run_id>` 登记，清理时一律跳过（登记超过
+`ACTIVE_RUN_STALE_SEC` 视为异常遗留）。
+
+运行目录之间（以及与产物库之间）可能硬链接同一文件，占用按 (st_dev, st_ino) 只计一次，
+计在最新的运行上（淘汰旧运行不会释放仍被新运行引用的文件）。删除时先把目录改名为
+`.gc_` 前缀的墓碑再递归删除，进程中途退出只会留下墓碑（下一轮清理），不会留下残缺的
+运行目录；解释器退出时最多等待 `GC_EXIT_JOIN_SEC` 秒让进行中的一轮结束。
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from python_chart_ui.paths import read_json
+from python_chart_ui.paths import runtime_dir
+from python_chart_ui.paths import write_json_atomic
+
+ACTIVE_RUNS_DIR = "active_runs"
+RETENTION_STATE_FILE = "retention.json"
+RUN_DIR_PREFIX = "run_"
+TOMBSTONE_PREFIX = ".gc_"
+GC_EXIT_JOIN_SEC = 5.0
+# 进行中登记的最长有效期，远大于宿主工具超时。
+ACTIVE_RUN_STALE_SEC = 3600
+
+_gc_lock = threading.Lock()
+_gc_thread: Optional[threading.Thread] = None
+
+
+def mark_run_active(run_id: str) -> None:
+    """登记一个进行中的运行，清理时跳过其目录。"""
+    path = runtime_dir(ACTIVE_RUNS_DIR, run_id)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(str(os.getpid()))
+    except OSError:
+        pass
+
+
+def mark_run_finished(run_id: str) -> None:
+    """取消进行中登记。"""
+    try:
+        os.remove(runtime_dir(ACTIVE_RUNS_DIR, run_id))
+    except OSError:
+        pass
+
+
+def _active_run_ids() -> Set[str]:
+    folder = runtime_dir(ACTIVE_RUNS_DIR)
+    now = time.time()
+    active: Set[str] = set()
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return active
+    for entry in entries:
+        try:
+            age = now - entry.stat().st_mtime
+        except OSError:
+            continue
+        if age > ACTIVE_RUN_STALE_SEC:
+            # 进程异常退出遗留的登记。
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            continue
+        active.add(entry.name)
+    return active
+
+
+def _dir_size(path: str, seen: Optional[Set[Tuple[int, int]]] = None) -> int:
+    """目录内文件的总字节数；硬链接的同一文件（含 `seen` 中已计过的）只计一次。"""
+    seen = set() if seen is None else seen
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                info = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            identity = (info.st_dev, info.st_ino)
+            if identity in seen:
+                continue
+            seen.add(identity)
+            total += info.st_size
+    return total
+
+
+def _output_roots(extra_roots: Optional[List[str]] = None) -> List[str]:
+    """收集需要清理的 chart_outputs 根目录：产物索引中出现过的 + 当前 cwd 下的。"""
+    roots: List[str] = []
+    candidates = list(extra_roots or [])
+    candidates.append(os.path.join(os.getcwd(), "chart_outputs"))
+    try:
+        from python_chart_ui.artifacts import output_roots
+
+        candidates.extend(output_roots())
+    except Exception:
+        pass
+    for root in candidates:
+        root = os.path.abspath(root)
+        if root not in roots and os.path.isdir(root):
+            roots.append(root)
+    return roots
+
+
+def _scan_runs(roots: List[str]) -> List[Tuple[float, int, str]]:
+    """返回 [(mtime, 字节数, 目录)]，按 mtime 升序（最久未用在前）。"""
+    found: List[Tuple[float, str]] = []
+    for root in roots:
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            continue
+        for entry in entries:
+            if not entry.name.startswith(RUN_DIR_PREFIX):
+                continue
+            try:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                mtime = entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                continue
+            found.append((mtime, entry.path))
+    # 从最新的运行开始计量，共享的硬链接文件计在最新的运行上。
+    seen: Set[Tuple[int, int]] = set()
+    runs = [(mtime, _dir_size(path, seen), path) for mtime, path in sorted(found, reverse=True)]
+    runs.reverse()
+    return runs
+
+
+def _remove_run(path: str) -> bool:
+    """先改名为墓碑再删除，返回运行目录是否已不存在。"""
+    tombstone = os.path.join(
+        os.path.dirname(path), TOMBSTONE_PREFIX + os.path.basename(path)
+    )
+    try:
+        os.rename(path, tombstone)
+    except OSError:
+        return not os.path.exists(path)
+    shutil.rmtree(tombstone, ignore_errors=True)
+    return True
+
+
+def _sweep_tombstones(roots: List[str]) -> None:
+    """删除上一轮中途退出遗留的墓碑目录。"""
+    for root in roots:
+        try:
+            entries = list(os.scandir(root))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith(TOMBSTONE_PREFIX):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def collect_garbage(
+    settings: Dict[str, Any],
+    extra_roots: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """执行一轮清理，返回统计信息。"""
+    started = time.perf_counter()
+    max_age = float(settings.get("retentionMaxAgeHours") or 0) * 3600
+    max_bytes = int(settings.get("retentionMaxTotalBytes") or 0)
+    max_runs = int(settings.get("retentionMaxRuns") or 0)
+    batch = max(1, int(settings.get("retentionBatchSize") or 50))
+
+    active = _active_run_ids()
+    roots = _output_roots(extra_roots)
+    _sweep_tombstones(roots)
+    runs = [item for item in _scan_runs(roots)
+            if os.path.basename(item[2]) not in active]
+    total_bytes = sum(size for _, size, _ in runs)
+    remaining = len(runs) + len(active)
+    now = time.time()
+
+    removed: List[str] = []
+    freed = 0
+    for mtime, size, path in runs:
+        if len(removed) >= batch:
+            break
+        expired = bool(max_age) and now - mtime > max_age
+        over_bytes = bool(max_bytes) and total_bytes > max_bytes
+        over_count = bool(max_runs) and remaining > max_runs
+        if not (expired or over_bytes or over_count):
+            # 按 mtime 升序，后面的目录更新，只可能因总量超限被淘汰，而总量已达标。
+            break
+        # 删除前再确认一次，避免与刚开始的运行竞争。
+        if os.path.basename(path) in _active_run_ids():
+            continue
+        if not _remove_run(path):
+            continue
+        removed.append(os.path.basename(path))
+        total_bytes -= size
+        remaining -= 1
+        freed += size
+
+    blob_freed = 0
+    if removed:
+        try:
+            from python_chart_ui.artifacts import forget_runs
+            from python_chart_ui.artifacts import prune_blobs
+
+            forget_runs(removed)
+            blob_freed = prune_blobs()
+        except Exception:
+            pass
+
+    stats = {
+        "lastRunAt": int(time.time() * 1000),
+        "removedRuns": len(removed),
+        "freedBytes": freed + blob_freed,
+        "keptRuns": remaining,
+        "keptBytes": total_bytes,
+        "skippedActive": len(active),
+        "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+    write_json_atomic(runtime_dir(RETENTION_STATE_FILE), stats)
+    return stats
+
+
+def retention_status() -> Dict[str, Any]:
+    """返回上一轮清理的统计信息。"""
+    data = read_json(runtime_dir(RETENTION_STATE_FILE))
+    return data if isinstance(data, dict) else {}
+
+
+def join_gc(timeout: float = GC_EXIT_JOIN_SEC) -> bool:
+    """等待进行中的后台清理结束，最多 `timeout` 秒，返回是否已结束。"""
+    thread = _gc_thread
+    if thread is None:
+        return True
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def maybe_schedule_gc(settings: Dict[str, Any], extra_roots: Optional[List[str]] = None) -> bool:
+    """距上次清理超过 `retentionIntervalSec` 时在后台线程启动一轮清理，立即返回。"""
+    global _gc_thread
+    interval = float(settings.get("retentionIntervalSec") or 0)
+    if interval <= 0:
+        return False
+    last_run_at = retention_status().get("lastRunAt") or 0
+    if time.time() * 1000 - float(last_run_at) < interval * 1000:
+        return False
+    with _gc_lock:
+        if _gc_thread is not None and _gc_thread.is_alive():
+            return False
+        # 先写入时间戳，避免多个进程/线程同时发起清理。
+        write_json_atomic(
+            runtime_dir(RETENTION_STATE_FILE),
+            {**retention_status(), "lastRunAt": int(time.time() * 1000)},
+        )
+        if _gc_thread is None:
+            atexit.register(join_gc)
+        _gc_thread = threading.Thread(
+            target=collect_garbage,
+            args=(settings, extra_roots),
+            name="python-chart-retention",
+            daemon=True,
+        )
+        _gc_thread.start()
+    return True
@@ -0,0 +1,436 @@
+"""单次图表执行的运行上下文（基于 contextvars，支持同进程多线程并行执行）。
+
+早期实现依赖进程级全局状态：`os.chdir(output_dir)`、`contextlib.redirect_stdout`
+以及每次执行前后对 savefig/save 打补丁再恢复，同一解释器内并行的两次执行会互相
+串改路径与日志。这里改为：
+- stdout/stderr 代理只安装一次，按当前线程上下文中的 `RunContext` 分发写入；
+- savefig/save/write_image/to_csv 等保存入口只包装一次，按当前
+  `RunContext.output_dir` 改写路径并记入产物清单，不在任何执行上下文中时原样调用；
+- pyplot 新建的 figure 记录到当前上下文，执行结束时只关闭本次执行的 figure。
+
+注意：pyplot 的“当前 figure”（plt.plot/plt.gca 等隐式接口）仍是进程全局状态，
+并行执行时应使用 `fig, ax = plt.subplots()` 面向对象接口绘图。
+
+不切换 cwd 时，只有上述保存入口与作用域内的 `open`（见 `scoped_builtins`）按输出目录
+解析相对路径；`np.save`、`os.makedirs`、`pathlib.Path.write_*` 等其它接口的相对路径
+仍相对进程 cwd。同一进程内并行执行（`allow_chdir=False`）时应只用这些入口写文件，
+或显式拼接 `output_dir`。
+"""
+
+from __future__ import annotations
+
+import builtins
+import contextlib
+import importlib.abc
+import io
+import os
+import sys
+import threading
+from contextvars import ContextVar
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from python_chart_ui.artifacts import detach_shared_file
+from python_chart_ui.inline_output import INLINE_MIME_TYPES
+
+_current_run: ContextVar[Optional["RunContext"]] = ContextVar(
+    "python_chart_run", default=None
+)
+_install_lock = threading.Lock()
+_patch_lock = threading.Lock()
+_patched_targets: set = set()
+
+
+@dataclass
+class RunContext:
+    """一次执行的上下文。"""
+
+    run_id: str
+    output_dir: str
+    stdout: Any = field(default_factory=io.StringIO)
+    stderr: Any = field(default_factory=io.StringIO)
+    figure_numbers: List[Any] = field(default_factory=list)
+    # 保存入口实际写入的文件（绝对路径，按写入顺序），用于汇总产物而无需遍历目录。
+    saved_files: List[str] = field(default_factory=list)
+    # 写 PNG 时附加给 savefig 的默认参数（如 PNG 压缩级别），调用方显式传入时不覆盖。
+    savefig_defaults: Dict[str, Any] = field(default_factory=dict)
+    # 内联返回模式下收集 savefig 输出的 `InlineImageStore`，为 None 时照常写文件。
+    inline: Any = None
+
+
+def current_run() -> Optional[RunContext]:
+    """返回当前线程上下文中的执行上下文。"""
+    return _current_run.get()
+
+
+@contextlib.contextmanager
+def activate(run: RunContext) -> Iterator[RunContext]:
+    """在 with 块内把 `run` 设为当前执行上下文。"""
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def runtime_root_from_output_dir(output_dir: str) -> str:
+    """根据 output_dir 推导插件运行目录根（用于约束绝对路径写入范围）。"""
+    # output_dir 形如: <runtime_root>/chart_outputs/run_xxx
+    return os.path.abspath(os.path.join(output_dir, os.pardir, os.pardir))
+
+
+def resolve_output_path(path_value: Any, output_dir: str) -> str:
+    """规范化保存路径并确保父目录存在。
+
+    规则:
+    1. 相对路径统一落到 output_dir。
+    2. 绝对路径只允许写入插件 runtime 根目录内部，防止越界写入。
+    3. 对最终路径的父目录执行 mkdir -p。
+    """
+    raw = os.fspath(path_value)
+    if not isinstance(raw, str):
+        raw = str(raw)
+    if not raw.strip():
+        raise ValueError("empty output path")
+
+    # 相对路径统一转换到本次执行输出目录，避免写到不可控位置。
+    if os.path.isabs(raw):
+        target = os.path.abspath(raw)
+    else:
+        target = os.path.abspath(os.path.join(output_dir, raw))
+
+    runtime_root = runtime_root_from_output_dir(output_dir)
+    # 仅允许落在插件 runtime 目录内，防止越界写入系统路径。
+    if os.path.commonpath([target, runtime_root]) != runtime_root:
+        raise ValueError(
+            f"invalid output path (outside runtime sandbox): {target}"
+        )
+
+    parent = os.path.dirname(target)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    return target
+
+
+class _ContextStream(io.TextIOBase):
+    """按当前执行上下文分发写入的 stdout/stderr 代理。"""
+
+    def __init__(self, name: str, fallback: Any) -> None:
+        super().__init__()
+        self._name = name
+        self._fallback = fallback
+
+    def _target(self) -> Any:
+        run = _current_run.get()
+        if run is None:
+            return self._fallback
+        return getattr(run, self._name)
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def writelines(self, lines) -> None:
+        for line in lines:
+            self.write(line)
+
+    def flush(self) -> None:
+        target = self._target()
+        flush = getattr(target, "flush", None)
+        if flush is not None:
+            flush()
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return False
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self._fallback, "encoding", None) or "utf-8"
+
+    def fileno(self) -> int:
+        return self._fallback.fileno()
+
+
+def install_stream_capture() -> None:
+    """安装 stdout/stderr 上下文代理（幂等）。
+
+    宿主若在两次调用之间替换了 sys.stdout/sys.stderr，会以新对象为回退目标重新包装。
+    """
+    with _install_lock:
+        if not isinstance(sys.stdout, _ContextStream):
+            sys.stdout = _ContextStream("stdout", sys.stdout)
+        if not isinstance(sys.stderr, _ContextStream):
+            sys.stderr = _ContextStream("stderr", sys.stderr)
+
+
+def _record_saved(path: Any) -> None:
+    """把保存入口实际写入的路径记入当前执行的产物清单。"""
+    run = _current_run.get()
+    if run is None or not isinstance(path, (str, os.PathLike)):
+        return
+    full_path = os.path.abspath(os.fspath(path))
+    if full_path not in run.saved_files:
+        run.saved_files.append(full_path)
+
+
+def _path_arg(args: tuple, kwargs: Dict[str, Any], key: str, index: int = 0) -> Any:
+    if len(args) > index:
+        return args[index]
+    return kwargs.get(key)
+
+
+def _rewrite_path_arg(args: tuple, kwargs: Dict[str, Any], key: str, index: int = 0):
+    """把位置参数或关键字参数中的路径改写到当前执行的输出目录。"""
+    run = _current_run.get()
+    if run is None:
+        return args, kwargs
+    if len(args) > index:
+        value = args[index]
+        if isinstance(value, (str, os.PathLike)):
+            args = args[:index] + (resolve_output_path(value, run.output_dir),) + args[index + 1:]
+    elif key in kwargs and isinstance(kwargs[key], (str, os.PathLike)):
+        kwargs = dict(kwargs)
+        kwargs[key] = resolve_output_path(kwargs[key], run.output_dir)
+    return args, kwargs
+
+
+def _with_savefig_defaults(args: tuple, kwargs: Dict[str, Any], key: str, index: int):
+    """目标为 PNG 文件时补上当前执行的 savefig 默认参数。"""
+    run = _current_run.get()
+    if run is None or not run.savefig_defaults:
+        return kwargs
+    path = _path_arg(args, kwargs, key, index)
+    if not isinstance(path, (str, os.PathLike)):
+        return kwargs
+    file_format = kwargs.get("format")
+    if file_format is None and not os.fspath(path).lower().endswith(".png"):
+        return kwargs
+    if file_format is not None and str(file_format).lower() != "png":
+        return kwargs
+    merged = dict(run.savefig_defaults)
+    merged.update(kwargs)
+    return merged
+
+
+def _savefig_inline(
+    original: Callable,
+    args: tuple,
+    kwargs: Dict[str, Any],
+    key: str,
+    index: int,
+    run: RunContext,
+):
+    """内联模式：把 savefig 渲染到内存缓冲，返回 (是否已处理, 原函数返回值)。
+
+    目标不是文件路径或格式不支持内联时不处理；超出内联上限时把缓冲写到目标路径。
+    """
+    path = _path_arg(args, kwargs, key, index)
+    if not isinstance(path, (str, os.PathLike)):
+        return False, None
+    target = os.fspath(path)
+    file_format = str(kwargs.get("format") or os.path.splitext(target)[1][1:] or "png").lower()
+    if file_format not in INLINE_MIME_TYPES:
+        return False, None
+
+    buffer = io.BytesIO()
+    call_kwargs = dict(kwargs)
+    call_kwargs["format"] = file_format
+    if len(args) > index:
+        args = args[:index] + (buffer,) + args[index + 1:]
+    else:
+        call_kwargs[key] = buffer
+    result = original(*args, **call_kwargs)
+    data = buffer.getvalue()
+    if not run.inline.add(target, file_format, data):
+        detach_shared_file(target, keep_content=False)
+        with open(target, "wb") as handle:
+            handle.write(data)
+        _record_saved(target)
+    return True, result
+
+
+def _saving_wrapper(
+    key: str, index: int = 0, savefig: bool = False
+) -> Callable[[Callable], Callable]:
+    """构造保存入口包装：改写路径 -> 调用原函数 -> 记入产物清单。
+
+    `index` 为路径参数在 `args` 中的下标：包装的是类上的函数，方法调用时 `args[0]`
+    为 self（plotly.io 函数为 fig），因此这几个入口的路径参数下标都是 1；
+    `savefig=True` 时额外应用 `RunContext.savefig_defaults`。
+    """
+
+    def _builder(original: Callable) -> Callable:
+        def _wrapped(*args, **kwargs):
+            args, kwargs = _rewrite_path_arg(args, kwargs, key, index)
+            if savefig:
+                kwargs = _with_savefig_defaults(args, kwargs, key, index)
+                run = _current_run.get()
+                if run is not None and run.inline is not None:
+                    handled, result = _savefig_inline(original, args, kwargs, key, index, run)
+                    if handled:
+                        return result
+            path = _path_arg(args, kwargs, key, index)
+            if isinstance(path, (str, os.PathLike)):
+                # 目标可能是与其它运行/blob 共享 inode 的去重文件，先断开再写。
+                detach_shared_file(os.fspath(path))
+            result = original(*args, **kwargs)
+            _record_saved(path)
+            return result
+
+        return _wrapped
+
+    return _builder
+
+
+def _wrap_once(owner: Any, name: str, builder: Callable[[Callable], Callable]) -> None:
+    """对 owner.name 只包装一次。"""
+    key = (id(owner), name)
+    with _patch_lock:
+        if key in _patched_targets:
+            return
+        original = getattr(owner, name, None)
+        if original is None:
+            return
+        wrapped = builder(original)
+        wrapped.__wrapped__ = original
+        setattr(owner, name, wrapped)
+        _patched_targets.add(key)
+
+
+def _patch_matplotlib_figure(module: Any) -> None:
+    # 兜底 matplotlib.figure.Figure.savefig(path)
+    if hasattr(module, "Figure"):
+        _wrap_once(module.Figure, "savefig", _saving_wrapper("fname", 1, savefig=True))
+
+
+def _patch_pil_image(module: Any) -> None:
+    # 兜底 PIL.Image.Image.save(path)
+    if hasattr(module, "Image"):
+        _wrap_once(module.Image, "save", _saving_wrapper("fp", 1))
+
+
+def _patch_plotly_io(module: Any) -> None:
+    # fig.write_image/fig.write_html 内部均转调 plotly.io 的同名函数。
+    _wrap_once(module, "write_image", _saving_wrapper("file", 1))
+    _wrap_once(module, "write_html", _saving_wrapper("file", 1))
+
+
+def _patch_pandas_generic(module: Any) -> None:
+    # DataFrame/Series.to_csv(path)；path_or_buf 为空或为缓冲区时不处理。
+    if hasattr(module, "NDFrame"):
+        _wrap_once(module.NDFrame, "to_csv", _saving_wrapper("path_or_buf", 1))
+
+
+# 模块名 -> 打补丁函数。模块已导入时立即打补丁，否则在其首次导入完成后打补丁，
+# 不会为了打补丁而提前导入 plotly/pandas 等重量级库。
+_DEFERRED_PATCHES: Dict[str, Callable[[Any], None]] = {
+    "matplotlib.figure": _patch_matplotlib_figure,
+    "PIL.Image": _patch_pil_image,
+    "plotly.io": _patch_plotly_io,
+    "pandas.core.generic": _patch_pandas_generic,
+}
+
+
+class _PatchingLoader(importlib.abc.Loader):
+    """在原 loader 执行完模块后调用补丁函数，其余属性透传给原 loader。"""
+
+    def __init__(self, loader: Any, patch: Callable[[Any], None]) -> None:
+        self._loader = loader
+        self._patch = patch
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        self._loader.exec_module(module)
+        try:
+            self._patch(module)
+        except Exception:
+            pass
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._loader, name)
+
+
+class _PostImportPatcher(importlib.abc.MetaPathFinder):
+    """只拦截 `_DEFERRED_PATCHES` 中的模块，查找仍交给其余 finder。"""
+
+    def find_spec(self, fullname, path, target=None):
+        patch = _DEFERRED_PATCHES.get(fullname)
+        if patch is None:
+            return None
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, "find_spec", None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _PatchingLoader(spec.loader, patch)
+        return spec
+
+
+def install_save_patches(pyplot: Any = None) -> None:
+    """给常见保存入口与 pyplot.figure 安装上下文感知的包装（幂等）。
+
+    包装后的保存入口会把路径改写到当前执行的输出目录，并记入 `RunContext.saved_files`。
+    """
+    # 兜底 matplotlib.pyplot.savefig(path)
+    if pyplot is not None:
+        _wrap_once(pyplot, "savefig", _saving_wrapper("fname", 0, savefig=True))
+
+        # 记录本次执行创建/激活的 figure，结束时只清理自己的 figure。
+        def _wrap_pyplot_figure(original):
+            def _wrapped(*args, **kwargs):
+                figure = original(*args, **kwargs)
+                run = _current_run.get()
+                number = getattr(figure, "number", None)
+                if run is not None and number is not None and number not in run.figure_numbers:
+                    run.figure_numbers.append(number)
+                return figure
+
+            return _wrapped
+
+        _wrap_once(pyplot, "figure", _wrap_pyplot_figure)
+
+    with _install_lock:
+        if not any(isinstance(item, _PostImportPatcher) for item in sys.meta_path):
+            sys.meta_path.insert(0, _PostImportPatcher())
+    for module_name, patch in _DEFERRED_PATCHES.items():
+        module = sys.modules.get(module_name)
+        if module is not None:
+            patch(module)
+
+
+def scoped_builtins(output_dir: str) -> Dict[str, Any]:
+    """为用户代码构造 builtins：`open` 的相对路径按本次输出目录解析。
+
+    不再依赖 `os.chdir(output_dir)`，因此并行执行互不影响。以写入模式打开已有文件时，
+    先断开其与去重存储共享的硬链接。只替换 `open`：`np.save`、`os.makedirs` 等
+    其它接口的相对路径不改写，并行执行时仍相对进程 cwd。
+    """
+    namespace = dict(vars(builtins))
+    original_open = builtins.open
+
+    def _open(file, *args, **kwargs):
+        if isinstance(file, (str, os.PathLike)):
+            raw = os.fspath(file)
+            if isinstance(raw, str) and raw and not os.path.isabs(raw):
+                file = os.path.join(output_dir, raw)
+            mode = str(args[0] if args else kwargs.get("mode", "r"))
+            if any(flag in mode for flag in "wax+"):
+                detach_shared_file(
+                    os.fspath(file), keep_content=not ("w" in mode or "x" in mode)
+                )
+        return original_open(file, *args, **kwargs)
+
+    namespace["open"] = _open
+    return namespace
@@ -0,0 +1,315 @@
+"""子进程隔离执行：内存/CPU 上限、软超时与中途产物保留。
+
+宿主对工具设置了 `timeoutSec: 90`，脚本失控时整个调用被杀掉，已保存的图表也随之丢失；
+内存也没有任何限制。`executionMode: "subprocess"` 时：
+- 父进程先创建输出目录，再以 `python -m python_chart_ui.sandbox` 启动子进程执行；
+- 子进程设置 RLIMIT_AS（内存）与 RLIMIT_CPU（CPU 秒），超出内存时用户代码得到
+  MemoryError，超出 CPU 软限制时收到 SIGXCPU；
+- 子进程内的软超时（低于宿主超时）只在用户代码执行期间抛出 `ExecutionTimeout`
+  （继承 BaseException，用户代码的 `except Exception` 吞不掉；被裸 except 吞掉时
+  稍后再次抛出），随后照常汇总已生成的文件与输出；
+- 用户代码的输出在捕获的同时逐次写入 runtime/sandbox 下的日志文件与 stderr 管道，
+  子进程被杀或崩溃时部分结果仍带有已打印的 stdout 与 stderr 结尾；
+- 子进程被硬超时杀掉或崩溃时，父进程仍能从已知的输出目录中收集已生成的文件；
+- 批量任务（`jobs`）整体在同一个沙箱子进程内执行，各段代码 fork 出的进程继承
+  同样的资源上限与剩余的软超时。
+
+用户代码超时/超内存时结果中的 errorType 为 `timeout` / `memory_limit`。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from python_chart_ui.bounded_output import DEFAULT_LIMIT_BYTES
+from python_chart_ui.bounded_output import BoundedTextBuffer
+from python_chart_ui.paths import plugin_root
+from python_chart_ui.paths import runtime_dir
+
+SANDBOX_DIR = "sandbox"
+# 与 compile() 时使用的文件名一致，用于判断信号到达时是否位于用户代码中。
+USER_CODE_FILENAME = "<python_chart_exec>"
+# 软超时信号到达时不在用户代码中（例如正在汇总产物），稍后再检查。
+_REARM_SEC = 0.5
+_STDERR_TAIL_BYTES = 4000
+
+
+class ExecutionTimeout(BaseException):
+    """用户代码超过软超时（或 CPU 时间软限制）。
+
+    继承 BaseException 而非 Exception，避免被用户代码中常见的 `except Exception` 吞掉。
+    """
+
+
+@dataclass
+class SubprocessOutcome:
+    """子进程执行结果；`result` 为 None 表示子进程未正常写回结果。"""
+
+    result: Optional[Dict[str, Any]]
+    timed_out: bool
+    returncode: Optional[int]
+    stderr_tail: str
+    # 子进程已输出的 stdout（按字节上限保留首尾）。
+    stdout: str = ""
+    # 子进程消耗的 CPU 秒数（用户态 + 内核态），平台不支持时为 None。
+    cpu_sec: Optional[float] = None
+    cpu_limit_sec: float = 0.0
+
+
+# -- 子进程侧 --------------------------------------------------------------------
+
+
+def apply_resource_limits(memory_limit_mb: float, cpu_limit_sec: float) -> None:
+    """设置当前进程的内存与 CPU 上限（平台不支持时忽略）。"""
+    try:
+        import resource
+    except ImportError:
+        return
+    if memory_limit_mb and memory_limit_mb > 0:
+        limit = int(memory_limit_mb * 1024 * 1024)
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+    if cpu_limit_sec and cpu_limit_sec > 0:
+        soft = int(cpu_limit_sec)
+        try:
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, soft + 5))
+        except (ValueError, OSError):
+            pass
+
+
+def _in_user_code(frame: Any) -> bool:
+    while frame is not None:
+        if frame.f_code.co_filename == USER_CODE_FILENAME:
+            return True
+        frame = frame.f_back
+    return False
+
+
+def install_soft_timeout(seconds: float) -> None:
+    """到时后在用户代码中抛出 `ExecutionTimeout`；SIGXCPU 按同样方式处理。"""
+
+    def _on_timeout(signum, frame):
+        # 先重新上弦：异常若被用户代码的裸 except 吞掉，稍后仍会再次抛出。
+        signal.setitimer(signal.ITIMER_REAL, _REARM_SEC)
+        if _in_user_code(frame):
+            raise ExecutionTimeout(f"user code exceeded {seconds:g}s soft timeout")
+
+    def _on_cpu_limit(signum, frame):
+        if _in_user_code(frame):
+            raise ExecutionTimeout("user code exceeded CPU time limit")
+
+    if not hasattr(signal, "setitimer"):
+        return
+    signal.signal(signal.SIGALRM, _on_timeout)
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    if seconds and seconds > 0:
+        signal.setitimer(signal.ITIMER_REAL, float(seconds))
+
+
+def _child_main() -> None:
+    parser = argparse.ArgumentParser(description="python_chart_exec sandboxed run")
+    parser.add_argument("--tool", required=True)
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--result-file", required=True)
+    parser.add_argument("--soft-timeout", type=float, default=0.0)
+    parser.add_argument("--memory-mb", type=float, default=0.0)
+    parser.add_argument("--cpu-sec", type=float, default=0.0)
+    args = parser.parse_args()
+
+    payload = json.load(sys.stdin)
+    apply_resource_limits(args.memory_mb, args.cpu_sec)
+    install_soft_timeout(args.soft_timeout)
+
+    from python_chart_ui.kernel import load_tool_module
+
+    tool = load_tool_module(args.tool)
+    if payload.get("jobs"):
+        from python_chart_ui.settings import load_settings
+
+        result = tool._run_batch(payload, load_settings(), output_dir=args.output_dir)
+    else:
+        result = tool._run_local(
+            payload, allow_chdir=True, output_dir=args.output_dir, stream_output=True
+        )
+    if hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    tmp_path = f"{args.result_file}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(result, handle, ensure_ascii=False, default=str)
+    os.replace(tmp_path, args.result_file)
+
+
+# -- 父进程侧 --------------------------------------------------------------------
+
+
+def run_in_subprocess(
+    tool_path: str,
+    payload: Dict[str, Any],
+    output_dir: str,
+    soft_timeout: float,
+    hard_timeout: float,
+    memory_limit_mb: float = 0.0,
+    cpu_limit_sec: float = 0.0,
+    stdout_limit_bytes: int = DEFAULT_LIMIT_BYTES,
+) -> SubprocessOutcome:
+    """在子进程中执行一次图表代码，超过 `hard_timeout` 时杀掉整个进程组。
+
+    子进程的 stdout 直接写到日志文件（不经管道，父进程无需边读边等），结束后按
+    `stdout_limit_bytes` 保留首尾读回。
+    """
+    env = dict(os.environ)
+    python_path = env.get("PYTHONPATH", "")
+    env["PYTHONPATH"] = plugin_root() + (os.pathsep + python_path if python_path else "")
+    # 限制 BLAS 线程数，避免每个线程预留的虚拟内存挤占 RLIMIT_AS。
+    for name in ("OPENBLAS_NUM_THREADS", "OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        env.setdefault(name, "1")
+
+    # 结果文件放在输出目录之外，避免被当作产物收集。
+    token = uuid.uuid4().hex[:12]
+    result_file = runtime_dir(SANDBOX_DIR, f"result_{token}.json")
+    stdout_file = runtime_dir(SANDBOX_DIR, f"stdout_{token}.log")
+    os.makedirs(os.path.dirname(result_file), exist_ok=True)
+    command = [
+        sys.executable,
+        "-m",
+        "python_chart_ui.sandbox",
+        "--tool",
+        os.path.abspath(tool_path),
+        "--output-dir",
+        output_dir,
+        "--result-file",
+        result_file,
+        "--soft-timeout",
+        str(float(soft_timeout)),
+        "--memory-mb",
+        str(float(memory_limit_mb or 0)),
+        "--cpu-sec",
+        str(float(cpu_limit_sec or 0)),
+    ]
+    cpu_before = _children_cpu_sec()
+    with open(stdout_file, "wb") as stdout_handle:
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=stdout_handle,
+            stderr=subprocess.PIPE,
+            cwd=os.getcwd(),
+            env=env,
+            close_fds=True,
+            start_new_session=True,
+        )
+    timed_out = False
+    try:
+        _, stderr_data = process.communicate(
+            json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"),
+            timeout=hard_timeout,
+        )
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        killpg = getattr(os, "killpg", None)
+        try:
+            if killpg is None:
+                raise OSError("killpg unsupported")
+            # 连同用户代码可能派生的子进程一起结束。
+            killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            process.kill()
+        _, stderr_data = process.communicate()
+    cpu_after = _children_cpu_sec()
+
+    result: Optional[Dict[str, Any]] = None
+    try:
+        with open(result_file, "r", encoding="utf-8") as handle:
+            loaded = json.load(handle)
+        if isinstance(loaded, dict):
+            result = loaded
+    except (OSError, ValueError):
+        result = None
+    finally:
+        try:
+            os.remove(result_file)
+        except OSError:
+            pass
+    stderr_tail = (stderr_data or b"")[-_STDERR_TAIL_BYTES:].decode("utf-8", "replace")
+    return SubprocessOutcome(
+        result=result,
+        timed_out=timed_out,
+        returncode=process.returncode,
+        stderr_tail=stderr_tail,
+        stdout=_read_bounded(stdout_file, stdout_limit_bytes),
+        cpu_sec=(
+            cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+        ),
+        cpu_limit_sec=float(cpu_limit_sec or 0),
+    )
+
+
+def _children_cpu_sec() -> Optional[float]:
+    """已回收子进程累计消耗的 CPU 秒数。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _read_bounded(path: str, limit_bytes: int) -> str:
+    """分块读回子进程 stdout 日志（保留首尾、折叠重复行）后删除日志文件。"""
+    buffer = BoundedTextBuffer(limit_bytes)
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as handle:
+            for chunk in iter(lambda: handle.read(64 * 1024), ""):
+                buffer.write(chunk)
+    except OSError:
+        pass
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return buffer.getvalue()
+
+
+def classify_failure(outcome: SubprocessOutcome) -> str:
+    """子进程未写回结果时推断 errorType。"""
+    if outcome.timed_out:
+        return "timeout"
+    code = outcome.returncode
+    lowered = outcome.stderr_tail.lower()
+    if "memoryerror" in lowered or "cannot allocate memory" in lowered:
+        return "memory_limit"
+    if code is not None and code < 0:
+        signum = -code
+        if hasattr(signal, "SIGXCPU") and signum == signal.SIGXCPU:
+            return "timeout"
+        if signum == signal.SIGKILL:
+            # RLIMIT_CPU 硬限制（软限制 + 5 秒）同样以 SIGKILL 结束进程，属于超时；
+            # 其余未被本进程超时杀掉的 SIGKILL 通常来自 OOM killer。
+            if (
+                outcome.cpu_limit_sec > 0
+                and outcome.cpu_sec is not None
+                and outcome.cpu_sec >= outcome.cpu_limit_sec
+            ):
+                return "timeout"
+            return "memory_limit"
+    return "worker_crashed"
+
+
+if __name__ == "__main__":
+    # 经包名重新导入再执行：`-m` 运行的本文件是 __main__ 模块，其中的 ExecutionTimeout
+    # 与工具脚本导入的 python_chart_ui.sandbox.ExecutionTimeout 不是同一个类。
+    from python_chart_ui.sandbox import _child_main as _package_child_main
+
+    _package_child_main()
@@ -0,0 +1,118 @@
+"""图表任务调度：并发上限、有界排队、优先级与排队超时。
+
+多个会话同时调用 `python_chart_exec` 时，每次调用都是一次重量级执行。
+调度器在工具入口前做准入控制：
+- 同时执行的任务数不超过 `max_workers`；
+- 等待中的任务数不超过 `max_queue`，超出时直接拒绝（`SchedulerOverloaded`）；
+- 等待超过 `queue_timeout` 的任务放弃执行（`QueueWaitTimeout`）；
+- 等待队列按优先级（数值越大越优先）再按到达顺序出队。
+
+任务在调用线程中执行，调度器只发放执行许可，不额外创建线程。
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class SchedulerOverloaded(RuntimeError):
+    """执行槽与等待队列均已满，拒绝准入。"""
+
+
+class QueueWaitTimeout(RuntimeError):
+    """任务在队列中等待超时。"""
+
+
+class ChartJobScheduler:
+    """带优先级的有界任务许可池。"""
+
+    def __init__(self, max_workers: int = 1, max_queue: int = 8) -> None:
+        self._cond = threading.Condition()
+        self._waiting: List[Tuple[int, int]] = []
+        self._cancelled: set = set()
+        self._sequence = itertools.count()
+        self._active = 0
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+
+    def configure(self, max_workers: int, max_queue: int) -> None:
+        """调整并发与队列上限（已在执行/排队的任务不受影响）。"""
+        with self._cond:
+            self.max_workers = max(1, int(max_workers))
+            self.max_queue = max(0, int(max_queue))
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        """返回当前调度状态。"""
+        with self._cond:
+            return {
+                "active": self._active,
+                "queued": len(self._waiting) - len(self._cancelled),
+                "maxWorkers": self.max_workers,
+                "maxQueue": self.max_queue,
+            }
+
+    def _head(self) -> Optional[Tuple[int, int]]:
+        while self._waiting and self._waiting[0] in self._cancelled:
+            self._cancelled.discard(heapq.heappop(self._waiting))
+        return self._waiting[0] if self._waiting else None
+
+    def run(
+        self,
+        fn: Callable[[], Any],
+        priority: int = 0,
+        queue_timeout: Optional[float] = None,
+    ) -> Tuple[Any, float]:
+        """申请执行许可并在当前线程运行 `fn`，返回 (结果, 排队毫秒数)。"""
+        started = time.monotonic()
+        with self._cond:
+            queued = len(self._waiting) - len(self._cancelled)
+            if self._active >= self.max_workers and queued >= self.max_queue:
+                raise SchedulerOverloaded(
+                    f"chart scheduler overloaded (active={self._active}, queued={queued})"
+                )
+            ticket = (-int(priority), next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            deadline = None if not queue_timeout else started + float(queue_timeout)
+            while not (self._head() == ticket and self._active < self.max_workers):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._cancelled.add(ticket)
+                    self._head()
+                    self._cond.notify_all()
+                    raise QueueWaitTimeout(
+                        f"chart job waited more than {queue_timeout}s in queue"
+                    )
+                self._cond.wait(remaining)
+            heapq.heappop(self._waiting)
+            self._active += 1
+            # 队首变化后唤醒其它等待者（可能还有空闲执行槽）。
+            self._cond.notify_all()
+        wait_ms = round((time.monotonic() - started) * 1000, 1)
+        try:
+            return fn(), wait_ms
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+
+_scheduler: Optional[ChartJobScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(max_workers: int, max_queue: int) -> ChartJobScheduler:
+    """返回进程级调度器单例。
+
+    上限只在首次创建时确定，之后的参数被忽略：单次调用不能改变整个进程的并发，
+    需要调整时显式调用 `configure`。
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ChartJobScheduler(max_workers, max_queue)
+        return _scheduler
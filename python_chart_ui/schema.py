@@ -6,26 +6,22 @@ import contextlib
 import io
 import os
 import traceback
-from dataclasses import dataclass
 from typing import Any, Dict
 
 from python_chart_ui import UiButton
 from python_chart_ui import UiPage
 from python_chart_ui import UiTextInput
+from python_chart_ui.artifacts import index_stats
+from python_chart_ui.font_setup import setup_matplotlib_chinese
+from python_chart_ui.lib_versions import CHART_LIBRARIES
+from python_chart_ui.lib_versions import MISSING
+from python_chart_ui.lib_versions import library_versions
+from python_chart_ui.warmup import warmup_status
 
 
 class PythonChartLibsConfigPage(UiPage):
     """图表增强插件配置页实现。"""
 
-    @dataclass
-    class _FontCandidate:
-        """候选字体信息。"""
-
-        path: str
-        source_order: int
-        preferred_hit: bool
-        supports_cjk: bool
-
     def _default_state(self) -> Dict[str, Any]:
         """默认页面状态。"""
         return {
@@ -49,234 +45,32 @@ class PythonChartLibsConfigPage(UiPage):
         }
 
     def _check_environment(self) -> str:
-        """检查常见图表处理库是否可导入。"""
-        libs = ("numpy", "pandas", "matplotlib", "seaborn", "plotly")
+        """检查常见图表处理库是否已安装（读取包元数据，不导入库本身）。"""
         lines = []
-        for name in libs:
-            try:
-                module = __import__(name)
-                version = getattr(module, "__version__", "unknown")
+        for name, version in library_versions(CHART_LIBRARIES).items():
+            if version == MISSING:
+                lines.append(f"{name}: FAIL (not installed)")
+            else:
                 lines.append(f"{name}: OK ({version})")
-            except Exception as error:
-                lines.append(f"{name}: FAIL ({error})")
-        return "\n".join(lines)
-
-    def _font_supports_chinese(self, font_path: str) -> bool:
-        """检测字体是否包含常见中文字符。"""
-        try:
-            from fontTools.ttLib import TTCollection
-            from fontTools.ttLib import TTFont
-        except Exception:
-            return False
-
-        required_chars = ("中", "文", "图", "表", "月")
-        required_codes = {ord(ch) for ch in required_chars}
-
-        def _font_has_required_codes(font_obj: Any) -> bool:
-            cmap_table = getattr(font_obj, "cmap", None)
-            if cmap_table is None:
-                return False
-            covered = set()
-            for table in getattr(cmap_table, "tables", []):
-                cmap = getattr(table, "cmap", None) or {}
-                covered.update(cmap.keys())
-                if required_codes.issubset(covered):
-                    return True
-            return False
-
-        try:
-            lower_name = os.path.basename(font_path).lower()
-            if lower_name.endswith(".ttc"):
-                collection = TTCollection(font_path, lazy=True)
-                try:
-                    for font_obj in collection.fonts:
-                        if _font_has_required_codes(font_obj):
-                            return True
-                finally:
-                    try:
-                        collection.close()
-                    except Exception:
-                        pass
-                return False
-
-            font_obj = TTFont(font_path, lazy=True)
-            try:
-                return _font_has_required_codes(font_obj)
-            finally:
-                try:
-                    font_obj.close()
-                except Exception:
-                    pass
-        except Exception:
-            return False
-
-    def _collect_chinese_font_candidates(self) -> list[_FontCandidate]:
-        """收集可用于 matplotlib 的中文字体候选。"""
-        schema_dir = os.path.dirname(os.path.abspath(__file__))
-        plugin_root = os.path.dirname(schema_dir)
-        # 重要：
-        # Android 上对 /system/fonts 全量扫描并 addfont，容易在部分机型触发 ft2font 原生崩溃。
-        # 这里不再遍历系统字体目录，只使用：
-        # 1) 插件内字体目录（推荐）
-        # 2) 少量系统白名单字体路径（存在才加入）
-        candidate_dirs = [
-            os.path.join(plugin_root, "assets", "fonts"),
-            os.path.join(plugin_root, "libs", "fonts"),
-        ]
-        system_font_whitelist = [
-            "/system/fonts/NotoSansCJK-Regular.ttc",
-            "/system/fonts/NotoSansSC-Regular.otf",
-            "/system/fonts/SourceHanSansCN-Regular.otf",
-            "/system/fonts/DroidSansFallback.ttf",
-        ]
-        preferred_names = (
-            "harmony",
-            "hmos",
-            "NotoSansCJK",
-            "NotoSansSC",
-            "SourceHanSans",
-            "DroidSansFallback",
-            "MiSans",
-            "PingFang",
-            "simhei",
-            "msyh",
+        warmup = warmup_status()
+        steps = ", ".join(
+            f"{item.get('name')}={item.get('status')}({item.get('ms')}ms)"
+            for item in warmup.get("steps") or []
         )
-        result: list[PythonChartLibsConfigPage._FontCandidate] = []
-        seen = set()
-        for source_order, folder in enumerate(candidate_dirs):
-            if not os.path.isdir(folder):
-                continue
-            for root, _, files in os.walk(folder):
-                for name in files:
-                    lower = name.lower()
-                    if not (
-                        lower.endswith(".ttf")
-                        or lower.endswith(".ttc")
-                        or lower.endswith(".otf")
-                    ):
-                        continue
-                    full_path = os.path.abspath(os.path.join(root, name))
-                    if full_path in seen:
-                        continue
-                    seen.add(full_path)
-                    preferred_hit = any(
-                        keyword.lower() in os.path.basename(full_path).lower()
-                        for keyword in preferred_names
-                    )
-                    result.append(
-                        PythonChartLibsConfigPage._FontCandidate(
-                            path=full_path,
-                            source_order=source_order,
-                            preferred_hit=preferred_hit,
-                            supports_cjk=self._font_supports_chinese(full_path),
-                        )
-                    )
-
-        # 仅追加系统白名单字体，避免全量扫描系统目录导致 native 崩溃。
-        for full_path in system_font_whitelist:
-            normalized = os.path.abspath(full_path)
-            if normalized in seen or not os.path.isfile(normalized):
-                continue
-            seen.add(normalized)
-            preferred_hit = any(
-                keyword.lower() in os.path.basename(normalized).lower()
-                for keyword in preferred_names
-            )
-            result.append(
-                PythonChartLibsConfigPage._FontCandidate(
-                    path=normalized,
-                    source_order=99,
-                    preferred_hit=preferred_hit,
-                    supports_cjk=self._font_supports_chinese(normalized),
-                )
-            )
-
-        # 排序策略：
-        # 1) 先保证“实际支持中文字形”；
-        # 2) 再按命名关键词倾向中文字体；
-        # 3) 再按目录优先级（插件内字体 > 系统字体）。
-        result.sort(
-            key=lambda item: (
-                0 if item.supports_cjk else 1,
-                0 if item.preferred_hit else 1,
-                item.source_order,
-                os.path.basename(item.path).lower(),
+        lines.append(f"warmup: {warmup.get('status')}" + (f" [{steps}]" if steps else ""))
+        try:
+            stats = index_stats()
+            lines.append(
+                f"artifacts: runs={stats['runs']}, files={stats['artifacts']},"
+                f" bytes={stats['totalBytes']}, unique={stats['uniqueBytes']}"
             )
-        )
-        return result
+        except Exception as error:
+            lines.append(f"artifacts: FAIL ({error})")
+        return "\n".join(lines)
 
     def _setup_matplotlib_chinese(self) -> str:
         """配置 matplotlib 中文字体，避免图表中文显示为方块。"""
-        try:
-            import matplotlib
-        except Exception:
-            return "matplotlib: missing"
-
-        try:
-            matplotlib.use("Agg")
-        except Exception:
-            pass
-
-        try:
-            from matplotlib import font_manager
-        except Exception:
-            font_manager = None
-
-        resolved_names: list[str] = []
-        selected_font_name = ""
-        selected_font_path = ""
-        scanned_font_count = 0
-        cjk_ready_count = 0
-        for candidate in self._collect_chinese_font_candidates():
-            font_path = candidate.path
-            scanned_font_count += 1
-            if candidate.supports_cjk:
-                cjk_ready_count += 1
-            try:
-                if font_manager is not None:
-                    font_manager.fontManager.addfont(font_path)
-                    font_name = font_manager.FontProperties(fname=font_path).get_name()
-                else:
-                    font_name = ""
-            except Exception:
-                continue
-            if font_name and font_name not in resolved_names:
-                resolved_names.append(font_name)
-            if candidate.supports_cjk and font_name and not selected_font_name:
-                selected_font_name = font_name
-                selected_font_path = font_path
-
-        # 没找到“验证通过”的中文字体时，降级使用第一个成功注册字体。
-        if not selected_font_name and resolved_names:
-            selected_font_name = resolved_names[0]
-
-        fallback_names = [
-            "Noto Sans CJK SC",
-            "Noto Sans CJK",
-            "Source Han Sans CN",
-            "Droid Sans Fallback",
-            "sans-serif",
-        ]
-        final_names = resolved_names + [name for name in fallback_names if name not in resolved_names]
-        try:
-            # 关键：优先把 family 指向具体字体名，避免落到 DejaVu Sans 这类无中文字形字体。
-            if selected_font_name:
-                matplotlib.rcParams["font.family"] = [selected_font_name]
-            else:
-                matplotlib.rcParams["font.family"] = ["sans-serif"]
-            matplotlib.rcParams["font.sans-serif"] = final_names
-            matplotlib.rcParams["axes.unicode_minus"] = False
-        except Exception as error:
-            return f"matplotlib font setup failed: {error}"
-        if selected_font_name:
-            return (
-                f"matplotlib font ready: name={selected_font_name}, path={selected_font_path}, "
-                f"scanned={scanned_font_count}, cjkReady={cjk_ready_count}, loaded={len(resolved_names)}"
-            )
-        return (
-            "matplotlib font fallback ready "
-            f"(scanned={scanned_font_count}, cjkReady={cjk_ready_count}, loaded={len(resolved_names)})"
-        )
+        return setup_matplotlib_chinese()
 
     def _execute_python_code(self, code: str) -> str:
         """在页面内执行图表处理代码并输出结果。"""
@@ -0,0 +1,213 @@
+"""会话命名空间：同一对话的多次执行共享选定的变量。
+
+每次 `main()` 都新建 `exec_scope`，"同样的图改成对数坐标"这类追问只能把数据加载与清洗
+重做一遍。payload 带 `sessionId` 时，执行结束后把选定变量（`sessionKeep` 指定的名字，
+未指定时为全部数据类变量）保存在执行进程内的会话中，下次同一会话执行前注入作用域。
+
+会话只存在于执行代码的进程内存中，因此应配合常驻进程（`executionMode: "kernel"`）使用；
+fork/subprocess 模式下带 `sessionId` 的调用改由常驻进程执行，且不使用结果缓存。
+每个会话有内存上限（超出时从最大的变量开始丢弃）与空闲过期时间；所有会话合计超出上限
+或数量超出上限时，按最近最少使用淘汰其它会话。内存按 numpy `nbytes`、pandas
+`memory_usage(deep=True)` 与容器的浅层递归估算。
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any, Dict, Iterable, List, Optional
+
+# 这些库的对象（figure、axes 等）持有绘图状态，不跨执行保存。
+_EXCLUDED_TYPE_MODULES = ("matplotlib", "plotly", "seaborn", "python_chart_ui")
+_CONTAINER_SAMPLE = 1000
+
+
+@dataclass
+class Session:
+    """一个会话的变量与用量。"""
+
+    session_id: str
+    namespace: Dict[str, Any] = field(default_factory=dict)
+    sizes: Dict[str, int] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.monotonic)
+    runs: int = 0
+
+    @property
+    def bytes(self) -> int:
+        return sum(self.sizes.values())
+
+
+def estimate_bytes(value: Any, depth: int = 0) -> int:
+    """估算对象占用的内存字节数（numpy/pandas 精确，容器抽样递归）。"""
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage) and hasattr(value, "dtypes"):
+        try:
+            usage = memory_usage(deep=True)
+            return int(usage.sum() if hasattr(usage, "sum") else usage)
+        except Exception:
+            pass
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    size = sys.getsizeof(value, 0)
+    if depth >= 3:
+        return size
+    if isinstance(value, dict):
+        items = list(value.items())
+        sample = items[:_CONTAINER_SAMPLE]
+        if sample:
+            part = sum(
+                estimate_bytes(key, depth + 1) + estimate_bytes(item, depth + 1)
+                for key, item in sample
+            )
+            size += part * len(items) // len(sample)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+        sample = items[:_CONTAINER_SAMPLE]
+        if sample:
+            part = sum(estimate_bytes(item, depth + 1) for item in sample)
+            size += part * len(items) // len(sample)
+    return size
+
+
+def is_session_value(value: Any) -> bool:
+    """是否适合跨执行保存：排除模块、函数、类与绘图对象。
+
+    函数会通过 `__globals__` 引用整个旧作用域，保存它等于保存全部变量，因此不保存。
+    """
+    if isinstance(value, (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, type)):
+        return False
+    if isinstance(value, (types.MethodType, types.GeneratorType)):
+        return False
+    module = type(value).__module__ or ""
+    return module.split(".")[0] not in _EXCLUDED_TYPE_MODULES
+
+
+class SessionStore:
+    """进程内的会话表（按最近使用排序）。"""
+
+    def __init__(self) -> None:
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, idle_ttl: float) -> List[str]:
+        if idle_ttl <= 0:
+            return []
+        now = time.monotonic()
+        expired = [
+            key for key, session in self._sessions.items() if now - session.last_used > idle_ttl
+        ]
+        for key in expired:
+            del self._sessions[key]
+        return expired
+
+    def checkout(self, session_id: str, idle_ttl: float) -> Dict[str, Any]:
+        """返回会话中保存的变量（浅拷贝的字典），会话不存在或已过期时返回空字典。"""
+        with self._lock:
+            self._purge_expired(idle_ttl)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return {}
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return dict(session.namespace)
+
+    def commit(
+        self,
+        session_id: str,
+        values: Dict[str, Any],
+        max_session_bytes: int,
+        max_total_bytes: int,
+        max_sessions: int,
+        idle_ttl: float,
+    ) -> Dict[str, Any]:
+        """保存本次执行选定的变量并执行上限与淘汰，返回本会话的统计。"""
+        sizes = {name: estimate_bytes(value) for name, value in values.items()}
+        dropped: List[str] = []
+        if max_session_bytes > 0:
+            # 超出单会话上限时从最大的变量开始丢弃。
+            for name in sorted(sizes, key=sizes.get, reverse=True):
+                if sum(sizes.values()) <= max_session_bytes:
+                    break
+                dropped.append(name)
+                del sizes[name]
+        namespace = {name: values[name] for name in sizes}
+
+        with self._lock:
+            expired = self._purge_expired(idle_ttl)
+            session = self._sessions.get(session_id) or Session(session_id)
+            session.namespace = namespace
+            session.sizes = sizes
+            session.last_used = time.monotonic()
+            session.runs += 1
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+
+            evicted: List[str] = []
+            total = sum(item.bytes for item in self._sessions.values())
+            for key in list(self._sessions):
+                over_count = max_sessions > 0 and len(self._sessions) > max_sessions
+                over_bytes = max_total_bytes > 0 and total > max_total_bytes
+                if not (over_count or over_bytes):
+                    break
+                if key == session_id:
+                    continue
+                total -= self._sessions.pop(key).bytes
+                evicted.append(key)
+
+        return {
+            "id": session_id,
+            "bytes": session.bytes,
+            "variables": sorted(sizes),
+            "dropped": dropped,
+            "runs": session.runs,
+            "evicted": evicted,
+            "expired": expired,
+        }
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def usage(self) -> Dict[str, int]:
+        """各会话当前持有的内存估算（字节）。"""
+        with self._lock:
+            return {key: session.bytes for key, session in self._sessions.items()}
+
+
+_store = SessionStore()
+
+
+def get_session_store() -> SessionStore:
+    """返回当前进程的会话表。"""
+    return _store
+
+
+def select_session_values(
+    scope: Dict[str, Any],
+    keep: Optional[Iterable[str]],
+    excluded: Iterable[str],
+) -> Dict[str, Any]:
+    """从执行作用域中选出要保存的变量。
+
+    `keep` 为 None 时选择全部不以下划线开头、适合保存的变量；否则只选列出的名字。
+    """
+    excluded = set(excluded)
+    if keep is not None:
+        names = [str(name) for name in keep]
+    else:
+        names = [name for name in scope if not name.startswith("_")]
+    selected: Dict[str, Any] = {}
+    for name in names:
+        if name in excluded or name not in scope:
+            continue
+        value = scope[name]
+        if is_session_value(value):
+            selected[name] = value
+    return selected
@@ -0,0 +1,107 @@
+"""插件级运行设置。
+
+默认值定义在 `DEFAULT_SETTINGS`，可通过 `runtime/settings.json` 覆盖，
+单次工具调用还可以在 payload 中用同名键覆盖（见 `resolve_option`）。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from python_chart_ui.paths import read_json
+from python_chart_ui.paths import runtime_dir
+
+SETTINGS_FILE = "settings.json"
+
+DEFAULT_SETTINGS: Dict[str, Any] = {
+    # 执行方式：local（当前进程内执行）/ kernel（转发给常驻预热进程串行执行）
+    # / fork（常驻进程作为 zygote，每次 fork 子进程隔离执行）
+    # / subprocess（每次启动带内存/CPU 上限与软超时的子进程执行）。
+    "executionMode": "local",
+    # 常驻进程空闲多久后自动退出（秒）。
+    "kernelIdleTimeoutSec": 1800,
+    # 转发给常驻进程后等待结果的最长时间（秒），应小于宿主工具超时。
+    "kernelRequestTimeoutSec": 80,
+    # 同时执行的图表任务数；0 表示自动（fork 模式取 CPU 核数，其它模式为 1）。
+    "schedulerMaxWorkers": 0,
+    # 等待执行的任务上限，超出时直接返回 errorType=overloaded。
+    "schedulerMaxQueue": 8,
+    # 单个任务最长排队时间（秒），超时返回 errorType=queue_timeout。
+    "schedulerQueueTimeoutSec": 30,
+    # 应用启动时是否在后台预热（预编译、字体缓存、matplotlib 导入）。
+    "warmupOnStart": True,
+    # 预热时是否顺带拉起常驻进程（仅 executionMode 为 kernel/fork 时生效）。
+    "warmupStartKernel": True,
+    # 是否启用执行结果缓存（相同代码/库版本/字体/选项直接返回上次结果），payload 可覆盖。
+    "resultCache": False,
+    # 结果缓存总大小与条目数上限，超出时按最近最少使用淘汰。
+    "resultCacheMaxBytes": 256 * 1024 * 1024,
+    "resultCacheMaxEntries": 200,
+    # 是否把每次运行与产物登记到 runtime/artifacts.sqlite3（相同内容的图片去重为硬链接）。
+    "artifactIndex": True,
+    # chart_outputs 运行目录保留策略（0 表示不限制该项）。
+    "retentionMaxAgeHours": 72,
+    "retentionMaxTotalBytes": 512 * 1024 * 1024,
+    "retentionMaxRuns": 300,
+    # 每轮最多删除的运行目录数，以及两轮后台清理的最小间隔（秒，0 表示关闭自动清理）。
+    "retentionBatchSize": 50,
+    "retentionIntervalSec": 600,
+    # stdout/stderr 捕获的字节上限（保留首尾，合计应小于 plugin.json 的 outputLimit）。
+    "captureStdoutBytes": 12000,
+    "captureStderrBytes": 8000,
+    # subprocess 模式：用户代码软超时、子进程硬超时（均应小于宿主的 90 秒）、
+    # 地址空间上限（MB）与 CPU 时间上限（秒），0 表示不限制。
+    "sandboxSoftTimeoutSec": 70,
+    "sandboxHardTimeoutSec": 85,
+    "sandboxMemoryLimitMb": 2048,
+    "sandboxCpuLimitSec": 80,
+    # 批量执行（payload.jobs）的任务数上限与并行度（0 表示按 CPU 核数）。
+    "batchMaxJobs": 16,
+    "batchMaxWorkers": 0,
+    # 批量执行中单段代码的最长执行时间（秒，0 表示不限制），应小于宿主工具超时。
+    "batchJobTimeoutSec": 60,
+    # 自动保存 figure 的并行度（0 表示按 CPU 核数，1 表示串行），以及启用并行的最少 figure 数。
+    "autoSaveMaxWorkers": 0,
+    "autoSaveParallelMinFigures": 4,
+    # 图片输出编码：目标格式 png/webp/jpeg、PNG 压缩级别（None 为库默认）、
+    # 调色板量化的最大颜色数（0 表示关闭）与 WebP/JPEG 质量，payload 可覆盖。
+    "imageFormat": "png",
+    "pngCompressLevel": None,
+    "paletteMaxColors": 0,
+    "imageQuality": 90,
+    # 为 PNG 产物额外生成的缩略图宽度（像素，如 [320]），空列表表示不生成。
+    "thumbnailWidths": [],
+    # 返回方式：file（写入输出目录）/ inline（savefig 与自动保存的图片以 base64 内联返回），
+    # 以及单次执行内联图片的总字节上限，超出部分照常写盘；0 表示按 plugin.json 的
+    # outputLimit 推导（24000 字符时约 12 KB，base64 后约 16000 字符）。
+    "returnMode": "file",
+    "inlineMaxBytes": 0,
+    # 会话（payload.sessionId）：单会话内存上限、所有会话合计上限、会话数上限
+    # 与空闲过期时间（秒），超出合计或数量上限时按最近最少使用淘汰。
+    "sessionMaxBytes": 256 * 1024 * 1024,
+    "sessionTotalMaxBytes": 1024 * 1024 * 1024,
+    "sessionMaxCount": 16,
+    "sessionIdleTtlSec": 1800,
+}
+
+
+def load_settings() -> Dict[str, Any]:
+    """读取合并后的设置（默认值 + runtime/settings.json）。"""
+    settings = dict(DEFAULT_SETTINGS)
+    overrides = read_json(runtime_dir(SETTINGS_FILE))
+    if isinstance(overrides, dict):
+        settings.update(overrides)
+    return settings
+
+
+def resolve_option(
+    payload: Dict[str, Any],
+    key: str,
+    settings: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """按 payload > runtime/settings.json > 默认值 的优先级读取选项。"""
+    if isinstance(payload, dict) and payload.get(key) is not None:
+        return payload[key]
+    if settings is None:
+        settings = load_settings()
+    return settings.get(key, DEFAULT_SETTINGS.get(key))
@@ -0,0 +1,170 @@
+"""基于 mmap 的 sfnt cmap 轻量探测。
+
+只读取表目录与一个 format 4/12 的 Unicode cmap 子表，直接在映射内存中
+二分查找码点，不构建完整字形映射。用于替代 fontTools 全量加载来判断
+字体是否包含指定字符。
+"""
+
+from __future__ import annotations
+
+import mmap
+import struct
+from typing import Iterable, List, Optional
+
+_TAG_TTC = b"ttcf"
+_TAG_CMAP = b"cmap"
+
+# (platformID, encodingID) -> 优先级，数值越小越优先。
+# format 12 覆盖完整 Unicode，优先于仅覆盖 BMP 的 format 4。
+_UNICODE_ENCODINGS = {
+    (3, 10): 0,
+    (0, 6): 1,
+    (0, 4): 2,
+    (3, 1): 3,
+    (0, 3): 4,
+    (0, 2): 5,
+    (0, 1): 6,
+    (0, 0): 7,
+}
+
+
+def _u16(buf, offset: int) -> int:
+    return struct.unpack_from(">H", buf, offset)[0]
+
+
+def _u32(buf, offset: int) -> int:
+    return struct.unpack_from(">I", buf, offset)[0]
+
+
+def _face_offsets(buf) -> List[int]:
+    """返回字体文件内每个 face 的 offset table 偏移（TTC 为多个）。"""
+    if buf[:4] == _TAG_TTC:
+        num_fonts = _u32(buf, 8)
+        return [_u32(buf, 12 + 4 * index) for index in range(num_fonts)]
+    return [0]
+
+
+def _find_table(buf, face_offset: int, tag: bytes) -> Optional[int]:
+    """在 face 的表目录中查找指定表，返回表起始偏移。"""
+    num_tables = _u16(buf, face_offset + 4)
+    record = face_offset + 12
+    for _ in range(num_tables):
+        if buf[record:record + 4] == tag:
+            return _u32(buf, record + 8)
+        record += 16
+    return None
+
+
+def _select_subtable(buf, cmap_offset: int) -> Optional[int]:
+    """选择一个可直接查询的 Unicode 子表（format 4 或 12），返回其绝对偏移。"""
+    num_records = _u16(buf, cmap_offset + 2)
+    best_offset: Optional[int] = None
+    best_rank = None
+    record = cmap_offset + 4
+    for _ in range(num_records):
+        platform_id = _u16(buf, record)
+        encoding_id = _u16(buf, record + 2)
+        sub_offset = cmap_offset + _u32(buf, record + 4)
+        record += 8
+        priority = _UNICODE_ENCODINGS.get((platform_id, encoding_id))
+        if priority is None:
+            continue
+        sub_format = _u16(buf, sub_offset)
+        if sub_format not in (4, 12):
+            continue
+        rank = (0 if sub_format == 12 else 1, priority)
+        if best_rank is None or rank < best_rank:
+            best_rank = rank
+            best_offset = sub_offset
+    return best_offset
+
+
+def _format4_has(buf, sub_offset: int, code: int) -> bool:
+    """在 format 4 子表中查找码点是否映射到非 .notdef 字形。"""
+    if code > 0xFFFF:
+        return False
+    seg_count = _u16(buf, sub_offset + 6) // 2
+    end_base = sub_offset + 14
+    start_base = end_base + seg_count * 2 + 2
+    delta_base = start_base + seg_count * 2
+    range_base = delta_base + seg_count * 2
+
+    low, high = 0, seg_count - 1
+    segment = -1
+    while low <= high:
+        mid = (low + high) // 2
+        if _u16(buf, end_base + mid * 2) < code:
+            low = mid + 1
+        else:
+            segment = mid
+            high = mid - 1
+    if segment < 0:
+        return False
+    start = _u16(buf, start_base + segment * 2)
+    if start > code:
+        return False
+    delta = _u16(buf, delta_base + segment * 2)
+    range_pos = range_base + segment * 2
+    range_offset = _u16(buf, range_pos)
+    if range_offset == 0:
+        glyph = (code + delta) & 0xFFFF
+    else:
+        glyph = _u16(buf, range_pos + range_offset + (code - start) * 2)
+        if glyph:
+            glyph = (glyph + delta) & 0xFFFF
+    return glyph != 0
+
+
+def _format12_has(buf, sub_offset: int, code: int) -> bool:
+    """在 format 12 子表中二分查找码点所在分组。"""
+    num_groups = _u32(buf, sub_offset + 12)
+    group_base = sub_offset + 16
+    low, high = 0, num_groups - 1
+    while low <= high:
+        mid = (low + high) // 2
+        group = group_base + mid * 12
+        start_char, end_char, start_glyph = struct.unpack_from(">III", buf, group)
+        if code < start_char:
+            high = mid - 1
+        elif code > end_char:
+            low = mid + 1
+        else:
+            return start_glyph + (code - start_char) != 0
+    return False
+
+
+def _face_has_codepoints(buf, face_offset: int, codes: List[int]) -> Optional[bool]:
+    """检测单个 face；无可用 cmap 子表时返回 None。"""
+    cmap_offset = _find_table(buf, face_offset, _TAG_CMAP)
+    if cmap_offset is None:
+        return None
+    sub_offset = _select_subtable(buf, cmap_offset)
+    if sub_offset is None:
+        return None
+    if _u16(buf, sub_offset) == 12:
+        lookup = _format12_has
+    else:
+        lookup = _format4_has
+    return all(lookup(buf, sub_offset, code) for code in codes)
+
+
+def font_has_codepoints(font_path: str, codepoints: Iterable[int]) -> Optional[bool]:
+    """检测字体（含 TTC 任一 face）是否覆盖全部码点。
+
+    返回 True/False 表示探测结论；文件无法解析或没有 format 4/12 子表时返回 None，
+    调用方应回退到 fontTools 完整解析。
+    """
+    codes = sorted(set(int(code) for code in codepoints))
+    try:
+        with open(font_path, "rb") as handle:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                undecided = False
+                for face_offset in _face_offsets(buf):
+                    verdict = _face_has_codepoints(buf, face_offset, codes)
+                    if verdict:
+                        return True
+                    if verdict is None:
+                        undecided = True
+                return None if undecided else False
+    except (OSError, ValueError, struct.error, IndexError):
+        return None
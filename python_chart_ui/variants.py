@@ -0,0 +1,87 @@
+"""同一张栅格图的多分辨率版本（缩略图）。
+
+聊天界面先展示小尺寸预览，用户点开时才需要原图。以前要得到两种尺寸只能再调用一次
+savefig（figure 被重新栅格化）或重新执行脚本。启用 `thumbnailWidths`（如 `[320]`）后，
+执行结束时对每个 PNG 产物只解码一次，从同一份像素缓冲按宽度缩放出各尺寸版本，
+写为 `<原文件名>_w<宽度>.<扩展名>`（格式与编码选项同原图），不再重新渲染 figure。
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Dict, List
+
+from python_chart_ui.encoding import EncodingOptions
+from python_chart_ui.encoding import prepare_image
+from python_chart_ui.encoding import save_image
+
+MAX_VARIANT_WIDTHS = 4
+
+
+def thumbnail_widths(value: Any) -> List[int]:
+    """把选项规范为去重、升序的宽度列表（单个整数也可），非法值忽略。"""
+    if value is None or value == "":
+        return []
+    items = value if isinstance(value, (list, tuple)) else [value]
+    widths = set()
+    for item in items:
+        try:
+            width = int(item)
+        except (TypeError, ValueError):
+            continue
+        if width >= 16:
+            widths.add(width)
+    return sorted(widths)[:MAX_VARIANT_WIDTHS]
+
+
+def build_variants(
+    chart_files: List[str],
+    widths: List[int],
+    options: EncodingOptions,
+) -> List[Dict[str, Any]]:
+    """为 PNG 产物生成缩略图，返回与 `chartFiles` 对应的版本列表。
+
+    每项形如 `{"file", "width", "height", "variants": [{"path", "width", "height", "bytes"}]}`，
+    `variants` 按宽度升序；原图宽度不大于某个目标宽度时不生成该尺寸。
+    """
+    if not widths:
+        return []
+    from PIL import Image
+
+    entries: List[Dict[str, Any]] = []
+    for path in chart_files:
+        if not path.lower().endswith(".png") or not os.path.isfile(path):
+            continue
+        started = time.perf_counter()
+        try:
+            with Image.open(path) as opened:
+                image = opened.copy()
+        except Exception:
+            continue
+        root = os.path.splitext(path)[0]
+        variants: List[Dict[str, Any]] = []
+        for width in widths:
+            if width >= image.width:
+                continue
+            height = max(1, round(image.height * width / image.width))
+            # reducing_gap 先做整数倍缩小再精细重采样，大图缩略时明显更快。
+            resized = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            resized, _ = prepare_image(resized, options)
+            try:
+                variant_path, size = save_image(resized, f"{root}_w{width}", options)
+            except Exception:
+                continue
+            variants.append(
+                {"path": variant_path, "width": width, "height": height, "bytes": size}
+            )
+        entries.append(
+            {
+                "file": path,
+                "width": image.width,
+                "height": image.height,
+                "variants": variants,
+                "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+            }
+        )
+    return entries
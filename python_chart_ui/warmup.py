@@ -0,0 +1,191 @@
+"""应用启动时的后台预热。
+
+`hooks/app_start.py` 调用 `start_warmup()` 后立即返回，预热在守护线程中进行：
+1. 预编译插件模块（tools/hooks/python_chart_ui 的 .pyc）；
+2. 读取图表库版本（写入版本缓存）；
+3. 准备 MPLCONFIGDIR，检测中文字体候选并完成 matplotlib 字体注册与 pyplot 导入；
+4. 按设置拉起常驻 kernel（仅 `executionMode` 为 kernel/fork 时）；
+5. 按保留策略清理 chart_outputs 中过期的运行目录。
+
+每一步的状态与耗时写入 `runtime/warmup.json`，可通过 `warmup_status()` 查询。
+同一进程内只会运行一次预热。
+"""
+
+from __future__ import annotations
+
+import compileall
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from python_chart_ui.paths import plugin_root
+from python_chart_ui.paths import read_json
+from python_chart_ui.paths import runtime_dir
+from python_chart_ui.paths import write_json_atomic
+
+WARMUP_STATE_FILE = "warmup.json"
+COMPILE_DIRS = ("python_chart_ui", "tools", "hooks")
+
+# (步骤名, 执行函数)；执行函数返回简短说明文本。
+Step = Tuple[str, Callable[[], str]]
+
+_lock = threading.Lock()
+_thread: Optional[threading.Thread] = None
+_state: Dict[str, Any] = {}
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _publish() -> None:
+    """把当前状态写入 runtime/warmup.json（调用方持有 `_lock`）。"""
+    write_json_atomic(runtime_dir(WARMUP_STATE_FILE), _state)
+
+
+def _step_compile() -> str:
+    root = plugin_root()
+    compiled = 0
+    for name in COMPILE_DIRS:
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and compileall.compile_dir(path, quiet=1):
+            compiled += 1
+    return f"dirs={compiled}/{len(COMPILE_DIRS)}"
+
+
+def _step_library_versions() -> str:
+    from python_chart_ui.lib_versions import library_versions
+
+    versions = library_versions()
+    return ", ".join(f"{name}={version}" for name, version in versions.items())
+
+
+def _step_fonts() -> str:
+    from python_chart_ui.fonts import collect_chinese_font_candidates
+    from python_chart_ui.mpl_cache import prepare_mplconfig_dir
+
+    prepare_mplconfig_dir()
+    candidates = collect_chinese_font_candidates()
+    return f"candidates={len(candidates)}"
+
+
+def _step_matplotlib() -> str:
+    from python_chart_ui.font_setup import setup_matplotlib_chinese
+
+    message = setup_matplotlib_chinese()
+    try:
+        __import__("matplotlib.pyplot")
+    except Exception:
+        pass
+    return message
+
+
+def _step_kernel(settings: Dict[str, Any]) -> str:
+    from python_chart_ui import kernel
+
+    mode = settings.get("executionMode")
+    if mode not in ("kernel", "fork") or not settings.get("warmupStartKernel"):
+        return "skipped"
+    flavor = kernel.FLAVOR_FORK if mode == "fork" else kernel.FLAVOR_WARM
+    tool_path = os.path.join(plugin_root(), "tools", "python_chart_exec.py")
+    alive = kernel.ensure_kernel_started(
+        tool_path,
+        float(settings.get("kernelIdleTimeoutSec") or 1800),
+        flavor,
+    )
+    return f"{flavor}: {'alive' if alive else 'starting'}"
+
+
+def _step_retention(settings: Dict[str, Any]) -> str:
+    from python_chart_ui.retention import collect_garbage
+
+    if not float(settings.get("retentionIntervalSec") or 0):
+        return "skipped"
+    stats = collect_garbage(settings)
+    return f"removed={stats['removedRuns']}, freedBytes={stats['freedBytes']}"
+
+
+def _run(steps: List[Step]) -> None:
+    for name, func in steps:
+        with _lock:
+            entry = {"name": name, "status": "running", "ms": None, "detail": None}
+            _state["steps"].append(entry)
+            _publish()
+        started = time.perf_counter()
+        try:
+            detail = func()
+            status = "done"
+        except Exception as error:
+            detail = f"{type(error).__name__}: {error}"
+            status = "failed"
+        with _lock:
+            entry["status"] = status
+            entry["ms"] = round((time.perf_counter() - started) * 1000, 1)
+            entry["detail"] = detail
+            _publish()
+    with _lock:
+        failed = any(item["status"] == "failed" for item in _state["steps"])
+        _state["status"] = "failed" if failed else "done"
+        _state["finishedAt"] = _now_ms()
+        _state["totalMs"] = _state["finishedAt"] - _state["startedAt"]
+        _publish()
+
+
+def start_warmup(settings: Optional[Dict[str, Any]] = None) -> bool:
+    """在后台线程启动预热，立即返回；本进程已启动过时返回 False。"""
+    global _thread
+    if settings is None:
+        from python_chart_ui.settings import load_settings
+
+        settings = load_settings()
+    steps: List[Step] = [
+        ("compile", _step_compile),
+        ("libraryVersions", _step_library_versions),
+        ("fonts", _step_fonts),
+        ("matplotlib", _step_matplotlib),
+        ("kernel", lambda: _step_kernel(settings)),
+        ("retention", lambda: _step_retention(settings)),
+    ]
+    with _lock:
+        if _thread is not None:
+            return False
+        _state.clear()
+        _state.update(
+            {
+                "status": "running",
+                "pid": os.getpid(),
+                "startedAt": _now_ms(),
+                "finishedAt": None,
+                "totalMs": None,
+                "steps": [],
+            }
+        )
+        _publish()
+        _thread = threading.Thread(
+            target=_run,
+            args=(steps,),
+            name="python-chart-warmup",
+            daemon=True,
+        )
+        _thread.start()
+    return True
+
+
+def warmup_status() -> Dict[str, Any]:
+    """返回预热进度：本进程启动过预热时返回内存状态，否则读取 runtime/warmup.json。"""
+    with _lock:
+        if _state:
+            return {**_state, "steps": [dict(item) for item in _state["steps"]]}
+    data = read_json(runtime_dir(WARMUP_STATE_FILE))
+    return data if isinstance(data, dict) else {"status": "not_started", "steps": []}
+
+
+def wait_warmup(timeout: Optional[float] = None) -> bool:
+    """等待本进程的预热结束，返回是否已结束。"""
+    thread = _thread
+    if thread is None:
+        return True
+    thread.join(timeout)
+    return not thread.is_alive()
+
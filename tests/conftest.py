@@ -0,0 +1,54 @@
+"""测试公共夹具：插件 runtime 目录与工作目录均指向临时目录。"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "tools")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# 先导入工具脚本：kernel/sandbox 以 `from ... import plugin_root` 绑定真实插件根目录
+# （子进程的 PYTHONPATH 依赖它），下面只替换 runtime 目录的定位。
+import python_chart_exec  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def runtime_root(tmp_path_factory):
+    """整个测试会话共用的插件根目录（runtime/ 建在其下，字体与 matplotlib 缓存只建一次）。"""
+    return str(tmp_path_factory.mktemp("plugin"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_runtime(runtime_root, tmp_path, monkeypatch):
+    from python_chart_ui import paths
+
+    monkeypatch.setattr(paths, "plugin_root", lambda: runtime_root)
+    monkeypatch.chdir(tmp_path)
+    yield
+    try:
+        os.remove(paths.runtime_dir("settings.json"))
+    except OSError:
+        pass
+
+
+@pytest.fixture
+def write_settings():
+    """写入本测试专用的 runtime/settings.json（测试结束后删除）。"""
+    from python_chart_ui.paths import runtime_dir
+
+    def _write(values):
+        with open(runtime_dir("settings.json"), "w", encoding="utf-8") as handle:
+            json.dump(values, handle)
+
+    return _write
+
+
+@pytest.fixture
+def tool():
+    return python_chart_exec
@@ -0,0 +1,68 @@
+"""产物去重：改写去重后的文件不影响共享同一内容的其它运行与 blob。"""
+
+from __future__ import annotations
+
+import os
+import stat
+
+from python_chart_ui import artifacts
+
+PLOT = (
+    "import matplotlib.pyplot as plt\n"
+    "fig, ax = plt.subplots(figsize=(2, 2))\n"
+    "ax.bar([1, 2], [3, 4])\n"
+    "fig.savefig('bar.png', dpi=50)\n"
+)
+
+
+def _run_indexed(tool, code):
+    result = tool.main({"code": code})
+    assert result["ok"], result["stderr"]
+    assert artifacts.flush_index(30)
+    return result
+
+
+def test_indexing_runs_off_the_request_path(tool, monkeypatch):
+    started = []
+    monkeypatch.setattr(artifacts, "record_run", lambda *args, **kwargs: started.append(args))
+
+    result = tool.main({"code": PLOT})
+
+    assert result["runId"] == os.path.basename(result["outputDir"])
+    assert artifacts.flush_index(30)
+    assert started and started[0][0] == result["runId"]
+
+
+def test_overwrite_of_deduped_file_does_not_corrupt_other_runs(tool):
+    first = _run_indexed(tool, PLOT)
+    second = _run_indexed(tool, PLOT)
+    (first_file,) = first["chartFiles"]
+    (second_file,) = second["chartFiles"]
+    assert os.path.samefile(first_file, second_file)
+    assert not os.stat(first_file).st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+    original = open(first_file, "rb").read()
+
+    # 后续执行通过保存入口与 open() 改写第一次运行的文件。
+    overwrite = (
+        PLOT.replace("'bar.png'", repr(first_file))
+        + f"with open({first_file!r}, 'ab') as handle:\n"
+        + "    handle.write(b'tail')\n"
+    )
+    tool.main({"code": overwrite})
+
+    assert open(second_file, "rb").read() == original
+    (blob,) = artifacts.find_artifacts(path=second_file)
+    blob_path = artifacts._blob_path(blob["contentHash"], ".png")
+    assert open(blob_path, "rb").read() == original
+    assert open(first_file, "rb").read().endswith(b"tail")
+
+
+def test_detach_keeps_content_for_append():
+    with open("a.txt", "w") as handle:
+        handle.write("shared")
+    os.link("a.txt", "b.txt")
+
+    artifacts.detach_shared_file("a.txt")
+
+    assert not os.path.samefile("a.txt", "b.txt")
+    assert open("a.txt").read() == open("b.txt").read() == "shared"
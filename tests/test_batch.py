@@ -0,0 +1,133 @@
+"""批量执行：单段崩溃隔离与 subprocess 模式。"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+
+from python_chart_ui.batch import run_jobs
+
+SAVE_CODE = (
+    "import matplotlib.pyplot as plt\n"
+    "plt.plot([1, 2, 3])\n"
+    "plt.savefig('{name}.png')\n"
+)
+
+
+def _jobs():
+    return [
+        {"id": "a", "code": SAVE_CODE.format(name="a")},
+        {"id": "boom", "code": "import os\nos._exit(3)"},
+        {"id": "c", "code": SAVE_CODE.format(name="c")},
+    ]
+
+
+def test_crashing_job_does_not_fail_siblings(tool, write_settings):
+    write_settings({"batchMaxWorkers": 3})
+    result = tool.main({"jobs": _jobs()})
+
+    by_id = {job["id"]: job for job in result["jobs"]}
+    assert by_id["a"]["ok"] and by_id["c"]["ok"]
+    assert by_id["boom"]["errorType"] == "worker_crashed"
+    assert "exitcode=3" in by_id["boom"]["error"]
+    assert result["errorType"] == "batch_partial_failure"
+    assert [os.path.basename(path) for path in result["chartFiles"]] == ["a.png", "c.png"]
+    assert all(os.path.isfile(path) for path in result["chartFiles"])
+
+
+def test_crash_isolation_with_single_worker(tool, write_settings):
+    write_settings({"batchMaxWorkers": 1})
+    result = tool.main({"jobs": _jobs()})
+
+    assert [job["ok"] for job in result["jobs"]] == [True, False, True]
+    assert result["timings"]["pool"] == "fork"
+
+
+def test_subprocess_mode_runs_batch_in_sandbox(tool):
+    result = tool.main(
+        {
+            "executionMode": "subprocess",
+            "jobs": [
+                {"id": "a", "code": SAVE_CODE.format(name="a")},
+                {"id": "err", "code": "raise ValueError('bad')"},
+            ],
+        }
+    )
+
+    assert result["executor"] == "subprocess"
+    assert [job["ok"] for job in result["jobs"]] == [True, False]
+    assert result["jobs"][1]["errorType"] == "execution_error"
+    assert os.path.isfile(result["chartFiles"][0])
+
+
+def test_job_timeout_only_fails_that_job(tool, write_settings):
+    write_settings({"batchMaxWorkers": 2, "batchJobTimeoutSec": 2})
+    jobs = [
+        {"id": "a", "code": SAVE_CODE.format(name="a")},
+        {"id": "slow", "code": "import time\ntime.sleep(60)"},
+    ]
+
+    started = time.monotonic()
+    result = tool.main({"jobs": jobs})
+
+    assert time.monotonic() - started < 30
+    assert [job["ok"] for job in result["jobs"]] == [True, False]
+    assert result["jobs"][1]["errorType"] == "timeout"
+
+
+def test_non_exclusive_batch_uses_threads_with_own_runner(tool, write_settings):
+    write_settings({"batchMaxWorkers": 2, "batchJobTimeoutSec": 1})
+    jobs = [
+        {"id": "a", "code": SAVE_CODE.format(name="a")},
+        {"id": "slow", "code": "import time\ntime.sleep(3)"},
+    ]
+
+    result = tool._run_batch({"jobs": jobs}, tool.load_settings(), exclusive=False)
+
+    assert result["timings"]["pool"] == "thread"
+    assert [job["ok"] for job in result["jobs"]] == [True, False]
+    assert result["jobs"][1]["errorType"] == "timeout"
+    assert os.path.isfile(result["chartFiles"][0])
+
+
+def test_concurrent_batches_keep_their_own_runner():
+    results = {}
+
+    def run(name):
+        runner = lambda payload, **kwargs: {"ok": True, "runner": name}  # noqa: E731
+        jobs = [({"code": "1"}, os.path.join(os.getcwd(), name, str(index))) for index in range(3)]
+        results[name] = run_jobs(runner, jobs, 2, allow_fork=False)[0]
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("first", "second")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    for name in ("first", "second"):
+        assert [item["runner"] for item in results[name]] == [name] * 3
+
+
+def test_combined_batch_result_fits_output_limit(tool):
+    code = "for i in range(3000):\n    print('line', i, 'x' * 20)\n"
+    jobs = [{"id": str(index), "code": code} for index in range(6)]
+
+    result = tool.main({"jobs": jobs})
+
+    assert all(job["ok"] for job in result["jobs"])
+    assert len(json.dumps(result, ensure_ascii=False)) <= tool.tool_output_limit()
+    assert all(job["stdout"].startswith("line 0") for job in result["jobs"])
+
+
+def test_batch_output_is_trimmed_when_capture_budget_exceeds_limit(tool, write_settings):
+    write_settings({"captureStdoutBytes": 120000})
+    code = "for i in range(3000):\n    print('line', i, 'x' * 20)\n"
+    jobs = [{"id": str(index), "code": code} for index in range(6)]
+
+    result = tool.main({"jobs": jobs})
+
+    assert result["outputTrimmed"] is True
+    assert len(json.dumps(result, ensure_ascii=False)) <= tool.tool_output_limit()
+    assert all(job["stdout"].startswith("line 0") for job in result["jobs"])
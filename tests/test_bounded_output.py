@@ -0,0 +1,59 @@
+"""有界输出捕获：保留首尾、折叠重复行、内存不随输出量增长。"""
+
+from __future__ import annotations
+
+import io
+
+from python_chart_ui.bounded_output import BoundedTextBuffer
+
+
+def test_keeps_head_and_tail_within_budget():
+    buffer = BoundedTextBuffer(limit_bytes=1000)
+    for index in range(2000):
+        buffer.write(f"line {index}\n")
+
+    value = buffer.getvalue()
+    stats = buffer.stats()
+
+    assert value.startswith("line 0\nline 1\n")
+    assert value.endswith("line 1999\n")
+    assert "字节）…" in value
+    assert len(value.encode("utf-8")) < 1000 + 100
+    assert stats["bytes"] == sum(len(f"line {index}\n") for index in range(2000))
+    assert stats["droppedBytes"] > 0
+
+
+def test_repeated_lines_are_folded():
+    buffer = BoundedTextBuffer(limit_bytes=1000)
+    buffer.write("start\n")
+    for _ in range(500):
+        buffer.write("Glyph missing from font\n")
+    buffer.write("end\n")
+
+    assert buffer.getvalue() == (
+        "start\nGlyph missing from font\n…（上一行重复 499 次）\nend\n"
+    )
+    assert buffer.stats()["foldedLines"] == 499
+
+
+def test_long_line_without_newline_is_bounded_and_mirrored():
+    mirror = io.StringIO()
+    buffer = BoundedTextBuffer(limit_bytes=512, mirror=mirror)
+    text = "中" * 10000
+
+    buffer.write(text)
+
+    assert len(buffer.getvalue().encode("utf-8")) < 512 + 100
+    assert mirror.getvalue() == text
+
+
+def test_tool_reports_capture_stats(tool):
+    code = "for i in range(5000):\n    print('row', i)\n"
+
+    result = tool.main({"code": code, "captureStdoutBytes": 2000})
+
+    assert result["ok"], result["stderr"]
+    assert result["stdout"].startswith("row 0\n")
+    assert result["stdout"].rstrip().endswith("row 4999")
+    assert result["outputStats"]["stdout"]["droppedBytes"] > 0
+    assert len(result["stdout"].encode("utf-8")) < 2200
@@ -0,0 +1,67 @@
+"""数据集输入：按需加载、npy 内存映射、CSV schema 缓存与路径越界校验。"""
+
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pytest
+
+from python_chart_ui import datasets
+from python_chart_ui.datasets import DatasetCatalog
+from python_chart_ui.datasets import DatasetError
+from python_chart_ui.datasets import resolve_datasets
+
+
+def _write_inputs():
+    np.save("values.npy", np.arange(10, dtype=np.int64))
+    with open("table.csv", "w", encoding="utf-8") as handle:
+        handle.write("x,y\n1,2.5\n2,3.5\n")
+
+
+def test_referenced_datasets_load_and_others_stay_lazy(tool):
+    _write_inputs()
+    code = "print(type(values).__name__, int(values.sum()))\n"
+
+    result = tool.main({"code": code, "datasets": {"values": "values.npy", "table": "table.csv"}})
+
+    assert result["ok"], result["stderr"]
+    assert result["stdout"].strip() == "memmap 45"
+    stats = result["datasets"]
+    assert stats["values"]["loaded"] is True
+    assert stats["table"]["loaded"] is False
+
+
+def test_csv_schema_is_reused_on_next_load():
+    _write_inputs()
+    datasets.clear_schema_cache()
+    path = os.path.realpath("table.csv")
+
+    first = DatasetCatalog({"table": path})
+    frame = first.table
+    second = DatasetCatalog({"table": path})
+    again = second["table"]
+
+    assert list(frame.columns) == ["x", "y"]
+    assert first.stats()["table"]["schemaCached"] is False
+    assert second.stats()["table"]["schemaCached"] is True
+    assert again.dtypes.astype(str).to_dict() == {"x": "int64", "y": "float64"}
+    assert second.schema("table")["rows"] == 2
+
+
+def test_invalid_dataset_arguments_are_rejected(tool, tmp_path):
+    _write_inputs()
+    outside = tmp_path.parent / "outside.npy"
+    np.save(outside, np.arange(3))
+    os.symlink(outside, "link.npy")
+
+    with pytest.raises(DatasetError):
+        resolve_datasets({"v": "../outside.npy"}, os.getcwd())
+    with pytest.raises(DatasetError):
+        resolve_datasets({"v": "link.npy"}, os.getcwd())
+    with pytest.raises(DatasetError):
+        resolve_datasets({"np": "values.npy"}, os.getcwd(), reserved=["np"])
+
+    result = tool.main({"code": "print(1)", "datasets": {"v": "missing.npy"}})
+    assert result["ok"] is False
+    assert result["errorType"] == "invalid_dataset"
@@ -0,0 +1,76 @@
+"""输出编码：只处理输出目录内的文件，显式保存的 PNG 转格式后保留。"""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+PLOT = "import matplotlib.pyplot as plt\nplt.plot([1, 3, 2])\n"
+
+
+def test_webp_keeps_explicit_png_and_reports_rename(tool):
+    result = tool.main({"code": PLOT + "plt.savefig('mine.png')\n", "imageFormat": "webp"})
+
+    assert result["ok"], result["stderr"]
+    original = os.path.join(result["outputDir"], "mine.png")
+    converted = os.path.join(result["outputDir"], "mine.webp")
+    assert result["chartFiles"] == [converted]
+    assert os.path.isfile(original) and os.path.isfile(converted)
+    assert result["encoding"]["renamed"] == {original: converted}
+
+
+def test_webp_replaces_auto_saved_png(tool):
+    result = tool.main({"code": PLOT, "imageFormat": "webp"})
+
+    assert result["ok"], result["stderr"]
+    (converted,) = result["chartFiles"]
+    assert converted.endswith("auto_chart_1.webp")
+    assert not os.path.exists(converted[: -len(".webp")] + ".png")
+
+
+def test_declared_file_outside_output_dir_is_untouched(tool):
+    # 运行沙箱（chart_outputs 的上级目录）内、本次输出目录外的文件。
+    outside = os.path.abspath("shared.png")
+    code = (
+        PLOT
+        + f"plt.savefig({outside!r})\n"
+        + f"_chart_files = [{outside!r}]\n"
+    )
+    result = tool.main({"code": code, "imageFormat": "jpeg", "paletteMaxColors": 64})
+
+    assert result["ok"], result["stderr"]
+    assert outside in result["chartFiles"]
+    assert os.path.isfile(outside)
+    assert not os.path.exists(outside[: -len(".png")] + ".jpg")
+
+
+def _random_palette_image(mode, count, size=100):
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(count)
+    palette = rng.integers(0, 256, size=(count, len(mode)), dtype=np.uint8)
+    picks = rng.integers(0, count, size=(size, size))
+    picks.flat[:count] = np.arange(count)
+    return Image.fromarray(palette[picks], mode)
+
+
+@pytest.mark.parametrize("mode,count", [("RGB", 64), ("RGB", 256), ("RGBA", 200)])
+def test_palette_png_is_pixel_identical(tmp_path, mode, count):
+    import numpy as np
+    from PIL import Image
+
+    from python_chart_ui.encoding import EncodingOptions
+    from python_chart_ui.encoding import encode_file
+
+    original = _random_palette_image(mode, count)
+    path = str(tmp_path / "chart.png")
+    original.save(path)
+
+    _, stats = encode_file(path, EncodingOptions(palette_max_colors=256))
+
+    assert stats["palette"] is True
+    with Image.open(path) as encoded:
+        assert encoded.mode == "P"
+        assert np.array_equal(np.asarray(encoded.convert(mode)), np.asarray(original))
@@ -0,0 +1,64 @@
+"""lazy 字体模式：只注册首选中文字体，渲染缺字时才注册并追加回退字体。"""
+
+from __future__ import annotations
+
+import os
+import warnings
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt  # noqa: E402
+
+from python_chart_ui import font_setup  # noqa: E402
+
+# 只有 TestFallback.ttf 含有的私用区字符。
+FALLBACK_ONLY_CHAR = "\ue000"
+
+
+def test_lazy_mode_registers_fallback_on_missing_glyph(monkeypatch):
+    monkeypatch.setattr(font_setup, "_snapshots", {})
+    with matplotlib.rc_context():
+        message = font_setup.setup_matplotlib_chinese(font_setup.FONT_MODE_LAZY)
+        snapshot = font_setup._snapshots[font_setup.FONT_MODE_LAZY]
+
+        assert "name=TestCJK Sans" in message
+        assert snapshot.resolved_names == ["TestCJK Sans"]
+        assert any(path.endswith("TestFallback.ttf") for path in snapshot.pending_fallback_paths)
+
+        fig, ax = plt.subplots()
+        ax.set_title(FALLBACK_ONLY_CHAR)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            fig.canvas.draw()
+        plt.close(fig)
+
+        assert snapshot.pending_fallback_paths == []
+        assert "TestFallback" in snapshot.resolved_names
+        assert list(matplotlib.rcParams["font.family"])[:2] == ["TestCJK Sans", "TestFallback"]
+
+        # 再次配置复用快照，只做一次 rcParams.update。
+        assert font_setup.setup_matplotlib_chinese("lazy").endswith("snapshot=reused")
+
+
+def test_dirs_signature_tracks_font_files_in_subdirectories(tmp_path, monkeypatch):
+    fonts_dir = tmp_path / "fonts"
+    nested = fonts_dir / "cjk"
+    nested.mkdir(parents=True)
+    (nested / "a.ttf").write_bytes(b"a")
+    monkeypatch.setattr(font_setup, "plugin_font_dirs", lambda: [str(fonts_dir)])
+    monkeypatch.setattr(font_setup, "SYSTEM_FONT_WHITELIST", ())
+    top_mtime = os.stat(fonts_dir).st_mtime_ns
+
+    first = font_setup._font_dirs_signature()
+    # 原地替换与子目录中新增字体都不会改变顶层目录的 mtime。
+    (nested / "a.ttf").write_bytes(b"replaced")
+    replaced = font_setup._font_dirs_signature()
+    (nested / "b.otf").write_bytes(b"b")
+    (nested / "notes.txt").write_text("x")
+    added = font_setup._font_dirs_signature()
+
+    assert os.stat(fonts_dir).st_mtime_ns == top_mtime
+    assert len({first, replaced, added}) == 3
+    assert [os.path.basename(part[0]) for part in added] == ["a.ttf", "b.otf"]
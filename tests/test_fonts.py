@@ -0,0 +1,59 @@
+"""中文字体候选：字形检测结果按文件签名缓存，字体变化时重新检测。"""
+
+from __future__ import annotations
+
+import os
+import shutil
+
+from conftest import ROOT
+from python_chart_ui import fonts
+
+CJK_FONT = os.path.join(ROOT, "assets", "fonts", "TestCJK.ttf")
+FALLBACK_FONT = os.path.join(ROOT, "assets", "fonts", "TestFallback.ttf")
+
+
+def _font_root(tmp_path):
+    folder = tmp_path / "plugin" / "assets" / "fonts"
+    folder.mkdir(parents=True)
+    shutil.copy(CJK_FONT, folder / "TestCJK.ttf")
+    shutil.copy(FALLBACK_FONT, folder / "TestFallback.ttf")
+    return str(tmp_path / "plugin")
+
+
+def test_probe_results_are_reused_from_disk(tmp_path, monkeypatch):
+    root = _font_root(tmp_path)
+    monkeypatch.setattr(fonts, "SYSTEM_FONT_WHITELIST", ())
+    first = fonts.collect_chinese_font_candidates(root)
+
+    def fail(path):
+        raise AssertionError(f"font re-probed: {path}")
+
+    monkeypatch.setattr(fonts, "font_supports_chinese", fail)
+    second = fonts.collect_chinese_font_candidates(root)
+
+    assert [(os.path.basename(item.path), item.supports_cjk) for item in first] == [
+        ("TestCJK.ttf", True),
+        ("TestFallback.ttf", False),
+    ]
+    assert [item.path for item in second] == [item.path for item in first]
+
+
+def test_changed_font_is_probed_again(tmp_path, monkeypatch):
+    root = _font_root(tmp_path)
+    monkeypatch.setattr(fonts, "SYSTEM_FONT_WHITELIST", ())
+    fonts.collect_chinese_font_candidates(root)
+    target = os.path.join(root, "assets", "fonts", "TestFallback.ttf")
+    shutil.copy(CJK_FONT, target)
+    os.utime(target, ns=(1, 1))
+    probed = []
+    original = fonts.font_supports_chinese
+
+    def record(path):
+        probed.append(os.path.basename(path))
+        return original(path)
+
+    monkeypatch.setattr(fonts, "font_supports_chinese", record)
+    candidates = fonts.collect_chinese_font_candidates(root)
+
+    assert probed == ["TestFallback.ttf"]
+    assert all(item.supports_cjk for item in candidates)
@@ -0,0 +1,85 @@
+"""内联返回：默认上限由 outputLimit 推导，序列化后的结果不超过宿主输出上限。"""
+
+from __future__ import annotations
+
+import json
+import os
+
+from conftest import ROOT
+from python_chart_ui.inline_output import DEFAULT_OUTPUT_LIMIT
+from python_chart_ui.inline_output import inline_max_bytes
+
+CHARTS_CODE = (
+    "import matplotlib.pyplot as plt\n"
+    "print('x' * {stdout_chars})\n"
+    "for i in range({count}):\n"
+    "    fig, ax = plt.subplots(figsize=(2, 2))\n"
+    "    ax.plot(range(i + 2), color=(i / 12, 0.3, 0.6))\n"
+    "    ax.set_title(f'chart {{i}}')\n"
+    "    fig.savefig(f'chart_{{i}}.png', dpi=60)\n"
+)
+
+
+def test_default_cap_fits_plugin_output_limit():
+    with open(os.path.join(ROOT, "plugin.json"), encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    (tool,) = [item for item in manifest["tools"] if item["name"] == "python_chart_exec"]
+    assert tool["outputLimit"] == DEFAULT_OUTPUT_LIMIT
+
+    cap = inline_max_bytes(0, DEFAULT_OUTPUT_LIMIT)
+    # base64 膨胀 4/3 后仍给其它字段留出余量。
+    assert cap * 4 // 3 <= DEFAULT_OUTPUT_LIMIT - 6000
+    assert inline_max_bytes(5000) == 5000
+
+
+def _run(tool, stdout_chars, inline_max=None):
+    payload = {
+        "code": CHARTS_CODE.format(stdout_chars=stdout_chars, count=12),
+        "returnMode": "inline",
+    }
+    if inline_max is not None:
+        payload["inlineMaxBytes"] = inline_max
+    result = tool.main(payload)
+    assert result["ok"], result["stderr"]
+    return result
+
+
+def _assert_within_limit(result):
+    serialized = json.dumps(result, ensure_ascii=False, default=str)
+    assert len(serialized) <= DEFAULT_OUTPUT_LIMIT
+    names = [image["name"] for image in result["inlineImages"]]
+    names += [os.path.basename(path) for path in result["chartFiles"]]
+    # 每张图要么内联，要么写盘，不丢失也不重复。
+    assert sorted(names) == sorted(f"chart_{i}.png" for i in range(12))
+    assert all(os.path.isfile(path) for path in result["chartFiles"])
+
+
+def test_serialized_result_stays_under_output_limit(tool):
+    result = _run(tool, stdout_chars=0)
+
+    _assert_within_limit(result)
+    assert result["inlineImages"] and result["chartFiles"]
+
+
+def test_large_stdout_spills_more_images(tool):
+    quiet = _run(tool, stdout_chars=0)
+    noisy = _run(tool, stdout_chars=9000)
+
+    _assert_within_limit(noisy)
+    assert len(noisy["inlineImages"]) < len(quiet["inlineImages"])
+
+
+def test_explicit_cap_cannot_exceed_output_limit(tool):
+    result = _run(tool, stdout_chars=0, inline_max=10 * 1024 * 1024)
+
+    _assert_within_limit(result)
+
+
+def test_return_mode_is_declared_in_tool_schema():
+    with open(os.path.join(ROOT, "plugin.json"), encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    tool = next(item for item in manifest["tools"] if item["name"] == "python_chart_exec")
+    properties = tool["parameters"]["properties"]
+
+    assert properties["returnMode"]["enum"] == ["file", "inline"]
+    assert properties["inlineMaxBytes"]["type"] == "integer"
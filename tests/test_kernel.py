@@ -0,0 +1,151 @@
+"""常驻 kernel：忙碌时握手超时回退、warm 执行超时后结束 kernel、fork 形态逐次隔离。"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from python_chart_ui import kernel
+
+
+def _serve_in_thread(tool, flavor, handler):
+    server = threading.Thread(
+        target=kernel.serve,
+        args=(tool.__file__, 3600.0, flavor, handler),
+        daemon=True,
+    )
+    server.start()
+    deadline = time.monotonic() + 60
+    while not kernel.is_alive(flavor):
+        assert time.monotonic() < deadline, "kernel did not start"
+        time.sleep(0.1)
+    return server
+
+
+@pytest.fixture
+def blocking_kernel(tool, monkeypatch):
+    """在后台线程中运行 warm kernel，run 请求阻塞到测试放行为止。"""
+    monkeypatch.setattr(kernel, "CONNECT_TIMEOUT_SEC", 0.5)
+    release = threading.Event()
+
+    def _handler(payload):
+        release.wait(30)
+        return {"ok": True, "payload": payload}
+
+    server = _serve_in_thread(tool, kernel.FLAVOR_WARM, _handler)
+    yield release
+    release.set()
+    kernel.shutdown_kernel(kernel.FLAVOR_WARM)
+    server.join(10)
+
+
+def _occupy(release):
+    worker = threading.Thread(
+        target=lambda: kernel.run_in_kernel({"code": "1"}, os.getcwd(), timeout=30),
+        daemon=True,
+    )
+    worker.start()
+    time.sleep(0.5)
+    return worker
+
+
+def test_busy_warm_kernel_falls_back_instead_of_blocking(blocking_kernel):
+    worker = _occupy(blocking_kernel)
+
+    started = time.monotonic()
+    result = kernel.run_in_kernel({"code": "2"}, os.getcwd(), timeout=30)
+    elapsed = time.monotonic() - started
+
+    assert result is None
+    assert elapsed < 5
+    # 忙碌不等于离线：不应因此重复拉起 kernel。
+    assert kernel.is_alive(kernel.FLAVOR_WARM)
+    blocking_kernel.set()
+    worker.join(10)
+
+
+def test_warm_timeout_kills_kernel(blocking_kernel, monkeypatch):
+    killed = []
+    # 测试中的 kernel 跑在本进程的线程里，只记录调用，由 fixture 负责关闭。
+    monkeypatch.setattr(kernel, "kill_kernel", killed.append)
+
+    with pytest.raises(kernel.KernelTimeoutError):
+        kernel.run_in_kernel({"code": "1"}, os.getcwd(), timeout=1)
+
+    assert killed == [kernel.FLAVOR_WARM]
+
+
+def test_kill_kernel_terminates_process_group():
+    process = subprocess.Popen(
+        [sys.executable, "-c", "import time; time.sleep(60)"], start_new_session=True
+    )
+    from python_chart_ui.paths import write_json_atomic
+
+    write_json_atomic(
+        kernel.kernel_dir(kernel.FLAVOR_WARM, kernel.STATE_FILE),
+        {"pid": process.pid, "family": "AF_UNIX", "address": "/nonexistent.sock"},
+    )
+
+    assert kernel.kill_kernel(kernel.FLAVOR_WARM)
+    assert process.wait(10) == -9
+    assert kernel._read_state(kernel.FLAVOR_WARM) is None
+
+
+_fork_runs = []
+
+
+def _isolated_handler(payload, output_dir=None):
+    if payload.get("crash"):
+        os._exit(3)
+    _fork_runs.append(payload["code"])
+    return {"ok": True, "pid": os.getpid(), "runs": list(_fork_runs), "outputDir": output_dir}
+
+
+def _run_fork(payload, output_dir=None):
+    return kernel.run_in_kernel(
+        payload, os.getcwd(), timeout=30, flavor=kernel.FLAVOR_FORK, output_dir=output_dir
+    )
+
+
+@pytest.mark.skipif(not kernel.fork_supported(), reason="fork not supported")
+def test_fork_kernel_runs_each_request_in_a_fresh_child(tool):
+    server = _serve_in_thread(tool, kernel.FLAVOR_FORK, _isolated_handler)
+    try:
+        first = _run_fork({"code": "a"}, output_dir="/tmp/x")
+        second = _run_fork({"code": "b"})
+        with pytest.raises(kernel.KernelError):
+            _run_fork({"code": "c", "crash": True})
+        # 子进程崩溃不影响 zygote。
+        assert kernel.is_alive(kernel.FLAVOR_FORK)
+    finally:
+        kernel.shutdown_kernel(kernel.FLAVOR_FORK)
+        server.join(10)
+
+    # 每次执行都从 zygote 的干净镜像开始，状态不会带到下一次。
+    assert first["runs"] == ["a"] and second["runs"] == ["b"]
+    assert first["outputDir"] == "/tmp/x"
+    assert len({first["pid"], second["pid"], os.getpid()}) == 3
+    assert _fork_runs == []
+
+
+def test_silent_connection_is_dropped_after_handshake_timeout(blocking_kernel):
+    silent = kernel._connect(kernel._read_state(kernel.FLAVOR_WARM))
+    try:
+        reply = None
+        deadline = time.monotonic() + 10
+        while reply is None and time.monotonic() < deadline:
+            try:
+                reply = kernel.request({"op": "ping"}, timeout=5)
+            except kernel.KernelBusyError:
+                continue
+        assert reply is not None and reply["ok"]
+        # 被丢弃的连接读到 EOF。
+        with pytest.raises(EOFError):
+            silent.recv()
+    finally:
+        silent.close()
@@ -0,0 +1,73 @@
+"""延迟导入代理：首次访问属性时才导入，且只导入一次。"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+import threading
+
+from python_chart_ui.lazy_import import LazyModule
+
+
+def test_module_is_imported_on_first_attribute_access(tmp_path, monkeypatch):
+    (tmp_path / "lazy_probe_module.py").write_text("VALUE = 7\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "lazy_probe_module", raising=False)
+
+    proxy = LazyModule("lazy_probe_module")
+
+    assert not proxy.lazy_loaded
+    assert "lazy_probe_module" not in sys.modules
+    assert "not loaded" in repr(proxy)
+    assert proxy.VALUE == 7
+    assert proxy.lazy_loaded
+    assert "lazy_probe_module" in sys.modules
+
+
+def test_concurrent_access_runs_loader_once():
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def loader():
+        calls.append(1)
+        import json
+
+        return json
+
+    proxy = LazyModule("json", loader=loader)
+    results = []
+
+    def access():
+        barrier.wait()
+        results.append(proxy.dumps([1]))
+
+    threads = [threading.Thread(target=access) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ["[1]"] * 8
+
+
+def test_scope_modules_stay_unloaded_when_unused(tool):
+    code = "print(type(sns).__name__, sns.lazy_loaded, plotly.lazy_loaded)\n"
+
+    result = tool.main({"code": code})
+
+    assert result["ok"], result["stderr"]
+    assert result["stdout"].strip() == "LazyModule False False"
+
+
+def test_loaded_libraries_reports_proxies_used_by_this_run(tool):
+    # 同一进程中 numpy 早已导入，仍应报告本次经代理加载。
+    importlib.import_module("numpy")
+
+    first = tool.main({"code": "print(np.arange(3).sum())\n"})
+    second = tool.main({"code": "print(np.arange(3).sum())\n"})
+    unused = tool.main({"code": "print(1)\n"})
+
+    assert first["loadedLibraries"] == ["numpy"]
+    assert second["loadedLibraries"] == ["numpy"]
+    assert unused["loadedLibraries"] == []
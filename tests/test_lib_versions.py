@@ -0,0 +1,49 @@
+"""库版本检测：读取元数据而不导入，结果持久化并随环境变化失效。"""
+
+from __future__ import annotations
+
+import sys
+
+import matplotlib
+
+from python_chart_ui import lib_versions
+
+
+def test_versions_come_from_metadata_without_import(tmp_path, monkeypatch):
+    package = tmp_path / "chart_probe_pkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("raise RuntimeError('imported')\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    lib_versions.clear_cache(persisted=True)
+
+    versions = lib_versions.library_versions(
+        ("matplotlib", "chart_probe_pkg", "chart_probe_absent")
+    )
+
+    assert versions == {
+        "matplotlib": matplotlib.__version__,
+        "chart_probe_pkg": lib_versions.UNKNOWN,
+        "chart_probe_absent": lib_versions.MISSING,
+    }
+    assert "chart_probe_pkg" not in sys.modules
+    assert lib_versions.version_of("chart_probe_absent") is None
+
+
+def test_persisted_versions_reused_until_environment_changes(tmp_path, monkeypatch):
+    lib_versions.clear_cache(persisted=True)
+    first = lib_versions.library_versions()
+    lib_versions.clear_cache()
+
+    def fail(name):
+        raise AssertionError(f"version re-read: {name}")
+
+    monkeypatch.setattr(lib_versions, "_read_version", fail)
+    assert lib_versions.library_versions() == first
+
+    # sys.path 中新增目录（相当于安装了新的包路径）后指纹变化，重新读取。
+    extra = tmp_path / "site"
+    extra.mkdir()
+    monkeypatch.syspath_prepend(str(extra))
+    monkeypatch.setattr(lib_versions, "_read_version", lambda name: "9.9")
+    assert set(lib_versions.library_versions().values()) == {"9.9"}
+    lib_versions.clear_cache(persisted=True)
@@ -0,0 +1,50 @@
+"""产物清单：保存入口记录的文件按写入顺序返回，绕过保存入口的文件由目录扫描补齐。"""
+
+from __future__ import annotations
+
+import os
+
+PLOT = "import matplotlib.pyplot as plt\nplt.plot([1, 3, 2])\n"
+
+
+def test_manifest_keeps_save_order_without_scanning(tool, monkeypatch):
+    def fail(output_dir):
+        raise AssertionError("output dir scanned")
+
+    monkeypatch.setattr(tool, "_scan_output_dir", fail)
+    code = PLOT + "plt.savefig('z_first.png')\nplt.savefig('sub/a_second.png')\n"
+
+    result = tool.main({"code": code})
+
+    assert result["ok"], result["stderr"]
+    assert [os.path.relpath(path, result["outputDir"]) for path in result["chartFiles"]] == [
+        "z_first.png",
+        os.path.join("sub", "a_second.png"),
+    ]
+
+
+def test_files_written_outside_save_entries_are_found_by_scan(tool):
+    code = (
+        PLOT
+        + "plt.savefig('chart.png')\n"
+        + "np.save(os.path.join(output_dir, 'data.npy'), np.arange(3))\n"
+    )
+
+    result = tool.main({"code": "import os\n" + code})
+
+    assert result["ok"], result["stderr"]
+    names = [os.path.basename(path) for path in result["chartFiles"]]
+    assert names == ["chart.png", "data.npy"]
+
+
+def test_collect_generated_files_puts_declared_first(tool, tmp_path):
+    output_dir = str(tmp_path / "out")
+    os.makedirs(output_dir)
+    saved = os.path.join(output_dir, "saved.png")
+    declared = os.path.join(output_dir, "declared.png")
+    for path in (saved, declared):
+        open(path, "wb").close()
+
+    files = tool._collect_generated_files(output_dir, [saved, declared], [declared])
+
+    assert files == [declared, saved]
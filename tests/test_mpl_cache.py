@@ -0,0 +1,50 @@
+"""插件字体注册：已登记且未变化的字体不再 addfont，字体变化时替换旧条目。"""
+
+from __future__ import annotations
+
+import os
+import shutil
+
+import matplotlib
+from matplotlib import font_manager
+
+from conftest import ROOT
+from python_chart_ui.mpl_cache import ensure_plugin_fonts_registered
+
+CJK_FONT = os.path.join(ROOT, "assets", "fonts", "TestCJK.ttf")
+FALLBACK_FONT = os.path.join(ROOT, "assets", "fonts", "TestFallback.ttf")
+
+
+def _entries(manager, path):
+    return [entry for entry in manager.ttflist if os.path.abspath(entry.fname) == path]
+
+
+def test_registration_is_incremental(tmp_path, monkeypatch):
+    manager = font_manager.fontManager
+    # 测试结束后恢复全局 fontManager 的字体表。
+    monkeypatch.setattr(manager, "ttflist", list(manager.ttflist))
+    font_path = str(tmp_path / "PluginFont.ttf")
+    shutil.copy(CJK_FONT, font_path)
+
+    families = ensure_plugin_fonts_registered(matplotlib, font_manager, [font_path])
+    assert families and len(_entries(manager, font_path)) == 1
+
+    added = []
+    original_addfont = manager.addfont
+
+    def record(path):
+        added.append(path)
+        original_addfont(path)
+
+    monkeypatch.setattr(manager, "addfont", record)
+    ensure_plugin_fonts_registered(matplotlib, font_manager, [font_path])
+    assert added == []
+
+    # 同一路径换成另一个字体：旧条目移除，只重新注册这一个。
+    shutil.copy(FALLBACK_FONT, font_path)
+    os.utime(font_path, ns=(1, 1))
+    ensure_plugin_fonts_registered(matplotlib, font_manager, [font_path])
+    entries = _entries(manager, font_path)
+    assert added == [font_path]
+    assert len(entries) == 1
+    assert entries[0].name == font_manager.FontProperties(fname=FALLBACK_FONT).get_name()
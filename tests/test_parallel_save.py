@@ -0,0 +1,85 @@
+"""并行导出 figure：fork 进程池的文件与串行一致，单个失败不影响其它。"""
+
+from __future__ import annotations
+
+import os
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from matplotlib.figure import Figure  # noqa: E402
+
+from python_chart_ui.parallel_save import save_figures  # noqa: E402
+
+KWARGS = {"dpi": 50, "metadata": {"Software": None}}
+
+
+def _figures(count):
+    figures = []
+    for index in range(count):
+        figure = Figure()
+        figure.add_subplot().plot([0, index, 1])
+        figures.append(figure)
+    return figures
+
+
+def test_fork_output_matches_serial(tmp_path):
+    figures = _figures(5)
+    serial = [(figure, str(tmp_path / f"serial_{i}.png")) for i, figure in enumerate(figures)]
+    forked = [(figure, str(tmp_path / f"fork_{i}.png")) for i, figure in enumerate(figures)]
+
+    serial_ok, serial_mode = save_figures(serial, KWARGS, max_workers=1)
+    forked_ok, forked_mode = save_figures(forked, KWARGS, max_workers=2, min_parallel=4)
+
+    assert (serial_mode, forked_mode) == ("serial", "fork")
+    assert serial_ok == forked_ok == [True] * 5
+    for (_, left), (_, right) in zip(serial, forked):
+        with open(left, "rb") as a, open(right, "rb") as b:
+            assert a.read() == b.read()
+
+
+def test_failed_figure_only_marks_itself(tmp_path):
+    items = [(figure, str(tmp_path / f"chart_{i}.png")) for i, figure in enumerate(_figures(4))]
+    items[2] = (items[2][0], str(tmp_path / "missing_dir" / "chart_2.png"))
+
+    saved, mode = save_figures(items, KWARGS, max_workers=2, min_parallel=2)
+
+    assert mode == "fork"
+    assert saved == [True, True, False, True]
+    assert [os.path.exists(path) for _, path in items] == [True, True, False, True]
+
+
+def test_auto_save_uses_fork_pool_and_keeps_names(tool):
+    code = (
+        "import matplotlib.pyplot as plt\n"
+        "for i in range(5):\n"
+        "    plt.figure()\n"
+        "    plt.plot([0, i])\n"
+    )
+
+    result = tool.main({"code": code, "autoSaveMaxWorkers": 2})
+
+    assert result["ok"], result["stderr"]
+    assert result["autoSave"]["mode"] == "fork"
+    assert [os.path.basename(path) for path in result["chartFiles"]] == [
+        f"auto_chart_{i}.png" for i in range(1, 6)
+    ]
+
+
+def test_auto_save_finds_figures_from_undetected_pyplot_import(tool, monkeypatch):
+    import matplotlib.pyplot as pyplot
+
+    # 模拟 pyplot.figure 未被包装（首次经动态导入加载 pyplot 时的情形）。
+    monkeypatch.setattr(pyplot, "figure", getattr(pyplot.figure, "__wrapped__", pyplot.figure))
+    code = (
+        "import importlib\n"
+        "pyplot = importlib.import_module('matplotlib' + '.pyplot')\n"
+        "pyplot.plot([1, 3, 2])\n"
+    )
+
+    result = tool.main({"code": code})
+
+    assert result["ok"], result["stderr"]
+    assert [os.path.basename(path) for path in result["chartFiles"]] == ["auto_chart_1.png"]
+    assert pyplot.get_fignums() == []
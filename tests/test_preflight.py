@@ -0,0 +1,29 @@
+"""预检：入口处的预检结论沿用到执行，首次出现的代码不报告编译缓存命中。"""
+
+from __future__ import annotations
+
+import uuid
+
+
+def _fresh_code():
+    # 每次生成新的代码哈希，避免与其它测试共享进程内编译缓存。
+    return f"marker = {uuid.uuid4().hex!r}\nprint(marker)\n"
+
+
+def test_first_run_is_not_compile_cached(tool):
+    code = _fresh_code()
+
+    first = tool.main({"code": code})
+    second = tool.main({"code": code})
+
+    assert first["ok"], first["stderr"]
+    assert first["preflight"]["compileCached"] is False
+    assert second["preflight"]["compileCached"] is True
+    assert first["preflight"]["codeHash"] == second["preflight"]["codeHash"]
+
+
+def test_batch_jobs_are_not_compile_cached(tool):
+    result = tool.main({"jobs": [{"code": _fresh_code()}, {"code": _fresh_code()}]})
+
+    assert result["ok"], result
+    assert [job["preflight"]["compileCached"] for job in result["jobs"]] == [False, False]
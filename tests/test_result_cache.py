@@ -0,0 +1,81 @@
+"""结果缓存：命中时链接文件；条目不完整时按未命中处理且不留下运行目录。"""
+
+from __future__ import annotations
+
+import os
+
+from python_chart_ui import result_cache
+from python_chart_ui.paths import runtime_dir
+from python_chart_ui.result_cache import ResultCache
+from python_chart_ui.retention import ACTIVE_RUNS_DIR
+
+
+def _stored_cache(tmp_path, tool):
+    source = tool._build_output_dir()
+    for name in ("a.png", "b.png"):
+        with open(os.path.join(source, name), "wb") as handle:
+            handle.write(name.encode())
+    cache = ResultCache(max_bytes=0, max_entries=10, root=str(tmp_path / "cache"))
+    result = {
+        "stdout": "hi",
+        "chartFiles": [os.path.join(source, "a.png"), os.path.join(source, "b.png")],
+    }
+    assert cache.store("key", result, source)
+    return cache
+
+
+def _run_dirs():
+    root = os.path.join(os.getcwd(), "chart_outputs")
+    return sorted(os.listdir(root)) if os.path.isdir(root) else []
+
+
+def _active_runs():
+    folder = runtime_dir(ACTIVE_RUNS_DIR)
+    return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+
+def test_hit_links_files_into_new_output_dir(tmp_path, tool):
+    cache = _stored_cache(tmp_path, tool)
+
+    cached = cache.lookup("key", tool._build_output_dir)
+
+    assert cached is not None and cached["stdout"] == "hi"
+    assert [os.path.basename(path) for path in cached["chartFiles"]] == ["a.png", "b.png"]
+    assert all(os.path.isfile(path) for path in cached["chartFiles"])
+
+
+def test_missing_cached_file_is_a_miss_without_output_dir(tmp_path, tool):
+    cache = _stored_cache(tmp_path, tool)
+    os.remove(str(tmp_path / "cache" / "key" / "files" / "b.png"))
+    runs_before, active_before = _run_dirs(), _active_runs()
+    created = []
+
+    def make_output_dir():
+        created.append(tool._build_output_dir())
+        return created[-1]
+
+    assert cache.lookup("key", make_output_dir) is None
+    assert created == []
+    assert _run_dirs() == runs_before
+    assert _active_runs() == active_before
+
+
+def test_link_failure_removes_output_dir_and_active_marker(tmp_path, tool, monkeypatch):
+    cache = _stored_cache(tmp_path, tool)
+    runs_before, active_before = _run_dirs(), _active_runs()
+    original = result_cache.link_or_copy
+    calls = []
+
+    def flaky(source, target):
+        calls.append(source)
+        if len(calls) == 2:
+            # 模拟校验之后条目被并发淘汰。
+            raise FileNotFoundError(source)
+        original(source, target)
+
+    monkeypatch.setattr(result_cache, "link_or_copy", flaky)
+
+    assert cache.lookup("key", tool._build_output_dir) is None
+    assert len(calls) == 2
+    assert _run_dirs() == runs_before
+    assert _active_runs() == active_before
@@ -0,0 +1,46 @@
+"""保留策略：硬链接文件只计一次，删除经墓碑目录进行。"""
+
+from __future__ import annotations
+
+import os
+
+from python_chart_ui import retention
+
+
+def _make_run(name, files):
+    path = os.path.join(os.getcwd(), "chart_outputs", name)
+    os.makedirs(path)
+    for file_name, data in files.items():
+        with open(os.path.join(path, file_name), "wb") as handle:
+            handle.write(data)
+    return path
+
+
+def test_hardlinked_files_are_counted_once():
+    old = _make_run("run_old", {"chart.png": b"x" * 1000})
+    new = _make_run("run_new", {"own.png": b"y" * 10})
+    os.link(os.path.join(old, "chart.png"), os.path.join(new, "chart.png"))
+    os.utime(old, (1, 1))
+
+    runs = retention._scan_runs([os.path.dirname(old)])
+
+    assert [(os.path.basename(path), size) for _, size, path in runs] == [
+        ("run_old", 0),
+        ("run_new", 1010),
+    ]
+    assert retention._dir_size(new) == 1010
+
+
+def test_collect_garbage_removes_runs_and_leftover_tombstones(monkeypatch):
+    # 只清理本测试的 chart_outputs，不涉及产物索引中其它测试的目录。
+    monkeypatch.setattr(retention, "_output_roots", lambda extra_roots=None: list(extra_roots))
+    old = _make_run("run_old", {"chart.png": b"x" * 100})
+    _make_run("run_new", {"chart.png": b"y" * 100})
+    leftover = _make_run(retention.TOMBSTONE_PREFIX + "run_crashed", {"a.png": b"z"})
+    os.utime(old, (1, 1))
+
+    stats = retention.collect_garbage({"retentionMaxAgeHours": 1}, [os.path.dirname(old)])
+
+    assert stats["removedRuns"] == 1
+    assert sorted(os.listdir(os.path.dirname(old))) == ["run_new"]
+    assert not os.path.exists(leftover)
@@ -0,0 +1,57 @@
+"""运行上下文：不切换 cwd 时按输出目录解析 open 与保存入口的相对路径。"""
+
+from __future__ import annotations
+
+import os
+import threading
+
+from python_chart_ui.run_context import RunContext
+from python_chart_ui.run_context import activate
+from python_chart_ui.run_context import install_save_patches
+from python_chart_ui.run_context import scoped_builtins
+
+
+def test_scoped_open_resolves_relative_paths_per_output_dir(tmp_path):
+    cwd = os.getcwd()
+    dirs = [str(tmp_path / "out_a"), str(tmp_path / "out_b")]
+    for folder in dirs:
+        os.makedirs(folder)
+
+    def write(folder):
+        with scoped_builtins(folder)["open"]("note.txt", "w") as handle:
+            handle.write(folder)
+
+    threads = [threading.Thread(target=write, args=(folder,)) for folder in dirs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for folder in dirs:
+        with open(os.path.join(folder, "note.txt"), encoding="utf-8") as handle:
+            assert handle.read() == folder
+    assert not os.path.exists(os.path.join(cwd, "note.txt"))
+
+
+def test_figure_savefig_method_patch_rewrites_path_argument(tmp_path):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.figure import Figure
+
+    install_save_patches(plt)
+    output_dir = str(tmp_path / "chart_outputs" / "run_test")
+    os.makedirs(output_dir)
+    figure = Figure()
+    figure.add_subplot().plot([1, 2])
+
+    run = RunContext(run_id="run_test", output_dir=output_dir)
+    with activate(run):
+        # self 占 args[0]，路径是 args[1]。
+        figure.savefig("nested/chart.png")
+
+    target = os.path.join(output_dir, "nested", "chart.png")
+    assert os.path.isfile(target)
+    assert run.saved_files == [target]
+    assert not os.path.exists(os.path.join(os.getcwd(), "nested"))
@@ -0,0 +1,59 @@
+"""运行登记：kernel 出错或回退本地时输出目录的进行中登记都会被释放。"""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from python_chart_ui import kernel
+from python_chart_ui.paths import runtime_dir
+from python_chart_ui.retention import ACTIVE_RUNS_DIR
+
+
+def _active_runs():
+    folder = runtime_dir(ACTIVE_RUNS_DIR)
+    return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+
+@pytest.fixture(autouse=True)
+def kernel_ready(monkeypatch):
+    monkeypatch.setattr(kernel, "ensure_kernel_started", lambda *args, **kwargs: True)
+    for name in _active_runs():
+        os.remove(runtime_dir(ACTIVE_RUNS_DIR, name))
+
+
+def test_kernel_timeout_result_releases_run(tool, monkeypatch):
+    def _timeout(payload, cwd, timeout, flavor, output_dir):
+        with open(os.path.join(output_dir, "half.png"), "wb") as handle:
+            handle.write(b"png")
+        raise kernel.KernelTimeoutError("kernel did not reply")
+
+    monkeypatch.setattr(kernel, "run_in_kernel", _timeout)
+    result = tool.main({"code": "print(1)", "executionMode": "kernel"})
+
+    assert result["errorType"] == "timeout"
+    assert result["partial"] is True
+    assert [os.path.basename(path) for path in result["chartFiles"]] == ["half.png"]
+    assert result["outputDir"]
+    assert _active_runs() == []
+
+
+def test_unavailable_kernel_falls_back_into_same_output_dir(tool, monkeypatch):
+    monkeypatch.setattr(kernel, "run_in_kernel", lambda *args, **kwargs: None)
+    result = tool.main({"code": "print(1)", "executionMode": "kernel"})
+
+    assert result["ok"] and result["executor"] == "local"
+    assert os.listdir("chart_outputs") == [os.path.basename(result["outputDir"])]
+    assert _active_runs() == []
+
+
+def test_dataset_error_after_fallback_releases_run(tool, monkeypatch):
+    monkeypatch.setattr(kernel, "run_in_kernel", lambda *args, **kwargs: None)
+    result = tool.main(
+        {"code": "print(1)", "executionMode": "fork", "datasets": {"df": "missing.csv"}}
+    )
+
+    assert result["errorType"] == "invalid_dataset"
+    assert result["outputDir"]
+    assert _active_runs() == []
@@ -0,0 +1,61 @@
+"""subprocess 沙箱：软超时不被吞掉、被杀后保留输出、失败分类。"""
+
+from __future__ import annotations
+
+import signal
+
+from python_chart_ui.sandbox import SubprocessOutcome
+from python_chart_ui.sandbox import classify_failure
+
+
+def test_soft_timeout_is_not_swallowed_by_except_exception(tool, write_settings):
+    write_settings({"sandboxSoftTimeoutSec": 1, "sandboxHardTimeoutSec": 30})
+    code = (
+        "import time\n"
+        "try:\n"
+        "    while True:\n"
+        "        time.sleep(0.05)\n"
+        "except Exception:\n"
+        "    pass\n"
+        "print('swallowed')\n"
+    )
+    result = tool.main({"code": code, "executionMode": "subprocess"})
+
+    assert result["errorType"] == "timeout"
+    assert not result.get("partial")
+    assert "swallowed" not in result["stdout"]
+    assert "ExecutionTimeout" in result["stderr"]
+
+
+def test_hard_kill_keeps_printed_stdout(tool, write_settings):
+    write_settings({"sandboxSoftTimeoutSec": 0, "sandboxHardTimeoutSec": 3})
+    code = "print('started')\nwhile True:\n    pass\n"
+    result = tool.main({"code": code, "executionMode": "subprocess"})
+
+    assert result["partial"] is True
+    assert result["errorType"] == "timeout"
+    assert "started" in result["stdout"]
+
+
+def test_crash_keeps_printed_stdout(tool):
+    code = "print('before crash')\nimport os\nos._exit(7)\n"
+    result = tool.main({"code": code, "executionMode": "subprocess"})
+
+    assert result["errorType"] == "worker_crashed"
+    assert result["stdout"].strip() == "before crash"
+
+
+def _killed(cpu_sec):
+    return SubprocessOutcome(
+        result=None,
+        timed_out=False,
+        returncode=-signal.SIGKILL,
+        stderr_tail="",
+        cpu_sec=cpu_sec,
+        cpu_limit_sec=10.0,
+    )
+
+
+def test_sigkill_from_cpu_hard_limit_is_timeout():
+    assert classify_failure(_killed(15.2)) == "timeout"
+    assert classify_failure(_killed(0.3)) == "memory_limit"
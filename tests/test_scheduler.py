@@ -0,0 +1,90 @@
+"""调度器：并发上限、队列满拒绝、排队超时与按优先级出队。"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from python_chart_ui.scheduler import ChartJobScheduler
+from python_chart_ui.scheduler import QueueWaitTimeout
+from python_chart_ui.scheduler import SchedulerOverloaded
+
+
+def _hold(scheduler):
+    """占住唯一的执行槽，返回释放用的事件与线程。"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def job():
+        started.set()
+        release.wait(10)
+
+    thread = threading.Thread(target=scheduler.run, args=(job,))
+    thread.start()
+    assert started.wait(5)
+    return release, thread
+
+
+def _wait_queued(scheduler, count):
+    deadline = time.monotonic() + 5
+    while scheduler.stats()["queued"] < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_overload_and_queue_timeout():
+    scheduler = ChartJobScheduler(max_workers=1, max_queue=1)
+    release, holder = _hold(scheduler)
+
+    with pytest.raises(QueueWaitTimeout):
+        scheduler.run(lambda: None, queue_timeout=0.1)
+    assert scheduler.stats() == {"active": 1, "queued": 0, "maxWorkers": 1, "maxQueue": 1}
+
+    waiter = threading.Thread(target=scheduler.run, args=(lambda: None,))
+    waiter.start()
+    _wait_queued(scheduler, 1)
+    with pytest.raises(SchedulerOverloaded):
+        scheduler.run(lambda: None)
+
+    release.set()
+    holder.join(5)
+    waiter.join(5)
+    assert scheduler.stats()["active"] == 0
+
+
+def test_higher_priority_runs_first():
+    scheduler = ChartJobScheduler(max_workers=1, max_queue=4)
+    release, holder = _hold(scheduler)
+    order = []
+    threads = []
+    for name, priority in (("low", 0), ("high", 5), ("mid", 1)):
+        thread = threading.Thread(
+            target=scheduler.run, args=(lambda name=name: order.append(name), priority)
+        )
+        thread.start()
+        threads.append(thread)
+        _wait_queued(scheduler, len(threads))
+
+    release.set()
+    for thread in [holder] + threads:
+        thread.join(5)
+
+    assert order == ["high", "mid", "low"]
+    result, wait_ms = scheduler.run(lambda: 42)
+    assert result == 42 and wait_ms >= 0
+
+
+def test_process_scheduler_is_sized_once_from_persisted_settings(tool, write_settings, monkeypatch):
+    from python_chart_ui import scheduler as scheduler_module
+
+    monkeypatch.setattr(scheduler_module, "_scheduler", None)
+    monkeypatch.setattr(tool.os, "cpu_count", lambda: 4)
+
+    assert tool.main({"code": "print(1)", "executionMode": "subprocess"})["ok"]
+    assert scheduler_module._scheduler.max_workers == 1
+
+    write_settings({"schedulerMaxWorkers": 3, "schedulerMaxQueue": 2})
+    assert tool.main({"code": "print(1)"})["ok"]
+    assert scheduler_module._scheduler.stats()["maxWorkers"] == 1
@@ -0,0 +1,68 @@
+"""会话命名空间：跨执行保留变量，按内存上限丢弃、按 LRU 与空闲时间淘汰。"""
+
+from __future__ import annotations
+
+import time
+import uuid
+
+import numpy as np
+
+from python_chart_ui.sessions import SessionStore
+from python_chart_ui.sessions import get_session_store
+from python_chart_ui.sessions import select_session_values
+
+
+def test_variables_survive_between_runs(tool):
+    session_id = f"test-{uuid.uuid4().hex[:8]}"
+    try:
+        code = "data = np.arange(100)\nlabel = 'x'\nhelper = lambda v: v\n"
+        first = tool.main({"code": code, "sessionId": session_id})
+        second = tool.main({"code": "print(int(data.sum()), label)\n", "sessionId": session_id})
+    finally:
+        get_session_store().drop(session_id)
+
+    assert first["ok"], first["stderr"]
+    assert first["session"]["variables"] == ["data", "label"]
+    assert second["ok"], second["stderr"]
+    assert second["stdout"].strip() == "4950 x"
+    assert second["session"]["restored"] == ["data", "label"]
+
+
+def test_session_cap_drops_largest_values_first():
+    store = SessionStore()
+    values = {"big": np.zeros(1000, dtype=np.uint8), "small": np.zeros(10, dtype=np.uint8)}
+
+    stats = store.commit("s", values, 500, 0, 0, 0)
+
+    assert stats["dropped"] == ["big"]
+    assert stats["variables"] == ["small"]
+    assert list(store.checkout("s", 0)) == ["small"]
+
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore()
+    store.commit("a", {"v": 1}, 0, 0, 2, 0)
+    store.commit("b", {"v": 2}, 0, 0, 2, 0)
+    store.checkout("a", 0)
+
+    stats = store.commit("c", {"v": 3}, 0, 0, 2, 0)
+
+    assert stats["evicted"] == ["b"]
+    assert sorted(store.usage()) == ["a", "c"]
+
+
+def test_idle_sessions_expire(monkeypatch):
+    store = SessionStore()
+    store.commit("old", {"v": 1}, 0, 0, 0, 60)
+    later = time.monotonic() + 120
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+
+    assert store.checkout("old", 60) == {}
+    assert store.usage() == {}
+
+
+def test_only_data_values_are_selected():
+    scope = {"np": np, "f": lambda: 1, "_private": 1, "value": 2, "cls": int}
+
+    assert select_session_values(scope, None, excluded=()) == {"value": 2}
+    assert select_session_values(scope, ["value", "missing"], excluded=["value"]) == {}
@@ -0,0 +1,42 @@
+"""sfnt cmap 探测：结论与 fontTools 完整解析一致，无法解析时返回 None。"""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from conftest import ROOT
+from python_chart_ui.sfnt import font_has_codepoints
+
+FONTS = [
+    os.path.join(ROOT, "assets", "fonts", "TestCJK.ttf"),
+    os.path.join(ROOT, "assets", "fonts", "TestFallback.ttf"),
+]
+CODEPOINTS = [ord(ch) for ch in "A中文图表月"] + [0x1F600]
+
+
+@pytest.mark.parametrize("font_path", FONTS)
+def test_probe_matches_fonttools(font_path):
+    ttLib = pytest.importorskip("fontTools.ttLib")
+    font = ttLib.TTFont(font_path, lazy=True)
+    try:
+        covered = set(font.getBestCmap() or {})
+    finally:
+        font.close()
+
+    for code in CODEPOINTS:
+        assert font_has_codepoints(font_path, [code]) is (code in covered), hex(code)
+    assert font_has_codepoints(font_path, CODEPOINTS[:6]) is covered.issuperset(CODEPOINTS[:6])
+
+
+def test_unparseable_file_is_undecided(tmp_path):
+    truncated = tmp_path / "broken.ttf"
+    with open(FONTS[0], "rb") as handle:
+        truncated.write_bytes(handle.read(64))
+    text = tmp_path / "plain.ttf"
+    text.write_text("not a font", encoding="utf-8")
+
+    assert font_has_codepoints(str(truncated), [ord("中")]) is None
+    assert font_has_codepoints(str(text), [ord("中")]) is None
+    assert font_has_codepoints(str(tmp_path / "missing.ttf"), [ord("中")]) is None
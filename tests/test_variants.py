@@ -0,0 +1,68 @@
+"""多分辨率版本：从一次渲染的 PNG 缩放出各宽度的缩略图。"""
+
+from __future__ import annotations
+
+import json
+import os
+
+from PIL import Image
+
+from conftest import ROOT
+from python_chart_ui.encoding import EncodingOptions
+from python_chart_ui.variants import build_variants
+from python_chart_ui.variants import thumbnail_widths
+
+
+def test_widths_are_normalized():
+    assert thumbnail_widths(None) == []
+    assert thumbnail_widths(320) == [320]
+    assert thumbnail_widths(["640", 320, 320, 8, "x", 100, 200, 900]) == [100, 200, 320, 640]
+
+
+def test_variants_scale_one_render(tmp_path):
+    source = str(tmp_path / "chart.png")
+    Image.new("RGB", (800, 400), (10, 120, 200)).save(source)
+
+    (entry,) = build_variants([source, str(tmp_path / "data.csv")], [200, 1000], EncodingOptions())
+
+    assert (entry["file"], entry["width"], entry["height"]) == (source, 800, 400)
+    (variant,) = entry["variants"]
+    assert variant["path"] == str(tmp_path / "chart_w200.png")
+    with Image.open(variant["path"]) as image:
+        assert image.size == (200, 100)
+    assert variant["bytes"] == os.path.getsize(variant["path"])
+    assert not os.path.exists(str(tmp_path / "chart_w1000.png"))
+
+
+def test_tool_returns_variants_for_saved_charts(tool):
+    code = "import matplotlib.pyplot as plt\nplt.plot([1, 3, 2])\nplt.savefig('line.png', dpi=100)\n"
+
+    result = tool.main({"code": code, "thumbnailWidths": [160]})
+
+    assert result["ok"], result["stderr"]
+    (entry,) = result["chartVariants"]
+    assert entry["file"] == os.path.join(result["outputDir"], "line.png")
+    (variant,) = entry["variants"]
+    assert variant["width"] == 160
+    assert os.path.isfile(variant["path"])
+    # 缩略图不作为独立图表返回。
+    assert result["chartFiles"] == [entry["file"]]
+
+
+def test_payload_overrides_are_declared_in_tool_schema():
+    with open(os.path.join(ROOT, "plugin.json"), encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    tool = next(item for item in manifest["tools"] if item["name"] == "python_chart_exec")
+    properties = tool["parameters"]["properties"]
+
+    for key in (
+        "thumbnailWidths",
+        "fontMode",
+        "priority",
+        "queueTimeoutSec",
+        "resultCache",
+        "pngCompressLevel",
+        "paletteMaxColors",
+    ):
+        assert key in properties, key
+    assert properties["thumbnailWidths"]["items"]["type"] == "integer"
@@ -0,0 +1,61 @@
+"""启动预热：后台线程逐步执行并记录状态，同一进程只运行一次。"""
+
+from __future__ import annotations
+
+import pytest
+
+from python_chart_ui import warmup
+from python_chart_ui.paths import read_json
+from python_chart_ui.paths import runtime_dir
+
+
+@pytest.fixture
+def fresh_warmup(monkeypatch):
+    monkeypatch.setattr(warmup, "_thread", None)
+    monkeypatch.setattr(warmup, "_state", {})
+    yield
+    warmup.wait_warmup(60)
+
+
+def test_warmup_runs_once_in_background(fresh_warmup):
+    settings = {"executionMode": "local", "retentionIntervalSec": 0}
+
+    assert warmup.start_warmup(settings) is True
+    assert warmup.start_warmup(settings) is False
+    assert warmup.wait_warmup(120)
+
+    status = warmup.warmup_status()
+    assert status["status"] == "done", status
+    steps = {item["name"]: item for item in status["steps"]}
+    assert list(steps) == [
+        "compile", "libraryVersions", "fonts", "matplotlib", "kernel", "retention"
+    ]
+    assert steps["kernel"]["detail"] == "skipped"
+    assert steps["retention"]["detail"] == "skipped"
+    assert "TestCJK Sans" in steps["matplotlib"]["detail"]
+    assert read_json(runtime_dir(warmup.WARMUP_STATE_FILE))["status"] == "done"
+
+
+def test_failed_step_is_recorded_and_later_steps_still_run(fresh_warmup):
+    def broken():
+        raise RuntimeError("boom")
+
+    warmup._state.update({"status": "running", "startedAt": warmup._now_ms(), "steps": []})
+    warmup._run([("broken", broken), ("after", lambda: "ok")])
+
+    status = warmup.warmup_status()
+    assert status["status"] == "failed"
+    assert [(item["name"], item["status"], item["detail"]) for item in status["steps"]] == [
+        ("broken", "failed", "RuntimeError: boom"),
+        ("after", "done", "ok"),
+    ]
+
+
+def test_app_start_hook_respects_warmup_switch(fresh_warmup, write_settings):
+    from hooks.app_start import main
+
+    write_settings({"warmupOnStart": False})
+    result = main({})
+
+    assert result["ok"]
+    assert result["warmup"]["status"] == "disabled"
@@ -12,13 +12,118 @@
 
 from __future__ import annotations
 
-import contextlib
-import io
+import base64
+import json
 import os
+import sys
+import time
 import traceback
 import uuid
-from dataclasses import dataclass
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+# 工具以脚本方式运行，确保插件根目录在 sys.path 中以便导入共享模块。
+_PLUGIN_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _PLUGIN_ROOT not in sys.path:
+    sys.path.insert(0, _PLUGIN_ROOT)
+
+from python_chart_ui import artifacts  # noqa: E402
+from python_chart_ui import kernel  # noqa: E402
+from python_chart_ui.batch import job_dir_name  # noqa: E402
+from python_chart_ui.batch import run_jobs  # noqa: E402
+from python_chart_ui.bounded_output import BoundedTextBuffer  # noqa: E402
+from python_chart_ui.datasets import DatasetCatalog  # noqa: E402
+from python_chart_ui.datasets import DatasetError  # noqa: E402
+from python_chart_ui.datasets import dataset_identities  # noqa: E402
+from python_chart_ui.datasets import resolve_datasets  # noqa: E402
+from python_chart_ui.encoding import encode_outputs  # noqa: E402
+from python_chart_ui.encoding import encoding_options  # noqa: E402
+from python_chart_ui.font_setup import setup_matplotlib_chinese  # noqa: E402
+from python_chart_ui.fonts import selected_font_identity  # noqa: E402
+from python_chart_ui.inline_output import InlineImageStore  # noqa: E402
+from python_chart_ui.inline_output import inline_max_bytes  # noqa: E402
+from python_chart_ui.inline_output import tool_output_limit  # noqa: E402
+from python_chart_ui.lazy_import import LazyModule  # noqa: E402
+from python_chart_ui.lib_versions import CHART_LIBRARIES  # noqa: E402
+from python_chart_ui.lib_versions import library_versions  # noqa: E402
+from python_chart_ui.mpl_cache import prepare_mplconfig_dir  # noqa: E402
+from python_chart_ui.parallel_save import save_figures  # noqa: E402
+from python_chart_ui.preflight import PANDAS_PLOT_ATTRS  # noqa: E402
+from python_chart_ui.preflight import PreflightResult  # noqa: E402
+from python_chart_ui.preflight import code_hash  # noqa: E402
+from python_chart_ui.preflight import preflight  # noqa: E402
+from python_chart_ui.result_cache import ResultCache  # noqa: E402
+from python_chart_ui.result_cache import build_cache_key  # noqa: E402
+from python_chart_ui.retention import mark_run_active  # noqa: E402
+from python_chart_ui.retention import mark_run_finished  # noqa: E402
+from python_chart_ui.retention import maybe_schedule_gc  # noqa: E402
+from python_chart_ui.run_context import RunContext  # noqa: E402
+from python_chart_ui.run_context import activate  # noqa: E402
+from python_chart_ui.run_context import install_save_patches  # noqa: E402
+from python_chart_ui.run_context import install_stream_capture  # noqa: E402
+from python_chart_ui.run_context import resolve_output_path  # noqa: E402
+from python_chart_ui.run_context import runtime_root_from_output_dir  # noqa: E402
+from python_chart_ui.run_context import scoped_builtins  # noqa: E402
+from python_chart_ui.sandbox import ExecutionTimeout  # noqa: E402
+from python_chart_ui.sandbox import classify_failure  # noqa: E402
+from python_chart_ui.sandbox import run_in_subprocess  # noqa: E402
+from python_chart_ui.scheduler import QueueWaitTimeout  # noqa: E402
+from python_chart_ui.scheduler import SchedulerOverloaded  # noqa: E402
+from python_chart_ui.scheduler import get_scheduler  # noqa: E402
+from python_chart_ui.sessions import get_session_store  # noqa: E402
+from python_chart_ui.sessions import select_session_values  # noqa: E402
+from python_chart_ui.settings import load_settings  # noqa: E402
+from python_chart_ui.settings import resolve_option  # noqa: E402
+from python_chart_ui.variants import build_variants  # noqa: E402
+from python_chart_ui.variants import thumbnail_widths  # noqa: E402
+
+
+_CHART_LIBRARIES = CHART_LIBRARIES
+
+# 回退扫描输出目录时最多收集的文件数。
+_MAX_SCANNED_FILES = 2000
+
+# 执行作用域中预注入的名字，数据集不能与之重名。
+_SCOPE_NAMES = (
+    "np",
+    "pd",
+    "plt",
+    "sns",
+    "plotly",
+    "output_dir",
+    "ensure_output_path",
+    "savefig_safe",
+    "datasets",
+    "_result",
+    "_chart_files",
+)
+
+# 结果序列化长度相对宿主 outputLimit 的预留字符（summary 与 main 追加的字段）。
+_OUTPUT_LIMIT_MARGIN = 600
+
+# 批量结果超出 outputLimit 时各段保留的字段。
+_BATCH_JOB_KEEP_KEYS = (
+    "id",
+    "ok",
+    "summary",
+    "error",
+    "errorType",
+    "stdout",
+    "stderr",
+    "chartFiles",
+    "outputDir",
+)
+
+# 影响执行产物、需要计入结果缓存键的 payload 选项。
+_RESULT_CACHE_OPTIONS = (
+    "fontMode",
+    "imageFormat",
+    "pngCompressLevel",
+    "paletteMaxColors",
+    "imageQuality",
+    "thumbnailWidths",
+    "returnMode",
+    "inlineMaxBytes",
+)
 
 
 def _safe_import(module_name: str):
@@ -31,246 +136,8 @@ def _safe_import(module_name: str):
 
 
 def _detect_chart_libraries() -> Dict[str, str]:
-    """检测常见图表库可用性并返回版本摘要。"""
-    summary: Dict[str, str] = {}
-    for name in ("numpy", "pandas", "matplotlib", "seaborn", "plotly"):
-        module = _safe_import(name)
-        if module is None:
-            summary[name] = "missing"
-            continue
-        summary[name] = str(getattr(module, "__version__", "unknown"))
-    return summary
-
-
-@dataclass
-class _FontCandidate:
-    """候选字体信息。"""
-
-    path: str
-    source_order: int
-    preferred_hit: bool
-    supports_cjk: bool
-
-
-def _font_supports_chinese(font_path: str) -> bool:
-    """检测字体是否包含常见中文字符。"""
-    try:
-        from fontTools.ttLib import TTCollection
-        from fontTools.ttLib import TTFont
-    except Exception:
-        return False
-
-    required_chars = ("中", "文", "图", "表", "月")
-    required_codes = {ord(ch) for ch in required_chars}
-
-    def _font_has_required_codes(font_obj: Any) -> bool:
-        cmap_table = getattr(font_obj, "cmap", None)
-        if cmap_table is None:
-            return False
-        covered = set()
-        for table in getattr(cmap_table, "tables", []):
-            cmap = getattr(table, "cmap", None) or {}
-            covered.update(cmap.keys())
-            if required_codes.issubset(covered):
-                return True
-        return False
-
-    try:
-        lower_name = os.path.basename(font_path).lower()
-        if lower_name.endswith(".ttc"):
-            collection = TTCollection(font_path, lazy=True)
-            try:
-                for font_obj in collection.fonts:
-                    if _font_has_required_codes(font_obj):
-                        return True
-            finally:
-                try:
-                    collection.close()
-                except Exception:
-                    pass
-            return False
-
-        font_obj = TTFont(font_path, lazy=True)
-        try:
-            return _font_has_required_codes(font_obj)
-        finally:
-            try:
-                font_obj.close()
-            except Exception:
-                pass
-    except Exception:
-        return False
-
-
-def _collect_chinese_font_candidates() -> List[_FontCandidate]:
-    """收集可用于 matplotlib 的中文字体候选。"""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    plugin_root = os.path.dirname(script_dir)
-    # 重要：
-    # Android 上对 /system/fonts 全量扫描并 addfont，容易在部分机型触发 ft2font 原生崩溃。
-    # 这里不再遍历系统字体目录，只使用：
-    # 1) 插件内字体目录（推荐）
-    # 2) 少量系统白名单字体路径（存在才加入）
-    candidate_dirs = [
-        os.path.join(plugin_root, "assets", "fonts"),
-        os.path.join(plugin_root, "libs", "fonts"),
-    ]
-    system_font_whitelist = [
-        "/system/fonts/NotoSansCJK-Regular.ttc",
-        "/system/fonts/NotoSansSC-Regular.otf",
-        "/system/fonts/SourceHanSansCN-Regular.otf",
-        "/system/fonts/DroidSansFallback.ttf",
-    ]
-    preferred_names = (
-        "harmony",
-        "hmos",
-        "NotoSansCJK",
-        "NotoSansSC",
-        "SourceHanSans",
-        "DroidSansFallback",
-        "MiSans",
-        "PingFang",
-        "simhei",
-        "msyh",
-    )
-    result: List[_FontCandidate] = []
-    seen = set()
-    for source_order, folder in enumerate(candidate_dirs):
-        if not os.path.isdir(folder):
-            continue
-        for root, _, files in os.walk(folder):
-            for name in files:
-                lower = name.lower()
-                if not (
-                    lower.endswith(".ttf")
-                    or lower.endswith(".ttc")
-                    or lower.endswith(".otf")
-                ):
-                    continue
-                full_path = os.path.abspath(os.path.join(root, name))
-                if full_path in seen:
-                    continue
-                seen.add(full_path)
-                preferred_hit = any(
-                    keyword.lower() in os.path.basename(full_path).lower()
-                    for keyword in preferred_names
-                )
-                result.append(
-                    _FontCandidate(
-                        path=full_path,
-                        source_order=source_order,
-                        preferred_hit=preferred_hit,
-                        supports_cjk=_font_supports_chinese(full_path),
-                    )
-                )
-
-    # 仅追加系统白名单字体，避免全量扫描系统目录导致 native 崩溃。
-    for full_path in system_font_whitelist:
-        normalized = os.path.abspath(full_path)
-        if normalized in seen or not os.path.isfile(normalized):
-            continue
-        seen.add(normalized)
-        preferred_hit = any(
-            keyword.lower() in os.path.basename(normalized).lower()
-            for keyword in preferred_names
-        )
-        result.append(
-            _FontCandidate(
-                path=normalized,
-                source_order=99,
-                preferred_hit=preferred_hit,
-                supports_cjk=_font_supports_chinese(normalized),
-            )
-        )
-
-    # 排序策略：
-    # 1) 先保证“实际支持中文字形”；
-    # 2) 再按命名关键词倾向中文字体；
-    # 3) 再按目录优先级（插件内字体 > 系统字体）。
-    result.sort(
-        key=lambda item: (
-            0 if item.supports_cjk else 1,
-            0 if item.preferred_hit else 1,
-            item.source_order,
-            os.path.basename(item.path).lower(),
-        )
-    )
-    return result
-
-
-def _setup_matplotlib_chinese() -> str:
-    """配置 matplotlib 中文字体，返回配置摘要。"""
-    matplotlib = _safe_import("matplotlib")
-    if matplotlib is None:
-        return "matplotlib: missing"
-
-    try:
-        matplotlib.use("Agg")
-    except Exception:
-        pass
-
-    font_manager = None
-    try:
-        font_manager = __import__("matplotlib.font_manager", fromlist=["font_manager"])
-    except Exception:
-        font_manager = None
-
-    resolved_names: List[str] = []
-    selected_font_name = ""
-    selected_font_path = ""
-    scanned_font_count = 0
-    cjk_ready_count = 0
-    for candidate in _collect_chinese_font_candidates():
-        font_path = candidate.path
-        scanned_font_count += 1
-        if candidate.supports_cjk:
-            cjk_ready_count += 1
-        try:
-            if font_manager is not None:
-                font_manager.fontManager.addfont(font_path)
-                font_name = font_manager.FontProperties(fname=font_path).get_name()
-            else:
-                font_name = ""
-        except Exception:
-            continue
-        if font_name and font_name not in resolved_names:
-            resolved_names.append(font_name)
-        if candidate.supports_cjk and font_name and not selected_font_name:
-            selected_font_name = font_name
-            selected_font_path = font_path
-
-    # 没找到“验证通过”的中文字体时，降级使用第一个成功注册字体。
-    if not selected_font_name and resolved_names:
-        selected_font_name = resolved_names[0]
-
-    # 若未找到可注册字体，则保留一组常见字体名，交给系统字体回退。
-    fallback_names = [
-        "Noto Sans CJK SC",
-        "Noto Sans CJK",
-        "Source Han Sans CN",
-        "Droid Sans Fallback",
-        "sans-serif",
-    ]
-    final_names = resolved_names + [name for name in fallback_names if name not in resolved_names]
-    try:
-        # 关键：优先把 family 指向具体字体名，避免落到 DejaVu Sans 这类无中文字形字体。
-        if selected_font_name:
-            matplotlib.rcParams["font.family"] = [selected_font_name]
-        else:
-            matplotlib.rcParams["font.family"] = ["sans-serif"]
-        matplotlib.rcParams["font.sans-serif"] = final_names
-        matplotlib.rcParams["axes.unicode_minus"] = False
-    except Exception as error:
-        return f"matplotlib font setup failed: {error}"
-    if selected_font_name:
-        return (
-            f"matplotlib font ready: name={selected_font_name}, path={selected_font_path}, "
-            f"scanned={scanned_font_count}, cjkReady={cjk_ready_count}, loaded={len(resolved_names)}"
-        )
-    return (
-        "matplotlib font fallback ready "
-        f"(scanned={scanned_font_count}, cjkReady={cjk_ready_count}, loaded={len(resolved_names)})"
-    )
+    """检测常见图表库可用性并返回版本摘要（读取包元数据，不导入库本身）。"""
+    return library_versions(_CHART_LIBRARIES)
 
 
 def _normalize_chart_files(raw_files: Any) -> List[str]:
@@ -286,133 +153,57 @@ def _normalize_chart_files(raw_files: Any) -> List[str]:
     return result
 
 
-def _runtime_root_from_output_dir(output_dir: str) -> str:
-    """根据 output_dir 推导插件运行目录根（用于约束绝对路径写入范围）。"""
-    # output_dir 形如: <runtime_root>/chart_outputs/run_xxx
-    return os.path.abspath(os.path.join(output_dir, os.pardir, os.pardir))
+def _build_output_dir() -> str:
+    """为当前执行自动生成独立输出目录（并登记为进行中，避免被后台清理）。"""
+    run_id = uuid.uuid4().hex[:12]
+    output_dir = os.path.join(os.getcwd(), "chart_outputs", f"run_{run_id}")
+    mark_run_active(os.path.basename(output_dir))
+    os.makedirs(output_dir, exist_ok=True)
+    return output_dir
 
 
-def _resolve_and_ensure_output_path(path_value: Any, output_dir: str) -> str:
-    """规范化保存路径并确保父目录存在。
+def _manifest_is_complete(output_dir: str, manifest: List[str]) -> bool:
+    """只列一层输出目录，确认其中的条目都能由产物清单解释。
 
-    规则:
-    1. 相对路径统一落到 output_dir。
-    2. 绝对路径只允许写入插件 runtime 根目录内部，防止越界写入。
-    3. 对最终路径的父目录执行 mkdir -p。
+    顶层出现清单之外的文件，或出现不包含清单文件的子目录时，说明有文件绕过了
+    保存入口（如 open()/np.save 写入），需要回退到目录扫描。
     """
-    raw = os.fspath(path_value)
-    if not isinstance(raw, str):
-        raw = str(raw)
-    if not raw.strip():
-        raise ValueError("empty output path")
-
-    # 相对路径统一转换到本次执行输出目录，避免写到不可控位置。
-    if os.path.isabs(raw):
-        target = os.path.abspath(raw)
-    else:
-        target = os.path.abspath(os.path.join(output_dir, raw))
-
-    runtime_root = _runtime_root_from_output_dir(output_dir)
-    # 仅允许落在插件 runtime 目录内，防止越界写入系统路径。
-    if os.path.commonpath([target, runtime_root]) != runtime_root:
-        raise ValueError(
-            f"invalid output path (outside runtime sandbox): {target}"
-        )
-
-    parent = os.path.dirname(target)
-    if parent:
-        os.makedirs(parent, exist_ok=True)
-    return target
-
-
-def _patch_save_targets(output_dir: str, plt: Any) -> List[Tuple[Any, str, Any]]:
-    """给常见图像保存入口加路径兜底，返回补丁句柄用于恢复。"""
-    patched: List[Tuple[Any, str, Any]] = []
-
-    def _patch_attr(obj: Any, name: str, wrapper_builder):
-        original = getattr(obj, name, None)
-        if original is None:
-            return
-        wrapped = wrapper_builder(original)
-        setattr(obj, name, wrapped)
-        patched.append((obj, name, original))
-
-    # 兜底 matplotlib.pyplot.savefig(path)
-    if plt is not None:
-        def _wrap_pyplot_savefig(original):
-            def _wrapped(*args, **kwargs):
-                if args:
-                    first = args[0]
-                    if isinstance(first, (str, os.PathLike)):
-                        normalized = _resolve_and_ensure_output_path(first, output_dir)
-                        args = (normalized, *args[1:])
-                elif "fname" in kwargs and isinstance(kwargs["fname"], (str, os.PathLike)):
-                    kwargs["fname"] = _resolve_and_ensure_output_path(kwargs["fname"], output_dir)
-                return original(*args, **kwargs)
-
-            return _wrapped
-
-        _patch_attr(plt, "savefig", _wrap_pyplot_savefig)
-
-    # 兜底 matplotlib.figure.Figure.savefig(path)
-    matplotlib_figure = _safe_import("matplotlib.figure")
-    if matplotlib_figure is not None and hasattr(matplotlib_figure, "Figure"):
-        def _wrap_figure_savefig(original):
-            def _wrapped(self, *args, **kwargs):
-                if args:
-                    first = args[0]
-                    if isinstance(first, (str, os.PathLike)):
-                        normalized = _resolve_and_ensure_output_path(first, output_dir)
-                        args = (normalized, *args[1:])
-                elif "fname" in kwargs and isinstance(kwargs["fname"], (str, os.PathLike)):
-                    kwargs["fname"] = _resolve_and_ensure_output_path(kwargs["fname"], output_dir)
-                return original(self, *args, **kwargs)
-
-            return _wrapped
-
-        _patch_attr(matplotlib_figure.Figure, "savefig", _wrap_figure_savefig)
-
-    # 兜底 PIL.Image.Image.save(path)
-    pil_image = _safe_import("PIL.Image")
-    if pil_image is not None and hasattr(pil_image, "Image"):
-        def _wrap_pil_save(original):
-            def _wrapped(self, fp, *args, **kwargs):
-                if isinstance(fp, (str, os.PathLike)):
-                    fp = _resolve_and_ensure_output_path(fp, output_dir)
-                return original(self, fp, *args, **kwargs)
-
-            return _wrapped
-
-        _patch_attr(pil_image.Image, "save", _wrap_pil_save)
-
-    return patched
-
-
-def _restore_patched_methods(patched: List[Tuple[Any, str, Any]]) -> None:
-    """恢复被 patch 的方法，避免影响后续执行上下文。"""
-    for obj, name, original in reversed(patched):
-        try:
-            setattr(obj, name, original)
-        except Exception:
+    explained = set()
+    for path in manifest:
+        relative = os.path.relpath(path, output_dir)
+        if relative.startswith(os.pardir):
             continue
+        explained.add(relative.split(os.sep, 1)[0])
+    try:
+        with os.scandir(output_dir) as entries:
+            return all(entry.name in explained for entry in entries)
+    except OSError:
+        return True
 
 
-def _build_output_dir() -> str:
-    """为当前执行自动生成独立输出目录。"""
-    run_id = uuid.uuid4().hex[:12]
-    output_dir = os.path.join(os.getcwd(), "chart_outputs", f"run_{run_id}")
-    os.makedirs(output_dir, exist_ok=True)
-    return output_dir
+def _scan_output_dir(output_dir: str) -> List[str]:
+    """回退方案：有上限地递归扫描输出目录。"""
+    found: List[str] = []
+    try:
+        for root, _, files in os.walk(output_dir):
+            for name in files:
+                found.append(os.path.abspath(os.path.join(root, name)))
+                if len(found) >= _MAX_SCANNED_FILES:
+                    return sorted(found)
+    except Exception:
+        return sorted(found)
+    return sorted(found)
 
 
 def _collect_generated_files(
     output_dir: str,
-    before_files: List[str],
+    saved_files: List[str],
     declared_files: List[str],
 ) -> List[str]:
     """汇总本次生成图表文件。
 
-    优先使用用户声明的 `_chart_files`，并补充输出目录中新产生的文件。
+    优先使用用户声明的 `_chart_files`，再补充保存入口记录的产物清单；
+    只有清单无法解释输出目录内容时才扫描一次目录，防止遗漏绕过保存入口写入的文件。
     """
     result: List[str] = []
     seen = set()
@@ -425,108 +216,782 @@ def _collect_generated_files(
         seen.add(normalized)
         result.append(normalized)
 
-    # 再补充输出目录中新增的文件（递归），防止用户忘记写 `_chart_files`。
-    current_files: List[str] = []
-    try:
-        for root, _, files in os.walk(output_dir):
-            for name in files:
-                full_path = os.path.abspath(os.path.join(root, name))
-                if os.path.isfile(full_path):
-                    current_files.append(full_path)
-    except Exception:
-        current_files = []
-    before_set = {os.path.abspath(item) for item in before_files}
-    for full_path in sorted(current_files):
-        if full_path in before_set or full_path in seen:
+    # 再补充保存入口记录的文件（仅限输出目录内、确实存在的文件）。
+    manifest = [
+        path
+        for path in saved_files
+        if os.path.commonpath([path, os.path.abspath(output_dir)]) == os.path.abspath(output_dir)
+        and os.path.isfile(path)
+    ]
+    extra = manifest
+    if not _manifest_is_complete(output_dir, manifest):
+        scanned = _scan_output_dir(output_dir)
+        scanned_set = set(scanned)
+        manifest_set = set(manifest)
+        extra = [path for path in manifest if path in scanned_set]
+        extra += [path for path in scanned if path not in manifest_set]
+    for full_path in extra:
+        if full_path in seen:
             continue
         seen.add(full_path)
         result.append(full_path)
     return result
 
 
-def _auto_save_open_figures(output_dir: str) -> List[str]:
-    """当模型忘记 savefig 时，自动将当前打开的 figure 导出到输出目录。"""
+def _auto_save_open_figures(
+    output_dir: str,
+    figure_numbers: List[Any],
+    max_workers: int = 1,
+    min_parallel: int = 4,
+    savefig_kwargs: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[str], Dict[str, Any]]:
+    """当模型忘记 savefig 时，自动将本次执行打开的 figure 导出到输出目录。
+
+    figure 较多时按 `max_workers` 并行导出，文件名与顺序与串行导出一致。
+    """
+    stats: Dict[str, Any] = {"figures": 0, "mode": "serial", "elapsedMs": 0.0}
+    if not figure_numbers:
+        return [], stats
     matplotlib = _safe_import("matplotlib")
     if matplotlib is None:
-        return []
+        return [], stats
     try:
-        pyplot = __import__("matplotlib.pyplot", fromlist=["pyplot"])
         helpers = __import__("matplotlib._pylab_helpers", fromlist=["Gcf"])
     except Exception:
-        return []
+        return [], stats
 
-    saved_files: List[str] = []
+    owned = set(figure_numbers)
     managers = list(getattr(helpers.Gcf, "get_all_fig_managers", lambda: [])() or [])
+    managers = [item for item in managers if getattr(item, "num", None) in owned]
+    items = []
     for index, manager in enumerate(managers, start=1):
         figure = getattr(manager, "canvas", None)
         figure = getattr(figure, "figure", None)
         if figure is None:
             continue
-        file_path = os.path.abspath(os.path.join(output_dir, f"auto_chart_{index}.png"))
+        items.append(
+            (figure, os.path.abspath(os.path.join(output_dir, f"auto_chart_{index}.png")))
+        )
+    if not items:
+        return [], stats
+
+    started = time.perf_counter()
+    saved, mode = save_figures(
+        items,
+        {"dpi": 150, "bbox_inches": "tight", **(savefig_kwargs or {})},
+        max_workers=max_workers,
+        min_parallel=min_parallel,
+    )
+    stats.update(
+        figures=len(items),
+        mode=mode,
+        elapsedMs=round((time.perf_counter() - started) * 1000, 1),
+    )
+    return [path for (_, path), ok in zip(items, saved) if ok], stats
+
+
+def _close_run_figures(plt: Any, figure_numbers: List[Any]) -> None:
+    """关闭本次执行创建的 figure，避免 matplotlib 句柄持续堆积。"""
+    if plt is None:
+        return
+    for number in figure_numbers:
         try:
-            figure.savefig(file_path, dpi=150, bbox_inches="tight")
-            saved_files.append(file_path)
+            plt.close(number)
         except Exception:
             continue
+
+
+def _kernel_error_result(
+    error: Exception, error_type: str, flavor: str, output_dir: str
+) -> Dict[str, Any]:
+    """kernel 已接收请求但未返回结果时的错误结构（保留输出目录中已生成的文件）。"""
+    chart_files = _scan_output_dir(output_dir)
+    return {
+        "ok": False,
+        "summary": f"python_chart_exec 执行失败({error_type})，已保留 chart_files={len(chart_files)}",
+        "error": str(error),
+        "errorType": error_type,
+        "stdout": "",
+        "stderr": "",
+        "chartFiles": chart_files,
+        "generatedChartFiles": chart_files,
+        "partial": True,
+        "outputDir": output_dir,
+        "executor": f"kernel:{flavor}",
+    }
+
+
+def _discard_output_dir(output_dir: str) -> None:
+    """放弃未被使用的输出目录：取消进行中登记，目录为空时删除。"""
+    mark_run_finished(os.path.basename(output_dir))
     try:
-        pyplot.close("all")
-    except Exception:
+        os.rmdir(output_dir)
+    except OSError:
         pass
-    return saved_files
 
 
-def main(payload: Dict[str, Any]) -> Dict[str, Any]:
-    """工具入口。
+def _run_via_kernel(
+    payload: Dict[str, Any],
+    settings: Dict[str, Any],
+    flavor: str,
+    output_dir: str,
+) -> Optional[Dict[str, Any]]:
+    """转发给常驻预热进程执行；kernel 尚未就绪或不可用时返回 None。
 
-    输入:
-        payload["code"]: 要执行的 Python 代码（必填）
+    `output_dir` 由调用方创建后交给 kernel 使用，kernel 超时或崩溃时错误结果同样带上它，
+    以便释放运行登记。
     """
-    code = str(payload.get("code", "") or "")
-    if not code.strip():
+    idle_timeout = float(settings.get("kernelIdleTimeoutSec") or 1800)
+    request_timeout = float(settings.get("kernelRequestTimeoutSec") or 80)
+    if not kernel.ensure_kernel_started(os.path.abspath(__file__), idle_timeout, flavor):
+        return None
+    try:
+        result = kernel.run_in_kernel(
+            payload,
+            cwd=os.getcwd(),
+            timeout=request_timeout,
+            flavor=flavor,
+            output_dir=output_dir,
+        )
+    except kernel.KernelTimeoutError as error:
+        return _kernel_error_result(error, "timeout", flavor, output_dir)
+    except kernel.KernelError as error:
+        # 例如 fork 子进程在用户代码中崩溃（段错误、被 kill）。
+        return _kernel_error_result(error, "worker_crashed", flavor, output_dir)
+    if result is None:
+        return None
+    if result.get("outputDir") != output_dir:
+        # 旧版本 kernel 不识别传入的输出目录，自行创建了目录。
+        _discard_output_dir(output_dir)
+    result["executor"] = f"kernel:{flavor}"
+    return result
+
+
+def _syntax_error_result(message: str) -> Dict[str, Any]:
+    """预检发现语法错误时的结果结构（未导入图表库、未创建输出目录）。"""
+    lines = message.strip().splitlines()
+    return {
+        "ok": False,
+        "summary": "python_chart_exec 执行失败(syntax_error)",
+        "error": lines[-1] if lines else "syntax error",
+        "errorType": "syntax_error",
+        "stdout": "",
+        "stderr": message,
+        "chartFiles": [],
+    }
+
+
+def _dataset_root(output_dir: str) -> str:
+    """数据集相对路径的基准目录：`chart_outputs` 所在目录（批量任务的子目录同样适用）。"""
+    current = os.path.abspath(output_dir)
+    while os.path.basename(current) != "chart_outputs":
+        parent = os.path.dirname(current)
+        if parent == current:
+            return runtime_root_from_output_dir(output_dir)
+        current = parent
+    return os.path.dirname(current)
+
+
+def _dataset_error_result(error: Exception) -> Dict[str, Any]:
+    """数据集参数无效时的结果结构（未执行代码）。"""
+    return {
+        "ok": False,
+        "summary": "python_chart_exec 数据集参数无效",
+        "error": str(error),
+        "errorType": "invalid_dataset",
+        "stdout": "",
+        "stderr": "",
+        "chartFiles": [],
+    }
+
+
+def _run_via_subprocess(payload: Dict[str, Any], settings: Dict[str, Any]) -> Dict[str, Any]:
+    """在带资源上限的子进程中执行（含批量任务）；子进程被杀或崩溃时仍返回已生成的文件。"""
+    output_dir = _build_output_dir()
+    outcome = run_in_subprocess(
+        os.path.abspath(__file__),
+        payload,
+        output_dir,
+        soft_timeout=float(settings.get("sandboxSoftTimeoutSec") or 0),
+        hard_timeout=float(settings.get("sandboxHardTimeoutSec") or 85),
+        memory_limit_mb=float(settings.get("sandboxMemoryLimitMb") or 0),
+        cpu_limit_sec=float(settings.get("sandboxCpuLimitSec") or 0),
+        stdout_limit_bytes=int(resolve_option(payload, "captureStdoutBytes", settings)),
+    )
+    if outcome.result is not None:
+        result = outcome.result
+        result.setdefault("outputDir", output_dir)
+        result["executor"] = "subprocess"
+        return result
+
+    error_type = classify_failure(outcome)
+    chart_files = _scan_output_dir(output_dir)
+    return {
+        "ok": False,
+        "summary": f"python_chart_exec 执行失败({error_type})，已保留 chart_files={len(chart_files)}",
+        "error": f"subprocess ended without result (returncode={outcome.returncode})",
+        "errorType": error_type,
+        "stdout": outcome.stdout,
+        "stderr": outcome.stderr_tail,
+        "result": None,
+        "chartFiles": chart_files,
+        "generatedChartFiles": chart_files,
+        "partial": True,
+        "outputDir": output_dir,
+        "executor": "subprocess",
+    }
+
+
+def _shared_batch_setup(needs: set, font_mode: Any) -> Dict[str, float]:
+    """批量执行前的一次性准备：字体配置与各段代码用到的图表库导入。"""
+    timings: Dict[str, float] = {}
+    prepare_mplconfig_dir()
+    if "matplotlib" in needs:
+        started = time.perf_counter()
+        try:
+            setup_matplotlib_chinese(font_mode)
+            install_save_patches(__import__("matplotlib.pyplot", fromlist=["pyplot"]))
+        except Exception:
+            pass
+        timings["matplotlib"] = round((time.perf_counter() - started) * 1000, 1)
+    for name in _CHART_LIBRARIES:
+        if name not in needs or name == "matplotlib":
+            continue
+        started = time.perf_counter()
+        if _safe_import(name) is not None:
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+def _run_batch(
+    payload: Dict[str, Any],
+    settings: Dict[str, Any],
+    output_dir: Optional[str] = None,
+    exclusive: bool = True,
+) -> Dict[str, Any]:
+    """执行 `jobs: [{code, id}, ...]`：共享一次准备，每段代码独立子进程与子目录。
+
+    `output_dir` 由调用方预先创建时直接使用（subprocess 模式下整个批次在沙箱子进程内执行）。
+    `exclusive=False` 表示同进程内可能有其它执行并行，此时不 fork，改用线程池。
+    """
+    started = time.perf_counter()
+    raw_jobs = [item for item in payload.get("jobs") or [] if isinstance(item, dict)]
+    max_jobs = int(settings.get("batchMaxJobs") or 16)
+    if not raw_jobs or len(raw_jobs) > max_jobs:
         return {
             "ok": False,
-            "summary": "python_chart_exec 缺少 code 参数",
-            "error": "missing code",
+            "summary": "python_chart_exec 批量任务参数无效",
+            "error": f"jobs must contain 1..{max_jobs} items with code",
+            "errorType": "invalid_jobs",
             "stdout": "",
             "stderr": "",
             "chartFiles": [],
-            "libraries": _detect_chart_libraries(),
         }
 
-    # 不从入参读取输出目录，始终由工具自动生成本次执行专属目录。
-    output_dir = _build_output_dir()
-    before_files: List[str] = []
+    if output_dir is None:
+        output_dir = _build_output_dir()
+    shared_options = {
+        # 批量任务并行执行，不参与会话。
+        key: value
+        for key, value in payload.items()
+        if key not in ("jobs", "code", "id", "sessionId")
+    }
+    for key in ("captureStdoutBytes", "captureStderrBytes"):
+        # 各段输出汇总到同一个结果中，捕获上限按段数均分。
+        shared_options[key] = max(256, int(resolve_option(payload, key, settings)) // len(raw_jobs))
+    if str(resolve_option(payload, "returnMode", settings) or "file").lower() == "inline":
+        # 各段的内联图片汇总到同一个结果中，上限按段数均分。
+        shared_options["inlineMaxBytes"] = max(
+            1, inline_max_bytes(resolve_option(payload, "inlineMaxBytes", settings)) // len(raw_jobs)
+        )
+    job_results: List[Optional[Dict[str, Any]]] = [None] * len(raw_jobs)
+    pending = []
+    needs: set = set()
+    # 各段的预检结论传给执行函数，避免重复预检（重复预检必然命中编译缓存）。
+    checked_by_code: Dict[str, PreflightResult] = {}
+    for index, item in enumerate(raw_jobs):
+        job_id = item.get("id") or str(index + 1)
+        code = str(item.get("code", "") or "")
+        checked = preflight(code) if code.strip() else None
+        if checked is not None and not checked.ok:
+            job_results[index] = _syntax_error_result(checked.syntax_error or "")
+        else:
+            if checked is not None:
+                needs.update(checked.needs)
+                checked_by_code[code] = checked
+            job_payload = dict(shared_options)
+            job_payload["code"] = code
+            pending.append(
+                (index, job_payload, os.path.join(output_dir, job_dir_name(job_id, index + 1)))
+            )
+
+    setup_started = time.perf_counter()
+    setup_timings = _shared_batch_setup(needs, payload.get("fontMode"))
+    setup_ms = round((time.perf_counter() - setup_started) * 1000, 1)
+
+    configured = int(settings.get("batchMaxWorkers") or 0)
+    max_workers = configured if configured > 0 else max(1, os.cpu_count() or 1)
+    pool_kind = "none"
+    if pending:
+        results, pool_kind = run_jobs(
+            lambda job_payload, **kwargs: _run_local(
+                job_payload, checked=checked_by_code.get(job_payload["code"]), **kwargs
+            ),
+            [(job_payload, job_dir) for _, job_payload, job_dir in pending],
+            max_workers,
+            timeout=float(settings.get("batchJobTimeoutSec") or 0),
+            allow_fork=exclusive,
+        )
+        for (index, _, _), result in zip(pending, results):
+            job_results[index] = result
+
+    jobs_out: List[Dict[str, Any]] = []
+    chart_files: List[str] = []
+    chart_variants: List[Dict[str, Any]] = []
+    inline_images: List[Dict[str, Any]] = []
+    inline_dirs: List[str] = []
+    for index, item in enumerate(raw_jobs):
+        result = dict(job_results[index] or {})
+        result["id"] = item.get("id") or str(index + 1)
+        jobs_out.append(result)
+        chart_files.extend(result.get("chartFiles") or [])
+        chart_variants.extend(result.get("chartVariants") or [])
+        # 内联图片只在顶层返回一份，避免在逐段结果中重复占用输出长度。
+        images = result.pop("inlineImages", None) or []
+        inline_images.extend(images)
+        inline_dirs.extend([result.get("outputDir") or output_dir] * len(images))
+    ok_count = sum(1 for item in jobs_out if item.get("ok"))
+    wall_ms = round((time.perf_counter() - started) * 1000, 1)
+    job_ms = round(sum(float(item.get("elapsedMs") or 0) for item in jobs_out), 1)
+    batch_result = {
+        "ok": ok_count == len(jobs_out),
+        "summary": (
+            f"python_chart_exec 批量执行完成，jobs={len(jobs_out)}，成功={ok_count}，"
+            f"chart_files={len(chart_files)}"
+        ),
+        "error": None if ok_count == len(jobs_out) else "some jobs failed",
+        "errorType": None if ok_count == len(jobs_out) else "batch_partial_failure",
+        "stdout": "",
+        "stderr": "",
+        "jobs": jobs_out,
+        "chartFiles": chart_files,
+        "generatedChartFiles": chart_files,
+        "chartVariants": chart_variants,
+        "inlineImages": inline_images,
+        "outputDir": output_dir,
+        "timings": {
+            "setupMs": setup_ms,
+            "setup": setup_timings,
+            "wallMs": wall_ms,
+            "sumJobMs": job_ms,
+            "workers": min(max_workers, max(1, len(pending))),
+            "pool": pool_kind,
+        },
+        "executor": f"batch:{pool_kind}",
+    }
+    _fit_batch_output(batch_result, inline_dirs)
+    return batch_result
+
+
+def _clip_middle(text: str, budget: int) -> str:
+    """保留首尾共 `budget` 个字符，中间替换为省略提示。"""
+    if len(text) <= budget:
+        return text
+    head = budget // 2
+    tail = text[len(text) - (budget - head):] if budget > head else ""
+    return f"{text[:head]}\n…（批量结果超出输出上限，省略 {len(text) - budget} 字符）…\n{tail}"
+
+
+def _fit_batch_output(result: Dict[str, Any], inline_dirs: List[str]) -> None:
+    """批量结果序列化后须小于宿主 outputLimit，超出时依次：
+
+    1. 从最后一张起把内联图片写到所属段的输出目录；
+    2. 以同一预算逐步减半截短各段 stdout/stderr（保留首尾）；
+    3. 仍超出时各段只保留结论字段。
+    """
+    limit = tool_output_limit() - _OUTPUT_LIMIT_MARGIN
+
+    def fits() -> bool:
+        return len(json.dumps(result, ensure_ascii=False, default=str)) <= limit
+
+    inline_images = result["inlineImages"]
+    while inline_images and not fits():
+        image = inline_images.pop()
+        path = os.path.abspath(os.path.join(inline_dirs.pop(), image["name"]))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as handle:
+            handle.write(base64.b64decode(image["data"]))
+        result["chartFiles"].append(path)
+    if fits():
+        return
+
+    jobs = result["jobs"]
+    budget = max([len(job.get(key) or "") for job in jobs for key in ("stdout", "stderr")] + [0])
+    while budget > 0 and not fits():
+        budget //= 2
+        for job in jobs:
+            for key in ("stdout", "stderr"):
+                if isinstance(job.get(key), str):
+                    job[key] = _clip_middle(job[key], budget)
+    if not fits():
+        result["jobs"] = [
+            {key: job[key] for key in _BATCH_JOB_KEEP_KEYS if key in job} for job in jobs
+        ]
+    result["outputTrimmed"] = True
+
+
+def _scheduler_rejected_result(error: Exception, error_type: str) -> Dict[str, Any]:
+    """调度器拒绝准入或排队超时时的结果结构。"""
+    return {
+        "ok": False,
+        "summary": f"python_chart_exec 未执行({error_type})",
+        "error": str(error),
+        "errorType": error_type,
+        "stdout": "",
+        "stderr": "",
+        "chartFiles": [],
+    }
+
+
+def _result_cache_key(code: str, payload: Dict[str, Any]) -> str:
+    """结果缓存键：代码 + 图表库版本 + 选中字体 + 相关 payload 选项。"""
+    options = {name: payload.get(name) for name in _RESULT_CACHE_OPTIONS}
+    if payload.get("datasets"):
+        # 数据集按文件身份（路径/大小/mtime）计入，文件内容变化后不会命中旧结果。
+        options["datasets"] = dataset_identities(payload["datasets"], os.getcwd())
+    return build_cache_key(
+        code,
+        _detect_chart_libraries(),
+        selected_font_identity(),
+        options,
+    )
+
+
+def _cached_result(cached: Dict[str, Any]) -> Dict[str, Any]:
+    """把缓存命中的结果片段补全为标准结果结构。"""
+    chart_files = cached["chartFiles"]
+    return {
+        "ok": True,
+        "summary": cached.get("summary")
+        or f"python_chart_exec 执行成功，chart_files={len(chart_files)}",
+        "error": None,
+        "errorType": None,
+        "stdout": cached.get("stdout") or "",
+        "stderr": cached.get("stderr") or "",
+        "result": cached.get("result"),
+        "chartFiles": chart_files,
+        "generatedChartFiles": chart_files,
+        "chartVariants": cached.get("chartVariants") or [],
+        "inlineImages": cached.get("inlineImages") or [],
+        "libraries": _detect_chart_libraries(),
+        "outputDir": cached["outputDir"],
+        "fontSetup": cached.get("fontSetup"),
+        "executor": "cache",
+        "cacheHit": True,
+        "cachedAt": cached.get("cachedAt"),
+        "queueWaitMs": 0.0,
+    }
+
+
+def _index_artifacts(result: Dict[str, Any], code: str, started_at: int) -> None:
+    """在后台把本次运行与产物登记到 SQLite 索引（相同内容的文件去重为硬链接）。
+
+    哈希与去重不在返回路径上执行；`runId` 即输出目录名，可立即返回给调用方。
+    """
+    output_dir = result.get("outputDir")
+    if not output_dir:
+        return
+    run_id = os.path.basename(output_dir)
+    artifacts.record_run_async(
+        run_id,
+        output_dir,
+        list(result.get("chartFiles") or []),
+        code_hash=code_hash(code),
+        started_at=started_at,
+        ok=result.get("ok"),
+        executor=result.get("executor"),
+    )
+    result["runId"] = run_id
+
+
+def _release_run(result: Dict[str, Any], settings: Dict[str, Any]) -> None:
+    """取消本次运行的进行中登记，并按需在后台发起一轮输出目录清理。"""
+    output_dir = result.get("outputDir")
+    if output_dir:
+        mark_run_finished(os.path.basename(output_dir))
+        maybe_schedule_gc(settings, [os.path.dirname(output_dir)])
+    else:
+        maybe_schedule_gc(settings)
+
+
+def _effective_max_workers(settings: Dict[str, Any]) -> int:
+    """计算调度并发上限；自动模式下只有 fork/subprocess 隔离执行才按 CPU 核数并发。
+
+    只读持久化设置，不看 payload 的 `executionMode`：调度器是进程级的，
+    单次调用不应改变其它调用的并发。
+    """
+    configured = int(settings.get("schedulerMaxWorkers") or 0)
+    if configured > 0:
+        return configured
+    if settings.get("executionMode") in ("fork", "subprocess"):
+        return max(1, os.cpu_count() or 1)
+    return 1
+
+
+def _dispatch(
+    payload: Dict[str, Any],
+    settings: Dict[str, Any],
+    execution_mode: str,
+    exclusive: bool,
+    checked: Optional[PreflightResult] = None,
+) -> Dict[str, Any]:
+    """按执行方式分发，kernel 不可用时回退本地执行。
+
+    `exclusive=False` 表示同进程内可能有其它执行并行，此时不切换 cwd。
+    `checked` 为入口处的预检结论，本地执行直接沿用；kernel/subprocess 子进程自行预检。
+    """
+    if payload.get("jobs"):
+        if execution_mode == "subprocess":
+            # 整个批次放进带资源上限的沙箱子进程，各段代码在其中再 fork 执行。
+            return _run_via_subprocess(payload, settings)
+        return _run_batch(payload, settings, exclusive=exclusive)
+    if payload.get("sessionId") and execution_mode in ("fork", "subprocess"):
+        # 会话变量保存在执行进程内存中，fork/subprocess 子进程结束即丢失，改由常驻进程执行。
+        execution_mode = "kernel"
+    output_dir = None
+    if execution_mode in ("kernel", "fork"):
+        flavor = kernel.FLAVOR_FORK if execution_mode == "fork" else kernel.FLAVOR_WARM
+        output_dir = _build_output_dir()
+        result = _run_via_kernel(payload, settings, flavor, output_dir)
+        if result is not None:
+            return result
+    if execution_mode == "subprocess":
+        return _run_via_subprocess(payload, settings)
+    # kernel 不可用时在本地执行，沿用已创建的输出目录。
+    return _run_local(payload, allow_chdir=exclusive, output_dir=output_dir, checked=checked)
+
+
+def main(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """工具入口。
+
+    输入:
+        payload["code"]: 要执行的 Python 代码（与 jobs 二选一）
+        payload["fontMode"]: 字体注册模式 `lazy`（默认）或 `eager`（可选）
+        payload["executionMode"]: `local`/`kernel`/`fork`/`subprocess`（可选，默认取插件设置）
+        payload["priority"]: 排队优先级，数值越大越先执行（可选，默认 0）
+        payload["queueTimeoutSec"]: 最长排队秒数（可选，默认取插件设置）
+        payload["resultCache"]: 是否使用结果缓存（可选，默认取插件设置）
+        payload["jobs"]: 批量执行 `[{"code": ..., "id": ...}, ...]`（可选，与 code 二选一）
+    """
+    # 语法错误在排队、转发 kernel 之前直接返回（批量任务逐段预检）。
+    code = "" if payload.get("jobs") else str(payload.get("code", "") or "")
+    checked = None
+    if code.strip():
+        checked = preflight(code)
+        if not checked.ok:
+            return _syntax_error_result(checked.syntax_error or "")
+
+    settings = load_settings()
+    started_at = int(time.time() * 1000)
+    index_enabled = bool(settings.get("artifactIndex"))
+
+    result_cache = None
+    cache_key = None
+    # 会话执行依赖上次保存的变量，结果不可复用。
+    if code.strip() and resolve_option(payload, "resultCache", settings) and not payload.get("sessionId"):
+        result_cache = ResultCache(
+            int(settings.get("resultCacheMaxBytes") or 0),
+            int(settings.get("resultCacheMaxEntries") or 1),
+        )
+        cache_key = _result_cache_key(code, payload)
+        cached = result_cache.lookup(cache_key, _build_output_dir)
+        if cached is not None:
+            result = _cached_result(cached)
+            if index_enabled:
+                _index_artifacts(result, code, started_at)
+            _release_run(result, settings)
+            return result
+
+    execution_mode = resolve_option(payload, "executionMode", settings)
+    scheduler = get_scheduler(
+        _effective_max_workers(settings),
+        int(settings.get("schedulerMaxQueue") or 0),
+    )
     try:
-        for root, _, files in os.walk(output_dir):
-            for name in files:
-                full_path = os.path.abspath(os.path.join(root, name))
-                if os.path.isfile(full_path):
-                    before_files.append(full_path)
-    except Exception:
-        before_files = []
+        priority = int(payload.get("priority") or 0)
+    except (TypeError, ValueError):
+        priority = 0
+    queue_timeout = payload.get("queueTimeoutSec") or settings.get("schedulerQueueTimeoutSec")
+    try:
+        result, wait_ms = scheduler.run(
+            lambda: _dispatch(
+                payload,
+                settings,
+                execution_mode,
+                exclusive=scheduler.max_workers <= 1,
+                checked=checked,
+            ),
+            priority=priority,
+            queue_timeout=float(queue_timeout) if queue_timeout else None,
+        )
+    except SchedulerOverloaded as error:
+        return _scheduler_rejected_result(error, "overloaded")
+    except QueueWaitTimeout as error:
+        return _scheduler_rejected_result(error, "queue_timeout")
+    result["queueWaitMs"] = wait_ms
+    if result_cache is not None and cache_key is not None:
+        result["cacheHit"] = False
+        if result.get("ok") and result.get("outputDir"):
+            result_cache.store(cache_key, result, result["outputDir"])
+    if index_enabled and (code.strip() or payload.get("jobs")):
+        index_code = code if code.strip() else json.dumps(
+            [str(item.get("code", "")) for item in payload["jobs"] if isinstance(item, dict)],
+            ensure_ascii=False,
+        )
+        _index_artifacts(result, index_code, started_at)
+    _release_run(result, settings)
+    return result
+
 
-    stdout_buffer = io.StringIO()
-    stderr_buffer = io.StringIO()
+def _early_result(result: Dict[str, Any], output_dir: Optional[str]) -> Dict[str, Any]:
+    """执行前即返回的错误结果：输出目录由调用方预先创建时带上它，以便释放运行登记。"""
+    if output_dir:
+        result["outputDir"] = output_dir
+    return result
 
-    # 默认注入常见图表变量，降低模型编写代码门槛。
-    np = _safe_import("numpy")
-    pd = _safe_import("pandas")
-    sns = _safe_import("seaborn")
-    plotly = _safe_import("plotly")
 
-    plt = None
-    font_setup_message = "matplotlib: missing"
-    matplotlib = _safe_import("matplotlib")
-    if matplotlib is not None:
-        try:
-            font_setup_message = _setup_matplotlib_chinese()
-            plt = __import__("matplotlib.pyplot", fromlist=["pyplot"])
-        except Exception:
-            plt = None
+def _fit_inline_output(result: Dict[str, Any], inline_store: InlineImageStore) -> None:
+    """结果序列化后须小于宿主 outputLimit：超出时从最后一张起把内联图片改为写盘。"""
+    limit = tool_output_limit() - _OUTPUT_LIMIT_MARGIN
+    while len(inline_store):
+        serialized = json.dumps(result, ensure_ascii=False, default=str)
+        if len(serialized) <= limit:
+            break
+        path = inline_store.spill_last()
+        if path is None:
+            break
+        result["chartFiles"] = result["chartFiles"] + [path]
+        result["generatedChartFiles"] = result["chartFiles"]
+        result["inlineImages"] = inline_store.images()
+        result["inlineStats"] = inline_store.stats()
+
+
+def _run_local(
+    payload: Dict[str, Any],
+    allow_chdir: bool = True,
+    output_dir: Optional[str] = None,
+    stream_output: bool = False,
+    checked: Optional[PreflightResult] = None,
+) -> Dict[str, Any]:
+    """在当前进程内执行一次图表代码（kernel/subprocess 子进程内也通过它执行）。
+
+    `allow_chdir=False` 时不切换进程 cwd，可与其它执行在同一进程的不同线程中并行。
+    `output_dir` 由调用方预先创建时直接使用（subprocess 模式据此保留中途产物）。
+    `stream_output=True` 时捕获的输出同时逐次写到进程原始 stdout/stderr
+    （subprocess 子进程据此在被杀后仍保留已打印的内容）。
+    `checked` 为调用方已做的同一段代码的预检结论，传入时不再预检
+    （否则 `compileCached` 总是命中）。
+    """
+    # 必须在任何图表库（含 seaborn 间接导入 matplotlib）导入前设置 MPLCONFIGDIR。
+    prepare_mplconfig_dir()
+    code = str(payload.get("code", "") or "")
+    if not code.strip():
+        return _early_result(
+            {
+                "ok": False,
+                "summary": "python_chart_exec 缺少 code 参数",
+                "error": "missing code",
+                "stdout": "",
+                "stderr": "",
+                "chartFiles": [],
+                "libraries": _detect_chart_libraries(),
+            },
+            output_dir,
+        )
+    if checked is None or checked.code_hash != code_hash(code):
+        checked = preflight(code)
+    if not checked.ok:
+        return _early_result(_syntax_error_result(checked.syntax_error or ""), output_dir)
+
+    # 数据集路径在创建输出目录前校验，参数错误时直接返回。
+    try:
+        dataset_paths = resolve_datasets(
+            payload.get("datasets"),
+            _dataset_root(output_dir) if output_dir else os.getcwd(),
+            reserved=_SCOPE_NAMES,
+        )
+    except DatasetError as error:
+        return _early_result(_dataset_error_result(error), output_dir)
+    catalog = DatasetCatalog(dataset_paths) if dataset_paths else None
+    referenced_datasets = [name for name in dataset_paths if name in checked.names]
+
+    # 不从入参读取输出目录，始终由工具自动生成本次执行专属目录。
+    if output_dir is None:
+        output_dir = _build_output_dir()
+
+    # 默认注入常见图表变量，降低模型编写代码门槛；除 plt 外均为延迟导入代理，
+    # 首次访问属性时才真正导入。
+    preloaded = {name for name in _CHART_LIBRARIES if name in sys.modules}
+    np = LazyModule("numpy")
+    pd = LazyModule("pandas")
+    sns = LazyModule("seaborn")
+    plotly = LazyModule("plotly")
+
+    font_setup = {"message": "matplotlib: missing"}
+
+    def _load_pyplot():
+        # 首次使用 plt 时才配置中文字体并导入 pyplot。
+        font_setup["message"] = setup_matplotlib_chinese(payload.get("fontMode"))
+        module = __import__("matplotlib.pyplot", fromlist=["pyplot"])
+        install_save_patches(module)
+        return module
+
+    plt: Any = None
+    # 对数据集 DataFrame 调用 .plot()/.hist() 等同样会用到 matplotlib。
+    if checked.uses_matplotlib or (referenced_datasets and checked.names & PANDAS_PLOT_ATTRS):
+        # 代码用到 matplotlib（含 seaborn、pandas 绘图）时提前配置字体。
+        matplotlib = _safe_import("matplotlib")
+        if matplotlib is not None:
+            try:
+                plt = _load_pyplot()
+            except Exception:
+                plt = None
+    else:
+        font_setup["message"] = "matplotlib: skipped (not used)"
+        plt = LazyModule("matplotlib.pyplot", loader=_load_pyplot)
+    scope_modules = {"numpy": np, "pandas": pd, "matplotlib": plt, "seaborn": sns, "plotly": plotly}
+
+    # 输出捕获有字节上限：保留首尾、折叠重复行；stderr 更看重结尾的 traceback。
+    settings = load_settings()
+    encoding = encoding_options(payload, settings)
+    inline_store = None
+    if str(resolve_option(payload, "returnMode", settings) or "file").lower() == "inline":
+        inline_store = InlineImageStore(
+            inline_max_bytes(resolve_option(payload, "inlineMaxBytes", settings))
+        )
+    run = RunContext(
+        run_id=os.path.basename(output_dir),
+        output_dir=output_dir,
+        stdout=BoundedTextBuffer(
+            int(resolve_option(payload, "captureStdoutBytes", settings)),
+            mirror=sys.__stdout__ if stream_output else None,
+        ),
+        stderr=BoundedTextBuffer(
+            int(resolve_option(payload, "captureStderrBytes", settings)),
+            head_ratio=0.25,
+            mirror=sys.__stderr__ if stream_output else None,
+        ),
+        savefig_defaults=encoding.savefig_defaults(),
+        inline=inline_store,
+    )
+    install_stream_capture()
+    # 在执行用户代码前对保存入口做兜底，处理“目录不存在”的高频错误（只安装一次）。
+    if not isinstance(plt, LazyModule):
+        install_save_patches(plt)
 
     exec_scope: Dict[str, Any] = {
         "__name__": "__main__",
-        "__builtins__": __builtins__,
+        "__builtins__": scoped_builtins(output_dir),
         "np": np,
         "pd": pd,
         "plt": plt,
@@ -534,63 +999,136 @@ def main(payload: Dict[str, Any]) -> Dict[str, Any]:
         "plotly": plotly,
         "output_dir": output_dir,
         # 供模型显式获取安全输出路径使用。
-        "ensure_output_path": lambda path: _resolve_and_ensure_output_path(path, output_dir),
+        "ensure_output_path": lambda path: resolve_output_path(path, output_dir),
         # 供模型一行保存图像使用（内部会自动创建父目录）。
         "savefig_safe": (
-            (lambda path, **kwargs: plt.savefig(_resolve_and_ensure_output_path(path, output_dir), **kwargs))
+            (lambda path, **kwargs: plt.savefig(resolve_output_path(path, output_dir), **kwargs))
             if plt is not None
             else None
         ),
         "_result": None,
         "_chart_files": [],
+        "datasets": catalog,
     }
+    # 同一会话上次保存的变量在执行前注入（预注入名字与数据集不会被覆盖）。
+    session_id = str(payload.get("sessionId") or "").strip()
+    session_ttl = float(resolve_option(payload, "sessionIdleTtlSec", settings) or 0)
+    restored: Dict[str, Any] = {}
+    if session_id:
+        restored = get_session_store().checkout(session_id, session_ttl)
+        exec_scope.update(restored)
 
     exit_code = 0
     previous_cwd = os.getcwd()
-    patched_methods: List[Tuple[Any, str, Any]] = []
-    try:
-        # 将 cwd 暂时切到 output_dir，保证相对路径保存的图片都落在输出目录下。
-        os.chdir(output_dir)
-        # 在执行用户代码前对保存入口做兜底，处理“目录不存在”的高频错误。
-        patched_methods = _patch_save_targets(output_dir=output_dir, plt=plt)
-        with contextlib.redirect_stdout(stdout_buffer), contextlib.redirect_stderr(
-            stderr_buffer
-        ):
-            exec(compile(code, "<python_chart_exec>", "exec"), exec_scope, exec_scope)
-    except Exception:
-        exit_code = 1
-        traceback.print_exc(file=stderr_buffer)
-    finally:
-        _restore_patched_methods(patched_methods)
+    pyplot_before = sys.modules.get("matplotlib.pyplot")
+    figures_before = set(pyplot_before.get_fignums()) if pyplot_before is not None else set()
+    with activate(run):
         try:
-            os.chdir(previous_cwd)
-        except Exception:
-            pass
-        # 避免 matplotlib 句柄持续堆积。
-        if plt is not None:
-            try:
-                plt.close("all")
-            except Exception:
-                pass
+            # 独占执行时仍把 cwd 切到 output_dir，兼容第三方库内部的相对路径写入；
+            # 并行执行时不切换 cwd，相对路径由上下文感知的保存入口与 open 负责改写。
+            if allow_chdir:
+                os.chdir(output_dir)
+            # 代码直接引用的数据集在执行前加载（加载失败与用户代码错误一样进入 stderr）。
+            for name in referenced_datasets:
+                exec_scope[name] = catalog.load(name)
+            exec(checked.code_object, exec_scope, exec_scope)
+        except (Exception, ExecutionTimeout):
+            exit_code = 1
+            traceback.print_exc(file=run.stderr)
+        finally:
+            if allow_chdir:
+                try:
+                    os.chdir(previous_cwd)
+                except Exception:
+                    pass
 
-    stdout_text = stdout_buffer.getvalue()
-    stderr_text = stderr_buffer.getvalue()
-    declared_chart_files = _normalize_chart_files(exec_scope.get("_chart_files"))
-    chart_files = _collect_generated_files(
-        output_dir=output_dir,
-        before_files=before_files,
-        declared_files=declared_chart_files,
-    )
-    # 若模型未显式保存文件，自动兜底导出当前 figure。
-    if not chart_files:
-        auto_saved = _auto_save_open_figures(output_dir)
-        if auto_saved:
-            chart_files = _collect_generated_files(
-                output_dir=output_dir,
-                before_files=before_files,
-                declared_files=auto_saved,
+        session_stats = None
+        if session_id:
+            keep = payload.get("sessionKeep")
+            store = get_session_store()
+            session_stats = store.commit(
+                session_id,
+                select_session_values(
+                    exec_scope,
+                    keep if isinstance(keep, list) else None,
+                    excluded=list(_SCOPE_NAMES) + list(dataset_paths),
+                ),
+                max_session_bytes=int(settings.get("sessionMaxBytes") or 0),
+                max_total_bytes=int(settings.get("sessionTotalMaxBytes") or 0),
+                max_sessions=int(settings.get("sessionMaxCount") or 0),
+                idle_ttl=session_ttl,
             )
+            session_stats["restored"] = sorted(restored)
+            session_stats["sessions"] = store.usage()
+
+        stdout_text = run.stdout.getvalue()
+        stderr_text = run.stderr.getvalue()
+        declared_chart_files = _normalize_chart_files(exec_scope.get("_chart_files"))
+        chart_files = _collect_generated_files(
+            output_dir=output_dir,
+            saved_files=run.saved_files,
+            declared_files=declared_chart_files,
+        )
+        # 预检未识别的导入（如 importlib 动态导入 pyplot）不经过包装的 pyplot.figure，
+        # 按执行前后的 figure 编号差集补齐；并行执行时差集可能含其它执行的 figure，不补。
+        pyplot_module = sys.modules.get("matplotlib.pyplot")
+        if allow_chdir and pyplot_module is not None:
+            for number in pyplot_module.get_fignums():
+                if number not in figures_before and number not in run.figure_numbers:
+                    run.figure_numbers.append(number)
+        # 若模型未显式保存文件（也没有内联图片），自动兜底导出本次执行打开的 figure。
+        auto_save_stats = None
+        auto_saved: List[str] = []
+        if not chart_files and not inline_store:
+            # 与其它执行共享进程（线程并行）时不 fork，避免复制其它线程持有的锁；
+            # 内联模式下图片收集在本进程内存中，同样只能串行导出。
+            save_workers = int(resolve_option(payload, "autoSaveMaxWorkers", settings) or 0)
+            if not allow_chdir or inline_store is not None:
+                save_workers = 1
+            auto_saved, auto_save_stats = _auto_save_open_figures(
+                output_dir,
+                run.figure_numbers,
+                max_workers=save_workers,
+                min_parallel=int(settings.get("autoSaveParallelMinFigures") or 0),
+                savefig_kwargs=encoding.savefig_defaults(),
+            )
+            if auto_saved:
+                chart_files = _collect_generated_files(
+                    output_dir=output_dir,
+                    saved_files=run.saved_files,
+                    declared_files=auto_saved,
+                )
+        if inline_store is not None:
+            # 已内联返回的图片不在磁盘上，从产物列表中去掉。
+            chart_files = [path for path in chart_files if os.path.isfile(path)]
+        _close_run_figures(pyplot_module or plt, run.figure_numbers)
+    # 缩略图从原始 PNG 的同一份像素缓冲缩放得到，不重新渲染 figure。
+    chart_variants = build_variants(
+        chart_files, thumbnail_widths(resolve_option(payload, "thumbnailWidths", settings)), encoding
+    )
+    # 量化为调色板或转为 WebP/JPEG 时，对 PNG 产物统一重编码并记录节省的字节。
+    encoding_stats = None
+    if encoding.needs_reencode and chart_files:
+        # 用户显式保存的 PNG 转格式后保留原文件（代码或回复中可能仍引用该路径）。
+        encoded_files, encoding_stats = encode_outputs(
+            chart_files,
+            encoding,
+            output_dir,
+            keep_originals=[path for path in chart_files if path not in auto_saved],
+        )
+        renamed = encoding_stats["renamed"]
+        for entry in chart_variants:
+            entry["file"] = renamed.get(entry["file"], entry["file"])
+        chart_files = encoded_files
     result_value = exec_scope.get("_result")
+    # 按作用域代理是否在本次被访问判断：常驻进程或后续执行中 sys.modules 早已包含这些库。
+    # 提前导入的 plt 不是代理，视为已加载。
+    loaded_libraries = [
+        name
+        for name in _CHART_LIBRARIES
+        if scope_modules[name] is not None
+        and getattr(scope_modules[name], "lazy_loaded", True)
+    ]
     libraries = _detect_chart_libraries()
 
     ok = exit_code == 0
@@ -600,7 +1138,11 @@ def main(payload: Dict[str, Any]) -> Dict[str, Any]:
     error_type = None
     if not ok:
         lowered = stderr_text.lower()
-        if "filenotfounderror" in lowered or "no such file or directory" in lowered:
+        if "executiontimeout" in lowered:
+            error_type = "timeout"
+        elif "memoryerror" in lowered:
+            error_type = "memory_limit"
+        elif "filenotfounderror" in lowered or "no such file or directory" in lowered:
             error_type = "path_not_found"
         elif "permissionerror" in lowered or "read-only file system" in lowered:
             error_type = "permission_denied"
@@ -609,14 +1151,10 @@ def main(payload: Dict[str, Any]) -> Dict[str, Any]:
         else:
             error_type = "execution_error"
 
-    summary = (
-        f"python_chart_exec 执行成功，chart_files={len(chart_files)}"
-        if ok
-        else f"python_chart_exec 执行失败({error_type})"
-    )
-    return {
+    result = {
         "ok": ok,
-        "summary": summary,
+        # 内联图片可能在下面改为写盘，summary 在其后填入。
+        "summary": "",
         "error": None if ok else error_line,
         "errorType": error_type,
         "stdout": stdout_text,
@@ -624,7 +1162,34 @@ def main(payload: Dict[str, Any]) -> Dict[str, Any]:
         "result": result_value,
         "chartFiles": chart_files,
         "generatedChartFiles": chart_files,
+        "chartVariants": chart_variants,
+        "inlineImages": inline_store.images() if inline_store is not None else [],
+        "inlineStats": inline_store.stats() if inline_store is not None else None,
+        "datasets": catalog.stats() if catalog is not None else None,
+        "session": session_stats,
         "libraries": libraries,
+        "loadedLibraries": loaded_libraries,
+        "preloadedLibraries": sorted(preloaded),
         "outputDir": output_dir,
-        "fontSetup": font_setup_message,
+        "fontSetup": font_setup["message"],
+        "outputStats": {"stdout": run.stdout.stats(), "stderr": run.stderr.stats()},
+        "preflight": {
+            "codeHash": checked.code_hash,
+            "needs": sorted(checked.needs),
+            "compileCached": checked.cache_hit,
+        },
+        "autoSave": auto_save_stats or None,
+        "encoding": encoding_stats,
+        "executor": "local",
     }
+    if inline_store is not None:
+        _fit_inline_output(result, inline_store)
+    summary = (
+        f"python_chart_exec 执行成功，chart_files={len(result['chartFiles'])}"
+        if ok
+        else f"python_chart_exec 执行失败({error_type})"
+    )
+    if ok and inline_store:
+        summary += f"，inline_images={len(inline_store)}"
+    result["summary"] = summary
+    return result